@@ -4,8 +4,10 @@ import styled from 'styled-components'
 import { useState, useEffect, useContext, useMemo } from 'react'
 import { FormLayout, FormRow, Panel, Section, Button, FileUpload } from '@ynput/ayon-react-components'
 import { AddonContext } from '@ynput/ayon-react-addon-provider'
+import { Dropdown } from 'primereact/dropdown'
 
 import StatusTable from './StatusTable'
+import uploadFile from './uploader'
 import context from './context'
 
 
@@ -65,7 +67,7 @@ const formatFileSize = (bytes) => {
 const ProcessDialog = ({files, fileIndex, fileProgress, overalProgress, errors, onHide}) => {
 
   const handleOnHide = () => {
-    if (!message)
+    if (!errors?.length)
       return
     onHide()
   }
@@ -103,26 +105,32 @@ const ProcessDialog = ({files, fileIndex, fileProgress, overalProgress, errors,
 }
 
 
+const IMPORT_MODES = [
+  { name: 'full', title: 'Replace existing project' },
+  { name: 'incremental', title: 'Update existing project' },
+  { name: 'staged', title: 'Replace when finished' },
+  { name: 'tiered', title: 'Folders first, versions in background' },
+]
+
 const ImportForm = () => {
   const [files, setFiles] = useState(null)
+  const [importMode, setImportMode] = useState('full')
   const [processState, setProcessState] = useState(null)
   
   const abortController = new AbortController()
-  const cancelToken = axios.CancelToken
-  const cancelTokenSource = cancelToken.source()
 
   const addonName = useContext(AddonContext).addonName
   const addonVersion = useContext(AddonContext).addonVersion
 
 
-  const handleProgress = (e) => {
+  const handleProgress = (loaded, total) => {
 
     setProcessState((processState) => {
         const totalSize = files.reduce((acc, file) => acc + file.size, 0)
         const processedFiles = processState.fileIndex ? files.slice(0, processState.fileIndex) : []
         const processedFilesSize = processedFiles.reduce((acc, file) => acc + file.size, 0)
-        const fileProgress = Math.round((e.loaded * 100) / e.total)
-        const overalProgress = Math.round(((processedFilesSize + fileProgress) * 100) / totalSize)
+        const fileProgress = total ? Math.round((loaded * 100) / total) : 100
+        const overalProgress = totalSize ? Math.round(((processedFilesSize + loaded) * 100) / totalSize) : 100
 
         return {
           ...processState,
@@ -141,21 +149,24 @@ const ImportForm = () => {
       errors: [],
     })
 
-    const url = `/api/addons/${addonName}/${addonVersion}/import`
+    const baseUrl = `/api/addons/${addonName}/${addonVersion}`
 
 
     for (const file of files) {
 
-      await axios
-        .post(url, files[0], {
+      try {
+        await uploadFile(baseUrl, file, {
+          importMode,
           signal: abortController.signal,
-          cancelToken: cancelTokenSource.token,
-          onUploadProgress: handleProgress,
-          headers: {
-            'Content-Type': 'application/octet-stream',
-            'X-Ayon-Project-Name': file.name,
-          },
-        }) 
+          onProgress: handleProgress,
+        })
+      } catch (err) {
+        const detail = err.response?.data?.detail || err.message
+        setProcessState((processState) => ({
+          ...processState,
+          errors: [...processState.errors, `${file.name}: ${detail}`],
+        }))
+      }
 
       setProcessState((processState) => {
 
@@ -168,7 +179,7 @@ const ImportForm = () => {
 
 
     } // for files
-    setProcessState(null)
+    setProcessState((processState) => processState?.errors?.length ? processState : null)
     setFiles(null)
 
   }
@@ -176,9 +187,18 @@ const ImportForm = () => {
   return (
     <Section style={{maxWidth: 400}}>
       <Panel style={{alignItems: "center", gap: 16}}>
-      <FileUpload files={files} setFiles={setFiles} validExtensions={["zip"]} mode='multiple'/>
+      <FileUpload files={files} setFiles={setFiles} validExtensions={["zip", "json", "bson", "gz", "zst"]} mode='multiple'/>
       {processState && <ProcessDialog {...processState} onHide={()=>setProcessState(null)}/> }
       <FormLayout>
+        <FormRow label="Mode">
+          <Dropdown
+            value={importMode}
+            options={IMPORT_MODES}
+            optionLabel="title"
+            optionValue="name"
+            onChange={(e) => setImportMode(e.value)}
+          />
+        </FormRow>
         <FormRow>
           <Button 
             label="Import" 
@@ -199,10 +219,21 @@ const ImportForm = () => {
           Database dump must be a zip file containing a JSON file <strong>project.json</strong> and optionally
           a <strong>thumbnails</strong> folder with project thumbnails.
         </p>
+        <p>
+          A bare JSON or JSON lines export may be uploaded instead of the zip file.
+          A <strong>mongodump</strong> BSON file of the project collection may be used in place of
+          the JSON export, as <strong>project.bson</strong> in the zip file or uploaded as is.
+          Files compressed with gzip (<strong>.gz</strong>) or zstd (<strong>.zst</strong>) are stored compressed.
+        </p>
         <p>
           At the beginning, name of the file will be used as a project name.
           As soon the dabase is parsed, the project name will be taken from the database.
         </p>
+        <p>
+          When updating, only entities changed since the previous import of the project are sent.
+          Projects that were not imported before are imported as a whole.
+          Replacing when finished keeps the existing project available until the new import is deployed.
+        </p>
       </Panel>
     </Section>
   )
@@ -1,7 +1,7 @@
 import axios from 'axios'
 import styled from 'styled-components'
 
-import {useState, useEffect, useContext} from 'react'
+import {useState, useEffect, useContext, useMemo, useRef} from 'react'
 
 import { Section, TablePanel, Button } from '@ynput/ayon-react-components'
 import { DataTable } from 'primereact/datatable'
@@ -58,30 +58,137 @@ const formatTimestamp = (rowData) => {
   )
 }
 
+// Job list is pushed by the server as server-sent events.
+// EventSource cannot send the authorization header, so the stream
+// is read using fetch. If the feed is not available, the list is
+// polled using conditional requests.
+
+const POLL_INTERVAL = 2000
+const RECONNECT_INTERVAL = 5000
+
+const parseSSE = (buffer, onMessage) => {
+  const messages = buffer.split('\n\n')
+  const rest = messages.pop()
+  for (const message of messages) {
+    let event = 'message'
+    let data = ''
+    for (const line of message.split('\n')) {
+      if (line.startsWith('event:')) event = line.slice(6).trim()
+      else if (line.startsWith('data:')) data += line.slice(5).trim()
+    }
+    if (data) onMessage(event, JSON.parse(data))
+  }
+  return rest
+}
+
+const mergeJobs = (jobs, { changed, removed }) => {
+  const result = jobs.filter((job) => !removed.includes(job.uploadId))
+  for (const job of changed) {
+    const index = result.findIndex((j) => j.uploadId === job.uploadId)
+    if (index === -1) result.unshift(job)
+    else result[index] = job
+  }
+  return result
+}
+
 const StatusTable = () => {
   const [events, setEvents] = useState([])
+  const [olderEvents, setOlderEvents] = useState([])
+  const [hasMore, setHasMore] = useState(true)
   const addonName = useContext(AddonContext).addonName
   const addonVersion = useContext(AddonContext).addonVersion
-  const url = `/api/addons/${addonName}/${addonVersion}/list`
-  const loadEvents = () => {
-    axios
-    .get(url)
-    .then((response) => {
-      const events = response.data
-      setEvents(events)
-    })
-    .catch((error) => {
-      console.log(error)
-    })
-    .finally(() => {
-      setTimeout(loadEvents, 2000)
-    })
+  const baseUrl = `/api/addons/${addonName}/${addonVersion}`
+  const etag = useRef(null)
 
+  const loadEvents = () => {
+    const headers = etag.current ? { 'If-None-Match': etag.current } : {}
+    return axios
+      .get(`${baseUrl}/list`, {
+        headers,
+        validateStatus: (status) => status === 200 || status === 304,
+      })
+      .then((response) => {
+        if (response.status === 304) return
+        etag.current = response.headers.etag || null
+        setEvents(response.data)
+      })
+      .catch((error) => {
+        console.log(error)
+      })
   }
 
   useEffect(() => {
-    loadEvents() 
-  }, [])
+    const controller = new AbortController()
+    let timer = null
+    let polling = false
+
+    const poll = () => {
+      loadEvents().finally(() => {
+        if (polling && !controller.signal.aborted) timer = setTimeout(poll, POLL_INTERVAL)
+      })
+    }
+
+    const listen = async () => {
+      try {
+        const response = await fetch(`${baseUrl}/feed`, {
+          signal: controller.signal,
+          headers: { Authorization: axios.defaults.headers.common['Authorization'] },
+        })
+        if (!response.ok || !response.body) throw new Error(`Feed status ${response.status}`)
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+        let buffer = ''
+        for (;;) {
+          const { value, done } = await reader.read()
+          if (done) break
+          buffer = parseSSE(buffer + value, (event, data) => {
+            if (event === 'jobs') setEvents(data)
+            else if (event === 'update') setEvents((jobs) => mergeJobs(jobs, data))
+          })
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return
+        console.log(error)
+        // Fall back to polling until the feed is back
+        polling = true
+        poll()
+        setTimeout(() => {
+          polling = false
+          clearTimeout(timer)
+          listen()
+        }, RECONNECT_INTERVAL * 6)
+        return
+      }
+      if (!controller.signal.aborted) setTimeout(listen, RECONNECT_INTERVAL)
+    }
+
+    listen()
+    return () => {
+      controller.abort()
+      clearTimeout(timer)
+    }
+  }, [baseUrl])
+
+  // Latest jobs come from the feed, older pages are loaded on demand
+
+  const visibleEvents = useMemo(() => {
+    const latest = new Set(events.map((job) => job.uploadId))
+    return [...events, ...olderEvents.filter((job) => !latest.has(job.uploadId))]
+  }, [events, olderEvents])
+
+  const loadMore = () => {
+    const last = visibleEvents[visibleEvents.length - 1]
+    if (!last) return
+    axios
+      .get(`${baseUrl}/list`, { params: { before: last.cursor } })
+      .then((response) => {
+        setOlderEvents((older) => [...older, ...response.data])
+        setHasMore(response.data.length > 0)
+      })
+      .catch((error) => {
+        console.log(error)
+      })
+  }
 
   const restartEvent = (processId) => () => {
     axios
@@ -106,8 +213,8 @@ const StatusTable = () => {
           <DataTable
             scrollable="true"
             scrollHeight="flex"
-            dataKey="id"
-            value={events}
+            dataKey="uploadId"
+            value={visibleEvents}
             selectionMode="single"
             columnResizeMode="fit"
           >
@@ -118,6 +225,9 @@ const StatusTable = () => {
             <Column field="updatedAt" header="Created at" style={{width: 150}} body={formatTimestamp}/>
             <Column body={restartButtonTemplate} style={{width: 50}}/>
           </DataTable>
+          {hasMore && visibleEvents.length > 0 && (
+            <Button link onClick={loadMore} label="Load older jobs"/>
+          )}
       </TablePanel>
     </Section>
   )
@@ -0,0 +1,33 @@
+import { sha256 } from '@noble/hashes/sha256'
+import { bytesToHex } from '@noble/hashes/utils'
+
+// SHA-256 of uploaded files and their chunks.
+//
+// WebCrypto only hashes whole buffers, which does not work for exports
+// of many gigabytes, and it is not available outside secure contexts.
+// The whole file is hashed slice by slice with the incremental hasher
+// of @noble/hashes, chunks use WebCrypto when it is available.
+
+// Small slices keep the page responsive while the file is hashed
+const HASH_SLICE_SIZE = 4 * 1024 * 1024
+
+// Returns the hex digest of the blob, read slice by slice
+const hashBlob = async (blob, signal, sliceSize = HASH_SLICE_SIZE) => {
+  const hasher = sha256.create()
+  for (let start = 0; start < blob.size; start += sliceSize) {
+    if (signal?.aborted) throw new Error('Upload aborted')
+    const slice = blob.slice(start, start + sliceSize)
+    hasher.update(new Uint8Array(await slice.arrayBuffer()))
+  }
+  return bytesToHex(hasher.digest())
+}
+
+// Returns the hex digest of a blob small enough to be read at once
+const hashChunk = async (blob) => {
+  const data = new Uint8Array(await blob.arrayBuffer())
+  if (!globalThis.crypto?.subtle) return bytesToHex(sha256(data))
+  const digest = await globalThis.crypto.subtle.digest('SHA-256', data)
+  return bytesToHex(new Uint8Array(digest))
+}
+
+export { hashBlob, hashChunk }
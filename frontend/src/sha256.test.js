@@ -0,0 +1,41 @@
+import { describe, expect, it } from 'vitest'
+import { hashBlob, hashChunk } from './sha256'
+
+// Known answers from FIPS 180-2
+const VECTORS = [
+  ['', 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'],
+  ['abc', 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'],
+  [
+    'abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq',
+    '248d6a61d20638b8e5c026930c3e6039a33ce45964ff2167f6ecedd419db06c1',
+  ],
+  ['a'.repeat(1000000), 'cdc76e5c9914fb9281a1c7e284d73e67f1809a48a497200e046d39ccc7112cd0'],
+]
+
+describe('sha256', () => {
+  it.each(VECTORS)('hashes chunks (%#)', async (text, digest) => {
+    expect(await hashChunk(new Blob([text]))).toBe(digest)
+  })
+
+  it.each(VECTORS)('hashes files slice by slice (%#)', async (text, digest) => {
+    expect(await hashBlob(new Blob([text]))).toBe(digest)
+    // Slices not aligned to the 64 byte blocks
+    expect(await hashBlob(new Blob([text]), null, 1000)).toBe(digest)
+  })
+
+  it('hashes chunks without WebCrypto', async () => {
+    const crypto = globalThis.crypto
+    Object.defineProperty(globalThis, 'crypto', { value: undefined, configurable: true })
+    try {
+      expect(await hashChunk(new Blob(['abc']))).toBe(VECTORS[1][1])
+    } finally {
+      Object.defineProperty(globalThis, 'crypto', { value: crypto, configurable: true })
+    }
+  })
+
+  it('stops when the upload is aborted', async () => {
+    const controller = new AbortController()
+    controller.abort()
+    await expect(hashBlob(new Blob(['abc']), controller.signal)).rejects.toThrow('Upload aborted')
+  })
+})
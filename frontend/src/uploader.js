@@ -0,0 +1,117 @@
+import axios from 'axios'
+import { hashBlob, hashChunk } from './sha256'
+
+// Chunked, resumable upload of large project exports.
+//
+// The server preallocates the file and accepts chunks at any offset,
+// so several chunks are sent in parallel. The upload ID is kept in
+// localStorage, so an interrupted upload of the same file continues
+// with the missing chunks only. The whole file is hashed while
+// the chunks are sent, the server checks the hash after finalizing
+// and reports the result on the upload event.
+
+const PARALLEL_CHUNKS = 4
+const CHUNK_RETRIES = 5
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+const storageKey = (file) =>
+  `openpype_import:${file.name}:${file.size}:${file.lastModified}`
+
+// Compressed exports are uploaded and stored compressed,
+// the processor decompresses them while parsing
+const fileEncoding = (file) => {
+  const name = file.name.toLowerCase()
+  if (name.endsWith('.gz')) return 'gzip'
+  if (name.endsWith('.zst')) return 'zstd'
+  return null
+}
+
+const isReceived = (received, start, end) =>
+  received.some(([rStart, rEnd]) => rStart <= start && end <= rEnd)
+
+const resumeUpload = async (baseUrl, file) => {
+  const uploadId = localStorage.getItem(storageKey(file))
+  if (!uploadId) return null
+  try {
+    const res = await axios.get(`${baseUrl}/upload/${uploadId}`)
+    if (res.data.size !== file.size) return null
+    return { uploadId, received: res.data.received }
+  } catch {
+    localStorage.removeItem(storageKey(file))
+    return null
+  }
+}
+
+const uploadChunk = async (url, blob, offset, signal) => {
+  const checksum = await hashChunk(blob)
+  for (let attempt = 0; ; attempt++) {
+    try {
+      await axios.put(url, blob, {
+        signal,
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'X-Ayon-Offset': offset,
+          'X-Ayon-Checksum': checksum,
+        },
+      })
+      return
+    } catch (err) {
+      if (signal?.aborted || attempt >= CHUNK_RETRIES) throw err
+      await sleep(Math.random() * 1000 * 2 ** attempt)
+    }
+  }
+}
+
+const uploadFile = async (baseUrl, file, { anatomyPreset, importMode, filters, signal, onProgress } = {}) => {
+  let upload = await resumeUpload(baseUrl, file)
+  let chunkSize = 16 * 1024 * 1024
+
+  if (!upload) {
+    const headers = {
+      'X-Ayon-Project-Name': file.name,
+      'X-Ayon-File-Size': file.size,
+    }
+    if (anatomyPreset) headers['X-Ayon-Anatomy-Preset'] = anatomyPreset
+    if (importMode) headers['X-Ayon-Import-Mode'] = importMode
+    if (filters) headers['X-Ayon-Import-Filters'] = JSON.stringify(filters)
+    const encoding = fileEncoding(file)
+    if (encoding) headers['X-Ayon-Content-Encoding'] = encoding
+    const res = await axios.post(`${baseUrl}/upload`, null, { signal, headers })
+    chunkSize = res.data.chunkSize
+    upload = { uploadId: res.data.uploadId, received: [] }
+    localStorage.setItem(storageKey(file), upload.uploadId)
+  }
+
+  const url = `${baseUrl}/upload/${upload.uploadId}`
+  const pending = []
+  let loaded = 0
+  for (let start = 0; start < file.size; start += chunkSize) {
+    const end = Math.min(start + chunkSize, file.size)
+    if (isReceived(upload.received, start, end)) loaded += end - start
+    else pending.push([start, end])
+  }
+  onProgress && onProgress(loaded, file.size)
+
+  const worker = async () => {
+    while (pending.length) {
+      const [start, end] = pending.shift()
+      await uploadChunk(url, file.slice(start, end), start, signal)
+      loaded += end - start
+      onProgress && onProgress(loaded, file.size)
+    }
+  }
+  const [checksum] = await Promise.all([
+    hashBlob(file, signal),
+    ...Array.from({ length: PARALLEL_CHUNKS }, worker),
+  ])
+
+  await axios.post(`${url}/finalize`, null, {
+    signal,
+    headers: { 'X-Ayon-Checksum': checksum },
+  })
+  localStorage.removeItem(storageKey(file))
+  return upload.uploadId
+}
+
+export default uploadFile
@@ -1,20 +1,67 @@
 import os
+import re
+import asyncio
+import json
+import hashlib
 import aiofiles
 
 from typing import Any, Type
 from datetime import datetime
 
-from fastapi import Depends, Request, Response
-from nxtools import slugify
+from fastapi import Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from nxtools import logging, slugify
 
 from ayon_server.addons import BaseServerAddon
 from ayon_server.api.dependencies import dep_current_user
-from ayon_server.entities import UserEntity
+from ayon_server.entities import ProjectEntity, UserEntity
 from ayon_server.events import dispatch_event, update_event
-from ayon_server.exceptions import AyonException, BadRequestException
+from ayon_server.events.eventstream import EventStream
+from ayon_server.helpers.project_list import build_project_list
+from ayon_server.exceptions import (
+    AyonException,
+    BadRequestException,
+    ForbiddenException,
+    NotFoundException,
+)
 from ayon_server.lib.postgres import Postgres
+from ayon_server.lib.redis import Redis
 from ayon_server.types import Field, OPModel
 
+from .feed import JOB_TOPICS, JobFeed, job_list_etag
+from .files import file_checksum, iter_file, parse_range_header
+from .projects import (
+    BACKUP_SUFFIX,
+    MAX_PROJECT_CODE_LENGTH,
+    MAX_PROJECT_NAME_LENGTH,
+    STAGING_SUFFIX,
+    InvalidSwitch,
+    swap_projects,
+)
+from .validation import ENCODINGS, InvalidUpload, validate_upload
+from .uploads import (
+    CHUNK_SIZE,
+    UPLOAD_ID_PATTERN,
+    InvalidChunk,
+    create_upload,
+    expired_uploads,
+    is_complete,
+    load_upload,
+    receive_chunk,
+    received_ranges,
+    remove_parts,
+    remove_upload,
+    start_finalizing,
+)
+
+
+JOB_PAGE_SIZE = 30
+MAX_JOB_PAGE_SIZE = 500
+JOB_STATUSES = ["pending", "in_progress", "finished", "failed", "aborted", "restarted"]
+
+# Seconds between the checks for abandoned chunked uploads
+EXPIRY_INTERVAL = 3600
+
 
 class JobSummaryModel(OPModel):
     project: str = Field(..., title="Project name")
@@ -24,6 +71,96 @@ class JobSummaryModel(OPModel):
     description: str = Field(..., title="Upload description")
     status: str = Field(..., title="Upload status")
     updated_at: datetime = Field(..., title="Upload updated at")
+    cursor: int = Field(
+        ...,
+        title="Cursor",
+        description="Pass as 'before' to get the next page",
+    )
+
+
+class QueuedUploadModel(OPModel):
+    id: str = Field(..., title="Upload event ID")
+    project: str = Field(..., title="Project name")
+    size: int = Field(..., title="Upload size")
+    extracted_size: int | None = Field(None, title="Size of the archive contents")
+    waiting: float = Field(..., title="Seconds since the upload finished")
+
+
+class ShardJobModel(OPModel):
+    shard_id: str = Field(..., title="Shard event ID")
+    process_id: str | None = Field(None, title="Process event ID of the shard")
+    status: str = Field(..., title="Shard status")
+    idle: float = Field(..., title="Seconds since the shard was last updated")
+
+
+IMPORT_MODES = ["full", "incremental", "staged", "tiered"]
+
+
+def get_import_mode(header: str | None) -> str | None:
+    """Return the import mode requested by the uploader
+
+    None lets the processor use its default.
+    """
+    if not header:
+        return None
+    if header not in IMPORT_MODES:
+        raise BadRequestException(f"Unsupported import mode {header}")
+    return header
+
+
+def get_import_filters(header: str | None, mode: str | None) -> dict[str, Any] | None:
+    """Return the selective import filters requested by the uploader
+
+    Filters are validated by the processor, here they only have to be
+    a JSON object. Incremental imports would delete the entities left
+    out by the filters, so they cannot be combined.
+    """
+    if not header:
+        return None
+    try:
+        filters = json.loads(header)
+    except ValueError:
+        raise BadRequestException("Invalid import filters")
+    if not isinstance(filters, dict):
+        raise BadRequestException("Import filters must be an object")
+    if filters and mode == "incremental":
+        raise BadRequestException("Import filters cannot be used in incremental mode")
+    return filters or None
+
+
+class SwitchRequestModel(OPModel):
+    project_name: str = Field(..., title="Live project name")
+    staging_name: str = Field(..., title="Staging project name")
+    code: str = Field(..., title="Project code of the live project")
+
+
+def get_encoding(header: str | None) -> str | None:
+    """Return the upload compression from the encoding header"""
+    encoding = (header or "identity").strip().lower()
+    if encoding == "identity":
+        return None
+    if encoding not in ENCODINGS:
+        raise BadRequestException(f"Unsupported encoding {encoding}")
+    return encoding
+
+
+class ImportResultModel(OPModel):
+    upload_id: str = Field(..., title="Upload ID")
+
+
+class UploadInitModel(OPModel):
+    upload_id: str = Field(..., title="Upload ID")
+    chunk_size: int = Field(..., title="Recommended chunk size")
+
+
+class UploadStatusModel(OPModel):
+    size: int = Field(..., title="File size")
+    received: list[list[int]] = Field(
+        default_factory=list,
+        title="Received byte ranges",
+        description="Sorted list of [start, end) ranges",
+    )
+    complete: bool = Field(False, title="All bytes received")
 
 
 class OpenPypeImportAddon(BaseServerAddon):
@@ -35,65 +172,296 @@ class OpenPypeImportAddon(BaseServerAddon):
     def initialize(self):
         self.add_endpoint("import", self.import_project, method="POST")
         self.add_endpoint("list", self.list_jobs, method="GET")
+        self.add_endpoint("feed", self.job_feed, method="GET")
+        self.add_endpoint("queue", self.list_queue, method="GET")
+        self.add_endpoint("shards/{event_id}", self.list_shards, method="GET")
+        self.add_endpoint("switch", self.switch_project, method="POST")
+        self.add_endpoint(
+            "download/{event_id}", self.download_upload, method="GET"
+        )
+        self.add_endpoint("upload", self.init_upload, method="POST")
+        self.add_endpoint("upload/{upload_id}", self.upload_chunk, method="PUT")
+        self.add_endpoint("upload/{upload_id}", self.upload_status, method="GET")
+        self.add_endpoint(
+            "upload/{upload_id}/finalize", self.finalize_upload, method="POST"
+        )
 
     async def setup(self):
         """Setup method is called after the addon is registered"""
-        return
+        if getattr(self, "feed", None) is not None:
+            return
+        self.feed = JobFeed(self.load_jobs)
+        for topic in JOB_TOPICS:
+            EventStream.subscribe(topic, self.feed.on_event, all_nodes=True)
+        self.expiry = asyncio.create_task(self.expire_uploads())
+        self.verifications: set[asyncio.Task] = set()
+
+    async def list_jobs(
+        self,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+        before: int | None = Query(
+            None,
+            title="Cursor",
+            description="Return jobs older than the job with this cursor",
+        ),
+        limit: int = Query(JOB_PAGE_SIZE, ge=1, le=MAX_JOB_PAGE_SIZE),
+        project: str | None = Query(None, title="Project name"),
+        user_name: str | None = Query(None, alias="user", title="User name"),
+        status: str | None = Query(None, title="Job status"),
+        ids: list[str] | None = Query(
+            None,
+            title="Upload IDs",
+            description="Return only the jobs of these uploads",
+        ),
+    ) -> Response:
+        """Return import jobs, newest first
 
-    async def list_jobs(self) -> list[JobSummaryModel]:
-        result = []
+        Jobs are paginated using the cursor of the last received job.
+        Processors follow the imports of uploads they created by `ids`.
+        Responds with 304 when the page did not change since the ETag
+        sent in If-None-Match.
+        """
+        if status is not None and status not in JOB_STATUSES:
+            raise BadRequestException(f"Invalid status {status}")
+        if ids is not None:
+            if len(ids) > MAX_JOB_PAGE_SIZE:
+                raise BadRequestException("Too many upload IDs")
+            if not all(UPLOAD_ID_PATTERN.fullmatch(i) for i in ids):
+                raise BadRequestException("Invalid upload ID")
+
+        filters = (before, project, user_name, status, ids)
+        if limit == JOB_PAGE_SIZE and filters == (None, None, None, None, None):
+            # The default view is shared with the feed
+            jobs, etag = await self.feed.snapshot()
+        else:
+            jobs = await self.load_jobs(before, limit, project, user_name, status, ids)
+            etag = job_list_etag(jobs)
+
+        if request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(jobs, headers={"ETag": etag})
+
+    async def job_feed(
+        self,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> StreamingResponse:
+        """Push changes of the job list as server-sent events"""
+        return StreamingResponse(
+            self.feed.stream(request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def load_jobs(
+        self,
+        before: int | None = None,
+        limit: int = JOB_PAGE_SIZE,
+        project: str | None = None,
+        user_name: str | None = None,
+        status: str | None = None,
+        ids: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        # Uploads are selected by topic and walked backwards by
+        # creation_order, so only the requested page is read.
+        # The latest process event of each upload is looked up
+        # by depends_on, instead of joining the whole events table.
         query = """
-        SELECT
+        SELECT * FROM (
+            SELECT
+                u.id AS upload_id,
+                p.id AS process_id,
+                COALESCE(p.description, u.description) AS description,
+                COALESCE(
+                    p.status,
+                    CASE WHEN u.status IN ('failed', 'aborted')
+                    THEN u.status ELSE 'in_progress' END
+                ) AS status,
+                u.user_name AS user,
+                u.project_name AS project,
+                COALESCE(p.updated_at, u.updated_at) AS updated_at,
+                u.creation_order AS cursor
+
+            FROM events AS u
+            LEFT JOIN LATERAL (
+                SELECT id, description, status, updated_at
+                FROM events
+                WHERE depends_on = u.id
+                AND topic = 'openpype_import.process'
+                ORDER BY creation_order DESC
+                LIMIT 1
+            ) AS p ON TRUE
+
+            WHERE u.topic = 'openpype_import.upload'
+            AND ($1::bigint IS NULL OR u.creation_order < $1)
+            AND ($2::text IS NULL OR u.project_name = $2)
+            AND ($3::text IS NULL OR u.user_name = $3)
+            AND ($6::uuid[] IS NULL OR u.id = ANY($6))
+        ) AS jobs
+        WHERE ($4::text IS NULL OR status = $4)
+        ORDER BY cursor DESC
+        LIMIT $5
+        """
+        result = []
+        async for row in Postgres.iterate(
+            query, before, project, user_name, status, limit, ids
+        ):
+            job = JobSummaryModel(**row)
+            result.append(json.loads(job.json(by_alias=True)))
+        return result
 
-        u.id as upload_id,
-        p.id as process_id,
-        u.description as upload_description,
-        p.description as process_description,
-        u.status as upload_status,
-        p.status as process_status,
-        u.user_name as user,
-        u.project_name as project,
-        u.updated_at as upload_updated_at,
-        p.updated_at as process_updated_at
+    async def list_queue(
+        self,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> list[QueuedUploadModel]:
+        """Return uploads waiting for a processor, oldest first
 
-        FROM events AS u LEFT JOIN events AS p ON u.id = p.depends_on
+        Restarted imports are waiting again. Processors use the list
+        to choose which upload to enroll on.
+        """
 
-        WHERE 
-            u.topic = 'openpype_import.upload'
+        if not (user.is_admin or user.is_service):
+            raise ForbiddenException("Only services can list the queue")
 
-        ORDER BY u.creation_order DESC
-        LIMIT 30
+        query = """
+        SELECT
+            u.id,
+            u.project_name,
+            u.summary,
+            EXTRACT(EPOCH FROM now() - u.updated_at) AS waiting
+        FROM events AS u
+        WHERE u.topic = 'openpype_import.upload'
+        AND u.status = 'finished'
+        AND NOT EXISTS (
+            SELECT 1 FROM events AS p
+            WHERE p.depends_on = u.id
+            AND p.topic = 'openpype_import.process'
+            AND p.status != 'restarted'
+        )
+        ORDER BY u.creation_order
+        LIMIT 500
         """
+        result = []
         async for row in Postgres.iterate(query):
-
-            description = row["process_description"] or row["upload_description"]
-            status = row["process_status"]
-            if not status:
-                if row["upload_status"] == "failed":
-                    status = "failed"
-                else:
-                    status = "in_progress"
-
+            summary = row["summary"] or {}
             result.append(
-                JobSummaryModel(
-                    project=row["project"],
-                    user=row["user"],
-                    upload_id=row["upload_id"],
-                    process_id=row["process_id"],
-                    description=description,
-                    status=status,
-                    updated_at=row["process_updated_at"] or row["upload_updated_at"],
+                QueuedUploadModel(
+                    id=row["id"],
+                    project=row["project_name"],
+                    size=summary.get("size", 0),
+                    extracted_size=(summary.get("stats") or {}).get("extracted_size"),
+                    waiting=row["waiting"],
                 )
             )
-
         return result
 
-    async def import_project(
+    async def list_shards(
         self,
-        request: Request,
+        event_id: str,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> list[ShardJobModel]:
+        """Return the shards of an import with their latest process events
+
+        The coordinator of a sharded deploy polls it to learn which
+        shards are done and which stopped making progress. Idle time
+        is measured by the server, so clocks of the replicas do not
+        matter.
+        """
+
+        if not (user.is_admin or user.is_service):
+            raise ForbiddenException("Only services can list shards")
+        if not UPLOAD_ID_PATTERN.fullmatch(event_id):
+            raise BadRequestException("Invalid event ID")
+
+        query = """
+        SELECT
+            s.id AS shard_id,
+            p.id AS process_id,
+            COALESCE(p.status, 'pending') AS status,
+            EXTRACT(EPOCH FROM now() - COALESCE(p.updated_at, s.updated_at)) AS idle
+        FROM events AS s
+        LEFT JOIN LATERAL (
+            SELECT id, status, updated_at
+            FROM events
+            WHERE depends_on = s.id
+            AND topic = 'openpype_import.shard_process'
+            ORDER BY creation_order DESC
+            LIMIT 1
+        ) AS p ON TRUE
+        WHERE s.depends_on = $1
+        AND s.topic = 'openpype_import.shard'
+        ORDER BY s.creation_order
+        """
+        return [ShardJobModel(**row) async for row in Postgres.iterate(query, event_id)]
+
+    async def switch_project(
+        self,
+        payload: SwitchRequestModel,
         user: UserEntity = Depends(dep_current_user),
     ) -> Response:
-        """Import project from OpenPype"""
+        """Replace the live project with its staged import
+
+        Both projects are renamed in one transaction, the live one to
+        a backup name and the staging one to the live name, so the
+        project is never missing. Settings of the live project and
+        events of both are kept (see projects.py). The backup is
+        deleted afterwards.
+        """
+
+        if not (user.is_admin or user.is_service):
+            raise ForbiddenException("Only services can switch projects")
+
+        live = payload.project_name
+        staging = payload.staging_name
+        backup = live + BACKUP_SUFFIX
+        if not re.fullmatch(r"[a-zA-Z0-9_]+", live) or staging != live + STAGING_SUFFIX:
+            raise BadRequestException("Invalid project name")
+        if len(staging) > MAX_PROJECT_NAME_LENGTH:
+            raise BadRequestException("Project name is too long")
+        if len(payload.code) > MAX_PROJECT_CODE_LENGTH:
+            raise BadRequestException("Project code is too long")
+
+        res = await Postgres.fetch(
+            "SELECT name FROM public.projects WHERE name = $1", staging
+        )
+        if not res:
+            raise NotFoundException("Staging project not found")
+
+        # Left over by a switch that failed to clean up
+        await self.delete_project(backup)
+
+        try:
+            async with Postgres.acquire() as conn, conn.transaction():
+                replaced = await swap_projects(conn, live, payload.code)
+        except InvalidSwitch as e:
+            raise BadRequestException(str(e))
+
+        # Whatever was cached under the three names is stale. Saving
+        # the project through its entity rebuilds the project list
+        # and notifies clients and the other server nodes.
+        for name in (live, staging, backup):
+            await Redis.delete("project-anatomy", name)
+            await Redis.delete("project-data", name)
+        project = await ProjectEntity.load(live)
+        await project.save()
+        await build_project_list()
+
+        if replaced:
+            await self.delete_project(backup)
+        return Response(status_code=204)
+
+    async def delete_project(self, project_name: str) -> None:
+        """Delete the project if it exists"""
+        try:
+            project = await ProjectEntity.load(project_name)
+        except NotFoundException:
+            return
+        logging.info(f"Deleting project {project_name}")
+        await project.delete()
+
+    async def create_upload_event(self, request: Request, user: UserEntity) -> str:
+        """Validate the upload headers and dispatch the upload event"""
 
         project_name = request.headers.get("X-Ayon-Project-Name")
         anatomy_preset = request.headers.get("X-Ayon-Anatomy-Preset")
@@ -129,14 +497,43 @@ class OpenPypeImportAddon(BaseServerAddon):
             project=project_name,
             finished=False,
         )
+        return str(event_id)
+
+    async def import_project(
+        self,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> ImportResultModel:
+        """Import project from OpenPype
+
+        The body may be compressed (Content-Encoding gzip or zstd).
+        It is stored as is and decompressed by the processor.
+
+        Projects split from multi-project archives by the processor
+        are uploaded here with X-Ayon-Parent-Job set to the import
+        of the archive.
+        """
+
+        encoding = get_encoding(request.headers.get("Content-Encoding"))
+        mode = get_import_mode(request.headers.get("X-Ayon-Import-Mode"))
+        filters = get_import_filters(request.headers.get("X-Ayon-Import-Filters"), mode)
+        parent = request.headers.get("X-Ayon-Parent-Job") or None
+        if parent and not UPLOAD_ID_PATTERN.fullmatch(parent):
+            raise BadRequestException("Invalid parent job")
+        event_id = await self.create_upload_event(request, user)
+        anatomy_preset = request.headers.get("X-Ayon-Anatomy-Preset") or "_"
 
         target_path = os.path.join(self.get_private_dir(), str(event_id))
 
+        # The hash is computed while streaming, so duplicate uploads
+        # can be recognized by the processor without reading the file again.
+        hasher = hashlib.sha256()
         i = 0
         try:
             async with aiofiles.open(target_path, "wb") as f:
                 async for chunk in request.stream():
                     i += len(chunk)
+                    hasher.update(chunk)
                     await f.write(chunk)
         except Exception as e:
             print(e)
@@ -153,11 +550,309 @@ class OpenPypeImportAddon(BaseServerAddon):
 
             raise AyonException("Failed to upload project file")
 
+        stats = await self.check_upload(event_id, target_path, encoding)
         await update_event(
             event_id,
             status="finished",
             description="Project file uploaded",
-            summary={},
+            summary={
+                "anatomy_preset": anatomy_preset,
+                "mode": mode,
+                "filters": filters,
+                "parent": parent,
+                "encoding": encoding,
+                "size": i,
+                "sha256": hasher.hexdigest(),
+                "stats": stats,
+            },
+        )
+
+        return ImportResultModel(upload_id=event_id)
+
+    async def check_upload(
+        self,
+        event_id: str,
+        path: str,
+        encoding: str | None = None,
+    ) -> dict[str, Any]:
+        """Validate the uploaded file before it is queued for import
+
+        Invalid uploads are removed and their event fails immediately,
+        so no processor enrolls on them.
+        """
+        try:
+            return await asyncio.to_thread(validate_upload, path, encoding)
+        except InvalidUpload as e:
+            await update_event(
+                event_id,
+                status="failed",
+                description=f"Invalid upload: {e}",
+            )
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+            raise BadRequestException(str(e))
+
+    async def download_upload(
+        self,
+        event_id: str,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> Response:
+        """Download an uploaded project file
+
+        Supports HTTP Range requests, so the processor can resume
+        interrupted downloads of large files.
+        """
+
+        if not (user.is_admin or user.is_service):
+            raise ForbiddenException("Only services can download project files")
+
+        if not re.fullmatch(r"[0-9a-f]{32}", event_id):
+            raise BadRequestException("Invalid upload ID")
+
+        if self.get_private_dir() is None:
+            raise AyonException("Private dir does not exist")
+
+        path = os.path.join(self.get_private_dir(), event_id)
+        if not os.path.isfile(path):
+            raise NotFoundException("Upload not found")
+
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_range_header(request.headers.get("Range"), size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+        if byte_range is None:
+            return StreamingResponse(
+                iter_file(path),
+                media_type="application/octet-stream",
+                headers={"Accept-Ranges": "bytes", "Content-Length": str(size)},
+            )
+
+        start, end = byte_range
+        length = end - start + 1
+        return StreamingResponse(
+            iter_file(path, start, length),
+            status_code=206,
+            media_type="application/octet-stream",
+            headers={
+                "Accept-Ranges": "bytes",
+                "Content-Length": str(length),
+                "Content-Range": f"bytes {start}-{end}/{size}",
+            },
+        )
+
+    #
+    # Chunked uploads
+    #
+
+    async def init_upload(
+        self,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> UploadInitModel:
+        """Start a chunked upload
+
+        Chunks may be sent in any order and in parallel. Interrupted
+        uploads are resumed by asking for the received ranges and
+        sending only the missing chunks.
+
+        Compressed files are declared by X-Ayon-Content-Encoding,
+        chunks are then parts of the compressed file.
+        """
+
+        encoding = get_encoding(request.headers.get("X-Ayon-Content-Encoding"))
+        mode = get_import_mode(request.headers.get("X-Ayon-Import-Mode"))
+        filters = get_import_filters(request.headers.get("X-Ayon-Import-Filters"), mode)
+
+        try:
+            size = int(request.headers.get("X-Ayon-File-Size", ""))
+        except ValueError:
+            raise BadRequestException("Missing file size")
+        if size < 0:
+            raise BadRequestException("Invalid file size")
+
+        event_id = await self.create_upload_event(request, user)
+        create_upload(
+            self.get_private_dir(),
+            event_id,
+            {
+                "size": size,
+                "encoding": encoding,
+                "mode": mode,
+                "filters": filters,
+                "user": user.name,
+                "anatomy_preset": request.headers.get("X-Ayon-Anatomy-Preset")
+                or "_",
+            },
+        )
+        return UploadInitModel(upload_id=event_id, chunk_size=CHUNK_SIZE)
+
+    def get_upload(self, upload_id: str, user: UserEntity) -> dict:
+        if self.get_private_dir() is None:
+            raise AyonException("Private dir does not exist")
+        meta = load_upload(self.get_private_dir(), upload_id)
+        if meta is None:
+            raise NotFoundException("Upload not found")
+        if meta["user"] != user.name and not user.is_admin:
+            raise ForbiddenException("Upload belongs to another user")
+        return meta
+
+    async def upload_chunk(
+        self,
+        upload_id: str,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> Response:
+        """Write a chunk of a chunked upload at the given offset
+
+        When the X-Ayon-Checksum header (sha256 of the chunk) is present,
+        the chunk is only written if it matches. Chunks overlapping
+        received data are refused, unless they are the same chunk sent
+        again.
+        """
+
+        meta = self.get_upload(upload_id, user)
+        try:
+            offset = int(request.headers.get("X-Ayon-Offset", ""))
+        except ValueError:
+            raise BadRequestException("Missing chunk offset")
+
+        try:
+            await receive_chunk(
+                self.get_private_dir(),
+                upload_id,
+                meta["size"],
+                offset,
+                request.stream(),
+                request.headers.get("X-Ayon-Checksum"),
+            )
+        except InvalidChunk as e:
+            raise BadRequestException(str(e))
+        return Response(status_code=204)
+
+    async def upload_status(
+        self,
+        upload_id: str,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> UploadStatusModel:
+        """Return received ranges of a chunked upload"""
+
+        meta = self.get_upload(upload_id, user)
+        ranges = received_ranges(self.get_private_dir(), upload_id)
+        return UploadStatusModel(
+            size=meta["size"],
+            received=ranges,
+            complete=is_complete(ranges, meta["size"]),
+        )
+
+    async def finalize_upload(
+        self,
+        upload_id: str,
+        request: Request,
+        user: UserEntity = Depends(dep_current_user),
+    ) -> Response:
+        """Finish a chunked upload and queue it for import
+
+        X-Ayon-Checksum must be the sha256 of the whole file. The file
+        is verified in the background: the upload event finishes once
+        it matches, uploads that do not match are removed and their
+        event fails. Finalizing the same upload again is harmless.
+        """
+
+        meta = self.get_upload(upload_id, user)
+        expected = request.headers.get("X-Ayon-Checksum")
+        if not expected:
+            raise BadRequestException("Missing upload checksum")
+
+        ranges = received_ranges(self.get_private_dir(), upload_id)
+        if not is_complete(ranges, meta["size"]):
+            raise BadRequestException("Upload is not complete")
+
+        if start_finalizing(self.get_private_dir(), upload_id):
+            await update_event(upload_id, description="Verifying the upload")
+            task = asyncio.create_task(
+                self.verify_upload(upload_id, meta, expected.lower())
+            )
+            self.verifications.add(task)
+            task.add_done_callback(self.verifications.discard)
+        return Response(status_code=202)
+
+    async def verify_upload(self, upload_id: str, meta: dict, expected: str) -> None:
+        """Check the checksum of a finalized upload and queue it for import
+
+        Chunks arrive in any order, so the file is hashed once complete.
+        Verifications interrupted by a server restart leave the parts
+        directory behind, the upload then expires.
+        """
+        target_path = os.path.join(self.get_private_dir(), upload_id)
+        try:
+            checksum = await file_checksum(target_path)
+            if checksum != expected:
+                remove_upload(self.get_private_dir(), upload_id)
+                await update_event(
+                    upload_id,
+                    status="failed",
+                    description="Upload checksum does not match",
+                )
+                return
+
+            remove_parts(self.get_private_dir(), upload_id)
+            stats = await self.check_upload(
+                upload_id, target_path, meta.get("encoding")
+            )
+        except BadRequestException:
+            # Invalid upload, the event already failed
+            return
+        except Exception as e:
+            logging.error(f"Unable to verify upload {upload_id}: {e}")
+            remove_upload(self.get_private_dir(), upload_id)
+            await update_event(
+                upload_id,
+                status="failed",
+                description="Unable to verify the upload",
+            )
+            return
+
+        await update_event(
+            upload_id,
+            status="finished",
+            description="Project file uploaded",
+            summary={
+                "anatomy_preset": meta["anatomy_preset"],
+                "mode": meta.get("mode"),
+                "filters": meta.get("filters"),
+                "encoding": meta.get("encoding"),
+                "size": meta["size"],
+                "sha256": checksum,
+                "stats": stats,
+            },
         )
 
-        return Response(status_code=200)
+    async def expire_uploads(self) -> None:
+        """Remove chunked uploads abandoned by their clients
+
+        Runs on every server node. Removing an upload twice is harmless.
+        """
+        while True:
+            await asyncio.sleep(EXPIRY_INTERVAL)
+            private_dir = self.get_private_dir()
+            if private_dir is None:
+                continue
+            for upload_id in await asyncio.to_thread(expired_uploads, private_dir):
+                logging.info(f"Removing abandoned upload {upload_id}")
+                remove_upload(private_dir, upload_id)
+                try:
+                    await update_event(
+                        upload_id,
+                        status="failed",
+                        description="Upload expired",
+                    )
+                except Exception as e:
+                    logging.warning(f"Unable to expire upload {upload_id}: {e}")
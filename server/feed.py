@@ -0,0 +1,109 @@
+import json
+import time
+import asyncio
+import hashlib
+
+from typing import Any, AsyncGenerator, Awaitable, Callable
+
+from fastapi import Request
+
+JOB_TOPICS = ["openpype_import.upload", "openpype_import.process"]
+
+# Event hooks mark the job list as changed. The list is still reloaded
+# after MAX_AGE seconds in case an update was missed.
+MAX_AGE = 10.0
+
+# Progress updates of running imports come in bursts,
+# they are coalesced into a single reload.
+DEBOUNCE = 0.5
+
+KEEPALIVE = 15.0
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def job_list_etag(jobs: list[dict[str, Any]]) -> str:
+    body = json.dumps(jobs, sort_keys=True).encode()
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class JobFeed:
+    """Shared, cached job list pushed to the connected clients
+
+    The list is loaded once per change, no matter how many clients
+    are watching it, and only rows that changed are sent to them.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[list[dict[str, Any]]]]):
+        self.loader = loader
+        self.jobs: dict[str, dict[str, Any]] = {}
+        self.etag: str | None = None
+        self.dirty = True
+        self.refreshed_at = 0.0
+        self.lock = asyncio.Lock()
+        self.subscribers: set[asyncio.Queue] = set()
+        self.pending: asyncio.Task | None = None
+
+    async def on_event(self, event: Any) -> None:
+        """Event hook of the job topics"""
+        self.dirty = True
+        if self.subscribers and (self.pending is None or self.pending.done()):
+            self.pending = asyncio.create_task(self.delayed_refresh())
+
+    async def delayed_refresh(self) -> None:
+        await asyncio.sleep(DEBOUNCE)
+        await self.refresh()
+
+    async def refresh(self) -> None:
+        async with self.lock:
+            self.dirty = False
+            rows = await self.loader()
+            self.refreshed_at = time.monotonic()
+
+            jobs = {row["uploadId"]: row for row in rows}
+            changed = [row for key, row in jobs.items() if self.jobs.get(key) != row]
+            removed = [key for key in self.jobs if key not in jobs]
+            self.jobs = jobs
+
+            self.etag = job_list_etag(rows)
+
+        if changed or removed:
+            message = {"changed": changed, "removed": removed}
+            for queue in self.subscribers:
+                queue.put_nowait(message)
+
+    def is_stale(self) -> bool:
+        return self.dirty or time.monotonic() - self.refreshed_at > MAX_AGE
+
+    async def snapshot(self) -> tuple[list[dict[str, Any]], str]:
+        """Return the current job list and its ETag"""
+        if self.is_stale():
+            await self.refresh()
+        assert self.etag is not None
+        return list(self.jobs.values()), self.etag
+
+    async def stream(self, request: Request) -> AsyncGenerator[str, None]:
+        """Server-sent events of the job list
+
+        The full list is sent first ("jobs" event), followed by
+        "update" events with changed and removed rows.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        try:
+            jobs, _ = await self.snapshot()
+            yield format_sse("jobs", jobs)
+
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if self.is_stale():
+                        await self.refresh()
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse("update", message)
+        finally:
+            self.subscribers.discard(queue)
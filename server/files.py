@@ -0,0 +1,61 @@
+import hashlib
+import aiofiles
+
+from typing import AsyncGenerator
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_range_header(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a HTTP Range header
+
+    Only a single byte range is supported. Returns an inclusive
+    (start, end) tuple, None if the whole file is requested.
+    Raises ValueError if the range cannot be satisfied.
+    """
+    if not header:
+        return None
+
+    unit, _, ranges = header.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        raise ValueError("Unsupported range")
+
+    start_str, _, end_str = ranges.strip().partition("-")
+    if not start_str:
+        # Suffix range: last N bytes
+        length = int(end_str)
+        start, end = max(size - length, 0), size - 1
+    else:
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+
+    end = min(end, size - 1)
+    if start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def iter_file(
+    path: str,
+    start: int = 0,
+    length: int | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """Read a part of the file in chunks"""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while length is None or length > 0:
+            size = CHUNK_SIZE if length is None else min(CHUNK_SIZE, length)
+            chunk = await f.read(size)
+            if not chunk:
+                break
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+async def file_checksum(path: str) -> str:
+    """Return sha256 of the file"""
+    hasher = hashlib.sha256()
+    async for chunk in iter_file(path):
+        hasher.update(chunk)
+    return hasher.hexdigest()
@@ -0,0 +1,131 @@
+from typing import Any
+
+# Switching staged imports
+#
+# Ayon has no API to rename a project, so the staging project takes
+# the place of the live one by renaming both projects and their
+# schemas in one transaction. The live project is kept under the
+# backup name until the switch is committed, then deleted by the
+# caller through ProjectEntity, which also refreshes the caches.
+#
+# Only the project rows and schemas are renamed. Everything else
+# the server keeps under a project name is handled explicitly:
+#
+# - Settings of the project (addon settings, site settings and custom
+#   roots) are stored in its schema. They belong to the project, not
+#   to its import, so they are copied from the replaced project.
+# - Events keep the project name, so events of the staging and the
+#   backup project are moved to the live name.
+#
+# Identifiers are quoted by Postgres (format %I), never by Python.
+
+STAGING_SUFFIX = "_import_staging"
+
+# The live project is kept under this suffix until the switch is committed
+BACKUP_SUFFIX = "_import_backup"
+
+# Project schemas are named project_<name> and Postgres
+# truncates identifiers longer than 63 bytes
+MAX_PROJECT_NAME_LENGTH = 63 - len("project_")
+MAX_PROJECT_CODE_LENGTH = 64
+
+SETTINGS_TABLES = ["settings", "project_site_settings", "custom_roots"]
+
+
+class InvalidSwitch(Exception):
+    """The projects cannot be switched"""
+
+
+def schema_name(project_name: str) -> str:
+    return f"project_{project_name.lower()}"
+
+
+async def execute_formatted(conn: Any, template: str, *identifiers: str) -> None:
+    """Execute a statement with identifiers quoted by Postgres"""
+    placeholders = ", ".join(f"${i + 1}::text" for i in range(len(identifiers)))
+    statement = await conn.fetchval(
+        f"SELECT format('{template}', {placeholders})", *identifiers
+    )
+    await conn.execute(statement)
+
+
+async def table_exists(conn: Any, schema: str, table: str) -> bool:
+    return await conn.fetchval(
+        "SELECT to_regclass(format('%I.%I', $1::text, $2::text)) IS NOT NULL",
+        schema,
+        table,
+    )
+
+
+async def copy_settings(conn: Any, source: str, target: str) -> None:
+    """Replace the settings of the target project by the source ones
+
+    Tables the server version does not have are skipped.
+    """
+    for table in SETTINGS_TABLES:
+        if not (
+            await table_exists(conn, schema_name(source), table)
+            and await table_exists(conn, schema_name(target), table)
+        ):
+            continue
+        await execute_formatted(
+            conn, "DELETE FROM %I.%I", schema_name(target), table
+        )
+        await execute_formatted(
+            conn,
+            "INSERT INTO %2$I.%3$I SELECT * FROM %1$I.%3$I",
+            schema_name(source),
+            schema_name(target),
+            table,
+        )
+
+
+async def rename_project(conn: Any, name: str, new_name: str, code: str) -> None:
+    await conn.execute(
+        "UPDATE public.projects SET name = $1, code = $2 WHERE name = $3",
+        new_name,
+        code,
+        name,
+    )
+    await execute_formatted(
+        conn,
+        "ALTER SCHEMA %I RENAME TO %I",
+        schema_name(name),
+        schema_name(new_name),
+    )
+
+
+async def swap_projects(conn: Any, live: str, code: str) -> bool:
+    """Give the staging project the name of the live one
+
+    Must run in a transaction and the backup name must be free.
+    The live project, if any, is renamed to the backup name and
+    its settings are copied to the staging project. The staging
+    project gets the code. Returns whether there was a live project.
+    Raises InvalidSwitch.
+    """
+    staging = live + STAGING_SUFFIX
+    backup = live + BACKUP_SUFFIX
+
+    if await conn.fetchval("SELECT 1 FROM public.projects WHERE name = $1", backup):
+        raise InvalidSwitch("Backup of a previous switch still exists")
+
+    res = await conn.fetch(
+        "SELECT code FROM public.projects WHERE name = $1 FOR UPDATE", live
+    )
+    if res:
+        # Codes are unique, the live one is freed for the staging project
+        backup_code = res[0]["code"] + BACKUP_SUFFIX
+        if len(backup_code) > MAX_PROJECT_CODE_LENGTH:
+            raise InvalidSwitch("Project code is too long")
+        await rename_project(conn, live, backup, backup_code)
+        await copy_settings(conn, backup, staging)
+
+    await rename_project(conn, staging, live, code)
+    await conn.execute(
+        "UPDATE public.events SET project_name = $1 WHERE project_name IN ($2, $3)",
+        live,
+        staging,
+        backup,
+    )
+    return bool(res)
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+import aiofiles
+
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterable
+
+# Chunked uploads
+#
+# The file is preallocated in the private dir and every received
+# chunk is written at its offset. A marker file named "<start>-<end>"
+# is stored in the "<upload_id>.parts" directory for each chunk that
+# was written and verified, so received ranges survive server restarts
+# and are shared by all server nodes using the same private dir.
+#
+# Chunks are streamed to a temporary file in the parts directory
+# and verified there, so a bad or retried chunk never overwrites bytes
+# that were already received. Verified chunks are copied to the file
+# holding the lock of the upload, an O_EXCL "lock" file in the parts
+# directory, so chunks arriving in parallel (on any node) cannot both
+# pass the overlap check. The whole file is verified against
+# the checksum sent by the client after the upload is finalized.
+#
+# Unfinished uploads that receive no chunk for UPLOAD_EXPIRY seconds
+# are removed.
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+MAX_CHUNK_SIZE = 4 * CHUNK_SIZE
+
+# Locks older than this were left by a crashed server
+LOCK_TIMEOUT = 60
+LOCK_POLL_INTERVAL = 0.05
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+UPLOAD_EXPIRY = 24 * 3600
+
+UPLOAD_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class InvalidChunk(Exception):
+    """The chunk cannot be accepted"""
+
+
+def parts_dir(private_dir: str, upload_id: str) -> str:
+    return os.path.join(private_dir, f"{upload_id}.parts")
+
+
+def create_upload(private_dir: str, upload_id: str, meta: dict) -> None:
+    """Preallocate the target file and store the upload metadata"""
+    os.makedirs(parts_dir(private_dir, upload_id), exist_ok=True)
+    with open(os.path.join(private_dir, upload_id), "wb") as f:
+        f.truncate(meta["size"])
+    with open(os.path.join(parts_dir(private_dir, upload_id), "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def load_upload(private_dir: str, upload_id: str) -> dict | None:
+    """Return metadata of an unfinished upload"""
+    if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    path = os.path.join(parts_dir(private_dir, upload_id), "meta.json")
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record_chunk(private_dir: str, upload_id: str, start: int, end: int) -> None:
+    path = os.path.join(parts_dir(private_dir, upload_id), f"{start}-{end}")
+    open(path, "w").close()
+
+
+def has_chunk(private_dir: str, upload_id: str, start: int, end: int) -> bool:
+    """Check whether exactly this chunk was received before"""
+    path = os.path.join(parts_dir(private_dir, upload_id), f"{start}-{end}")
+    return os.path.exists(path)
+
+
+def received_ranges(private_dir: str, upload_id: str) -> list[list[int]]:
+    """Return merged [start, end) ranges of received chunks"""
+    chunks = []
+    for name in os.listdir(parts_dir(private_dir, upload_id)):
+        start, sep, end = name.partition("-")
+        if sep and start.isdigit() and end.isdigit():
+            chunks.append((int(start), int(end)))
+
+    result: list[list[int]] = []
+    for start, end in sorted(chunks):
+        if result and start <= result[-1][1]:
+            result[-1][1] = max(result[-1][1], end)
+        else:
+            result.append([start, end])
+    return result
+
+
+def overlaps(ranges: list[list[int]], start: int, end: int) -> bool:
+    """Check whether the [start, end) range overlaps any of the ranges"""
+    return any(r_start < end and start < r_end for r_start, r_end in ranges)
+
+
+def is_complete(ranges: list[list[int]], size: int) -> bool:
+    if size == 0:
+        return True
+    return ranges == [[0, size]]
+
+
+def try_lock(path: str) -> bool:
+    """Create the lock file, unless it exists and is not stale"""
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(path) > LOCK_TIMEOUT:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+@asynccontextmanager
+async def upload_lock(private_dir: str, upload_id: str) -> AsyncGenerator[None, None]:
+    """Hold the lock of the upload, shared by all server nodes"""
+    path = os.path.join(parts_dir(private_dir, upload_id), "lock")
+    while not try_lock(path):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def copy_chunk(source_path: str, target_path: str, offset: int) -> None:
+    with open(source_path, "rb") as src, open(target_path, "r+b") as dst:
+        dst.seek(offset)
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+async def receive_chunk(
+    private_dir: str,
+    upload_id: str,
+    size: int,
+    offset: int,
+    stream: AsyncIterable[bytes],
+    checksum: str | None = None,
+) -> None:
+    """Stream a chunk of the upload to the disk and write it at the offset
+
+    When the checksum (sha256 of the chunk) is given, the chunk is only
+    written if it matches. Chunks overlapping received data are refused,
+    unless they are the same chunk sent again, which is not written
+    twice. Raises InvalidChunk.
+    """
+    if not 0 <= offset <= size:
+        raise InvalidChunk("Invalid chunk offset")
+
+    temp_name = f"{uuid.uuid4().hex}.tmp"
+    temp_path = os.path.join(parts_dir(private_dir, upload_id), temp_name)
+    try:
+        hasher = hashlib.sha256()
+        length = 0
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for data in stream:
+                length += len(data)
+                if offset + length > size:
+                    raise InvalidChunk("Chunk exceeds the file size")
+                if length > MAX_CHUNK_SIZE:
+                    raise InvalidChunk("Chunk is too large")
+                hasher.update(data)
+                await f.write(data)
+
+        if checksum and hasher.hexdigest() != checksum.lower():
+            raise InvalidChunk("Chunk checksum does not match")
+        end = offset + length
+        if not length:
+            return
+
+        async with upload_lock(private_dir, upload_id):
+            if has_chunk(private_dir, upload_id, offset, end):
+                return
+            if overlaps(received_ranges(private_dir, upload_id), offset, end):
+                raise InvalidChunk("Chunk overlaps received data")
+            await asyncio.to_thread(
+                copy_chunk, temp_path, os.path.join(private_dir, upload_id), offset
+            )
+            record_chunk(private_dir, upload_id, offset, end)
+    finally:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+
+def start_finalizing(private_dir: str, upload_id: str) -> bool:
+    """Mark the upload as being finalized. False if it already was"""
+    path = os.path.join(parts_dir(private_dir, upload_id), "finalize")
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def remove_parts(private_dir: str, upload_id: str) -> None:
+    shutil.rmtree(parts_dir(private_dir, upload_id), ignore_errors=True)
+
+
+def remove_upload(private_dir: str, upload_id: str) -> None:
+    """Remove the file and the parts of an unfinished upload"""
+    remove_parts(private_dir, upload_id)
+    try:
+        os.remove(os.path.join(private_dir, upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def expired_uploads(private_dir: str, max_age: float = UPLOAD_EXPIRY) -> list[str]:
+    """Return IDs of unfinished uploads without any chunk for max_age seconds
+
+    Every received chunk adds a marker to the parts directory,
+    so its modification time is the time of the last activity.
+    """
+    result = []
+    now = time.time()
+    for name in os.listdir(private_dir):
+        upload_id, ext = os.path.splitext(name)
+        if ext != ".parts" or not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+            continue
+        try:
+            if now - os.path.getmtime(os.path.join(private_dir, name)) > max_age:
+                result.append(upload_id)
+        except FileNotFoundError:
+            continue
+    return result
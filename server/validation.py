@@ -0,0 +1,267 @@
+import os
+import gzip
+import json
+import struct
+import zipfile
+
+from typing import Any
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PROJECT_FILES = ["project.json", "database.json", "project.bson", "database.bson"]
+
+ENCODINGS = ["gzip", "zstd"]
+ZIP_MAGIC = b"PK\x03\x04"
+
+ENTITY_TYPES = [
+    "project",
+    "asset",
+    "subset",
+    "version",
+    "hero_version",
+    "representation",
+    "workfile",
+]
+
+# The first entity (usually the project) must fit in this many bytes
+# to be checked. Larger ones are accepted without the check.
+SNIFF_SIZE = 4 * 1024 * 1024
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+def sniff_entity_type(head: bytes) -> str | None:
+    """Return the type of the first entity of a JSON array or JSON lines
+
+    Returns None when the first entity is not complete in the head.
+    Raises InvalidUpload when the data is not an export.
+    """
+    text = head.decode("utf-8", errors="ignore").lstrip()
+    if text.startswith("["):
+        text = text[1:].lstrip()
+    if not text.startswith("{"):
+        raise InvalidUpload("Upload is not a zip archive or a JSON export")
+
+    try:
+        entity, _ = json.JSONDecoder().raw_decode(text)
+    except json.JSONDecodeError:
+        if len(head) < SNIFF_SIZE:
+            raise InvalidUpload("Project file is not valid JSON")
+        return None
+
+    if not isinstance(entity, dict) or "_id" not in entity:
+        raise InvalidUpload("Project file does not contain OpenPype entities")
+    if entity.get("type") not in ENTITY_TYPES:
+        raise InvalidUpload(f"Unexpected entity type {entity.get('type')}")
+    return entity["type"]
+
+
+# Sizes of BSON element values, by element type.
+# Strings (and code, symbols) have a length prefix, documents
+# (and arrays, code with scope) include the size of the prefix.
+BSON_FIXED_SIZES = {
+    0x01: 8,
+    0x06: 0,
+    0x07: 12,
+    0x08: 1,
+    0x09: 8,
+    0x0A: 0,
+    0x10: 4,
+    0x11: 8,
+    0x12: 8,
+    0x13: 16,
+    0x7F: 0,
+    0xFF: 0,
+}
+BSON_ELEMENT_TYPES = {*range(0x01, 0x14), 0x7F, 0xFF}
+BSON_STRING_TYPES = [0x02, 0x0D, 0x0E]
+BSON_DOCUMENT_TYPES = [0x03, 0x04, 0x0F]
+INT32 = struct.Struct("<i")
+
+
+def is_bson(head: bytes) -> bool:
+    """Check whether the data starts with a BSON document (mongodump)"""
+    if len(head) < 5:
+        return False
+    (length,) = INT32.unpack_from(head)
+    return length >= 5 and head[4] in BSON_ELEMENT_TYPES and b"\x00" in head[:64]
+
+
+def read_bson_size(head: bytes, pos: int, minimum: int) -> int:
+    """Read the size prefix of a BSON value
+
+    Sizes below the minimum would move the reader backwards.
+    """
+    (size,) = INT32.unpack_from(head, pos)
+    if size < minimum:
+        raise InvalidUpload("Project file is not valid BSON")
+    return size
+
+
+def sniff_bson_type(head: bytes) -> str | None:
+    """Return the type of the first entity of a mongodump file
+
+    Only the top level elements of the document are read.
+    Returns None when the first document is not complete in the head.
+    Raises InvalidUpload when the data is not an export.
+    """
+    (length,) = INT32.unpack_from(head)
+    if length > len(head):
+        if len(head) < SNIFF_SIZE:
+            raise InvalidUpload("Project file is truncated")
+        return None
+
+    fields: dict[str, str | None] = {}
+    pos, end = 4, length - 1
+    try:
+        while pos < end:
+            element_type = head[pos]
+            name_end = head.index(b"\x00", pos + 1, end)
+            name = head[pos + 1 : name_end].decode("utf-8")
+            pos = name_end + 1
+            if element_type in BSON_FIXED_SIZES:
+                fields[name] = None
+                pos += BSON_FIXED_SIZES[element_type]
+            elif element_type in BSON_STRING_TYPES:
+                size = read_bson_size(head, pos, 1)
+                fields[name] = head[pos + 4 : pos + 3 + size].decode("utf-8")
+                pos += 4 + size
+            elif element_type in BSON_DOCUMENT_TYPES:
+                fields[name] = None
+                pos += read_bson_size(head, pos, 5)
+            elif element_type == 0x05:
+                fields[name] = None
+                pos += 5 + read_bson_size(head, pos, 0)
+            else:
+                # Regular expressions and DB pointers are not expected
+                raise InvalidUpload("Project file is not a supported BSON file")
+    except (ValueError, struct.error):
+        raise InvalidUpload("Project file is not valid BSON")
+
+    if pos != end or head[end] != 0:
+        raise InvalidUpload("Project file is not valid BSON")
+    if "_id" not in fields:
+        raise InvalidUpload("Project file does not contain OpenPype entities")
+    if fields.get("type") not in ENTITY_TYPES:
+        raise InvalidUpload(f"Unexpected entity type {fields.get('type')}")
+    return fields["type"]
+
+
+def read_head(path: str, encoding: str | None) -> bytes | None:
+    """Read the beginning of the decompressed upload
+
+    Returns None when the decompressor is not available.
+    """
+    try:
+        if encoding == "gzip":
+            with gzip.open(path, "rb") as f:
+                return f.read(SNIFF_SIZE)
+        if encoding == "zstd":
+            if zstandard is None:
+                return None
+            with open(path, "rb") as raw:
+                reader = zstandard.ZstdDecompressor().stream_reader(raw)
+                return reader.read(SNIFF_SIZE)
+        with open(path, "rb") as f:
+            return f.read(SNIFF_SIZE)
+    except (OSError, EOFError, ValueError) as e:
+        # zstandard.ZstdError is a ValueError subclass
+        raise InvalidUpload(f"Unable to decompress the upload: {e}")
+
+
+def find_project_files(members: list[zipfile.ZipInfo]) -> list[zipfile.ZipInfo]:
+    """Project files of the archive
+
+    Single project exports have the project file at the root. Archives
+    of many projects have one export per top level directory.
+    """
+    for info in members:
+        if info.filename in PROJECT_FILES:
+            return [info]
+
+    found: dict[str, zipfile.ZipInfo] = {}
+    for info in members:
+        parts = info.filename.split("/")
+        if len(parts) == 2 and parts[1] in PROJECT_FILES:
+            found.setdefault(parts[0], info)
+    return [found[directory] for directory in sorted(found)]
+
+
+def validate_archive(path: str) -> dict[str, Any]:
+    """Check the zip central directory and the project file"""
+    size = os.path.getsize(path)
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise InvalidUpload("Upload is not a zip archive or it is truncated")
+
+    with archive:
+        members = archive.infolist()
+        for info in members:
+            if info.header_offset + info.compress_size > size:
+                raise InvalidUpload("Archive is truncated")
+
+        project_files = find_project_files(members)
+        if not project_files:
+            raise InvalidUpload(
+                f"Archive does not contain a project file ({', '.join(PROJECT_FILES)})"
+            )
+
+        # Only the first project of multi-project archives is checked,
+        # the others are checked when they are imported
+        info = project_files[0]
+
+        try:
+            with archive.open(info) as f:
+                head = f.read(SNIFF_SIZE)
+        except (zipfile.BadZipFile, NotImplementedError, OSError) as e:
+            raise InvalidUpload(f"Unable to read the project file: {e}")
+
+        if is_bson(head):
+            first_type = sniff_bson_type(head)
+        else:
+            first_type = sniff_entity_type(head)
+
+    stats = {
+        "format": "zip",
+        "project_file": info.filename,
+        "project_file_size": info.file_size,
+        "files": len(members),
+        "extracted_size": sum(i.file_size for i in members),
+        "first_entity": first_type,
+    }
+    if "/" in info.filename:
+        stats["projects"] = [i.filename.split("/")[0] for i in project_files]
+    return stats
+
+
+def validate_upload(path: str, encoding: str | None = None) -> dict[str, Any]:
+    """Check the uploaded file before it is queued for import
+
+    Uploads are zip archives, or bare JSON / JSON lines / BSON (mongodump)
+    project files.
+    Both may be compressed (gzip or zstd). Only the zip central directory
+    and the beginning of the project file are read, so it is cheap even
+    for large uploads. Compressed archives can only be checked by their
+    signature, zip needs random access.
+
+    Returns basic stats of the upload.
+    """
+    if encoding is None and zipfile.is_zipfile(path):
+        return validate_archive(path)
+
+    head = read_head(path, encoding)
+    if head is None:
+        return {"format": "unknown"}
+    if head.startswith(ZIP_MAGIC):
+        if encoding is None:
+            raise InvalidUpload("Archive is truncated")
+        return {"format": "zip"}
+    if is_bson(head):
+        return {"format": "bson", "first_entity": sniff_bson_type(head)}
+    return {"format": "json", "first_entity": sniff_entity_type(head)}
@@ -2,62 +2,263 @@ import os
 import logging
 import time
 import shutil
+import sqlite3
 import traceback
 import zipfile
+import multiprocessing
+
+from contextlib import closing
 
 from .common import config
 from .ayon import ayon
+from .resources import can_accept_job
+from .source import fetch_source
+from .compression import decompress_file, extract_archive, is_compressed_archive
+from .artifacts import load_artifacts, restore_artifacts, store_artifacts
+from .progress import ImportCancelled, ProgressReporter
+from .shards import SHARD_TOPIC, enroll_shard, shared_database_path
+from .listener import Backoff, create_listener
+from .scheduler import UPLOAD_TOPIC, enroll_upload, release_job
+from .tiers import TIER_TOPIC, enroll_content
 from .parser import create_sqlite_db
+from .planner import PROJECT_FILES, ImportPlan, JobRefused, plan_import
+from .filters import ImportFilters, apply_filters
+from .multi import fan_out, find_projects
+from .database import MEMORY_DATABASE, is_memory_database, open_database
 from .deploy import deploy_project
 
 from requests.exceptions import HTTPError
 
 
-def process(source_event_id: str, target_event_id: str, user_name: str) -> None:
-    zip_path = "/tmp/source.zip"
-    source_dir = "/tmp/project"
+def process(
+    source_event_id: str,
+    target_event_id: str,
+    user_name: str,
+    watch: list[str] | None = None,
+) -> None:
+    # Each job has its own working directory, so multiple jobs
+    # may run side by side. It is removed when the job ends.
+    job_dir = os.path.join(config.work_dir, target_event_id)
+    if os.path.exists(job_dir):
+        shutil.rmtree(job_dir)
+    os.makedirs(job_dir)
+
+    try:
+        with ProgressReporter(target_event_id, watch=watch) as progress:
+            process_in_dir(
+                source_event_id,
+                target_event_id,
+                user_name,
+                job_dir,
+                progress,
+            )
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        shared_db = shared_database_path(target_event_id)
+        if shared_db and os.path.exists(shared_db):
+            os.remove(shared_db)
+
+
+def process_in_dir(
+    source_event_id: str,
+    target_event_id: str,
+    user_name: str,
+    job_dir: str,
+    progress: ProgressReporter,
+) -> None:
+    source_event = ayon.get(f"events/{source_event_id}")
+    source_summary = source_event.get("summary") or {}
+    checksum = source_summary.get("sha256")
 
-    # delete original files if they exist
-    if os.path.exists(zip_path):
-        os.remove(zip_path)
+    restored = None
+    if artifacts := load_artifacts(checksum):
+        # The same file was processed before. Deploy from the stored
+        # intermediate database instead of parsing the upload again.
+        plan = ImportPlan(**artifacts["plan"])
+        sqlite_path = database_path(plan, target_event_id, job_dir)
+        restored = restore_artifacts(artifacts, sqlite_path, job_dir)
+        if restored is None:
+            logging.info("Stored artifacts were removed, processing the upload")
 
-    if os.path.exists(source_dir):
-        shutil.rmtree(source_dir)
+    if restored is not None:
+        logging.info(f"Reusing artifacts of a previous upload {checksum}")
+        progress.update_summary(plan=plan.dict(), reused=checksum)
+        conn, thumbnail_dir = restored
+        actual_project_name = artifacts["project_name"]
+    else:
+        upload_path = fetch_upload(
+            source_event_id,
+            target_event_id,
+            source_summary,
+            job_dir,
+            progress,
+        )
+        if projects := find_projects(upload_path):
+            sender = f"{config.service_name}-splitter-{os.getpid()}"
+            fan_out(
+                upload_path,
+                projects,
+                source_summary,
+                job_dir,
+                progress,
+                assist=lambda upload_ids: assist_uploads(sender, upload_ids),
+            )
+            return
+
+        plan, sqlite_path, conn, thumbnail_dir, actual_project_name = prepare_source(
+            upload_path,
+            target_event_id,
+            user_name,
+            job_dir,
+            progress,
+        )
+        if config.memory_db_backup or not is_memory_database(sqlite_path):
+            store_artifacts(
+                checksum,
+                conn,
+                thumbnail_dir,
+                actual_project_name,
+                plan.dict(),
+            )
+
+    with closing(conn):
+        deploy_database(
+            conn,
+            sqlite_path,
+            plan,
+            source_event_id,
+            target_event_id,
+            user_name,
+            source_summary,
+            thumbnail_dir,
+            actual_project_name,
+            progress,
+        )
+
+
+def deploy_database(
+    conn: sqlite3.Connection,
+    sqlite_path: str,
+    plan: ImportPlan,
+    source_event_id: str,
+    target_event_id: str,
+    user_name: str,
+    source_summary: dict,
+    thumbnail_dir: str | None,
+    actual_project_name: str,
+    progress: ProgressReporter,
+) -> None:
+
+    # Filters are applied after the artifacts are stored,
+    # so the same upload can be imported again with other filters
+    mode = source_summary.get("mode") or config.import_mode
+    filters = ImportFilters(**(source_summary.get("filters") or {}))
+    if not filters.empty:
+        if mode == "incremental":
+            raise Exception("Import filters cannot be used in incremental mode")
+        progress.update_summary(filters=filters.dict())
+        apply_filters(conn, filters)
+
+    # Only projects imported incrementally need a baseline, other
+    # in-memory imports stay off the disk unless backed up.
+    # A filtered database is not a baseline of the whole project.
+    keep_baseline = filters.empty and (mode == "incremental" or config.memory_db_backup)
+
+    # Update events with actual project name
+
+    ayon.update_event(
+        source_event_id,
+        project=actual_project_name,
+        user=user_name,
+    )
 
     ayon.update_event(
         target_event_id,
         status="in_progress",
+        project=actual_project_name,
+        description="Deploying project",
         user=user_name,
-        decsription="Downloading source file",
     )
 
-    try:
-        ayon.download_private_file(source_event_id, zip_path)
-        assert os.path.getsize(zip_path) > 0, "Source file is empty"
-    except Exception as e:
-        print(e)
-        ayon.update_event(
-            target_event_id,
-            status="failed",
-            description=str(e),
-            user=user_name,
-        )
-        return
+    deploy_project(
+        conn,
+        thumbnail_dir,
+        progress,
+        plan.concurrency,
+        mode,
+        sqlite_path,
+        keep_baseline,
+    )
+
+
+def database_path(plan: ImportPlan, target_event_id: str, job_dir: str) -> str:
+    """Where the intermediate database of the import lives"""
+    if plan.intermediate_db == "memory":
+        return MEMORY_DATABASE
+    return shared_database_path(target_event_id) or os.path.join(job_dir, "project.db")
+
+
+def fetch_upload(
+    source_event_id: str,
+    target_event_id: str,
+    source_summary: dict,
+    job_dir: str,
+    progress: ProgressReporter,
+) -> str:
+    """Fetch the upload. Returns the path of the file to import"""
+    upload_path = fetch_source(
+        source_event_id,
+        target_event_id,
+        source_summary,
+        job_dir,
+        progress,
+    )
+
+    # Compressed archives are unpacked, as zip needs random access.
+    # Bare project files are parsed in place, compressed or not.
+    if is_compressed_archive(upload_path):
+        zip_path = os.path.join(job_dir, "source.unpacked.zip")
+        decompress_file(upload_path, zip_path, progress)
+        upload_path = zip_path
+    return upload_path
+
+
+def prepare_source(
+    upload_path: str,
+    target_event_id: str,
+    user_name: str,
+    job_dir: str,
+    progress: ProgressReporter,
+) -> tuple[ImportPlan, str, sqlite3.Connection, str | None, str]:
+    """Extract and parse the upload
+
+    Returns the import plan, the path of the intermediate database
+    and a connection to it, the thumbnail directory and the name
+    of the project.
+    """
+    source_dir = os.path.join(job_dir, "project")
+
+    plan = plan_import(upload_path)
+    progress.update_summary(plan=plan.dict())
+    if plan.refused:
+        raise JobRefused(plan.refused)
 
     if not os.path.exists(source_dir):
         os.mkdir(source_dir)
 
-    with zipfile.ZipFile(zip_path, "r") as zip_ref:
-        zip_ref.extractall(source_dir)
+    if zipfile.is_zipfile(upload_path):
+        extract_archive(upload_path, source_dir, progress)
 
-    for fname in ["project.json", "database.json"]:
-        source_path = os.path.join(source_dir, fname)
-        if os.path.isfile(source_path):
-            break
+        for fname in PROJECT_FILES:
+            source_path = os.path.join(source_dir, fname)
+            if os.path.isfile(source_path):
+                break
+        else:
+            raise Exception("Project file not found")
     else:
-        raise Exception("Project file not found")
+        source_path = upload_path
 
-    sqlite_path = os.path.join(source_dir, "project.db")
+    sqlite_path = database_path(plan, target_event_id, job_dir)
     thumbnail_dir = os.path.join(source_dir, "thumbnails")
     if not os.path.isdir(thumbnail_dir):
         thumbnail_dir = None
@@ -69,91 +270,171 @@ def process(source_event_id: str, target_event_id: str, user_name: str) -> None:
         user=user_name,
     )
 
-    actual_project_name = create_sqlite_db(source_path, sqlite_path)
+    conn = open_database(sqlite_path)
+    try:
+        actual_project_name = create_sqlite_db(source_path, conn, progress)
+    except BaseException:
+        conn.close()
+        raise
+    return plan, sqlite_path, conn, thumbnail_dir, actual_project_name
 
-    assert os.path.isfile(sqlite_path), "SQLite database could not be created"
 
-    # Update events with actual project name
+def worker(sender: str) -> None:
+    logging.info(f"Starting import worker {sender}")
 
-    ayon.update_event(
-        source_event_id,
-        project=actual_project_name,
-        user=user_name,
-    )
-
-    ayon.update_event(
-        target_event_id,
-        status="in_progress",
-        project=actual_project_name,
-        description="Deploying project",
-        user=user_name,
-    )
+    # Enroll as soon as the listener reports a new upload.
+    # Polling with backoff is kept as a fallback in case
+    # the listener is not available or misses an event.
 
-    deploy_project(sqlite_path, thumbnail_dir)
+    listener = create_listener([UPLOAD_TOPIC, SHARD_TOPIC, TIER_TOPIC])
+    backoff = Backoff(config.poll_interval, config.max_poll_interval)
 
+    def idle() -> None:
+        delay = backoff.next()
+        if listener is None:
+            time.sleep(delay)
+        elif listener.wait(delay):
+            backoff.reset()
 
-def main():
-    logging.info(f"Starting import processor as {config.service_name}")
     while True:
-        req = {
-            "sourceTopic": "openpype_import.upload",
-            "targetTopic": "openpype_import.process",
-            "sender": config.service_name,
-            "description": "Importing project",
-        }
-        try:
-            res = ayon.post("enroll", json=req)
-        except Exception as e:
-            print(e)
+        if not can_accept_job():
             time.sleep(5)
             continue
 
+        try:
+            # Shards belong to imports that are already running,
+            # so they are picked before new uploads
+            if enroll_shard(sender):
+                backoff.reset()
+                continue
+            res = enroll_upload(sender)
+        except Exception:
+            logging.exception("Unable to enroll on a job")
+            idle()
+            continue
+
         if res is None:
-            time.sleep(5)
+            # Background tiers of imported projects have the lowest
+            # priority, they are picked only when no upload is waiting
+            try:
+                if enroll_content(sender):
+                    backoff.reset()
+                    continue
+            except Exception:
+                logging.exception("Unable to enroll a content tier job")
+            idle()
             continue
 
-        source_event_id = res["dependsOn"]
-        target_event_id = res["id"]
-        source_event = ayon.get(f"events/{source_event_id}")
-        project_name = source_event["project"]
-        user_name = source_event["user"]
+        backoff.reset()
+        run_upload(res)
 
-        ayon.update_event(
-            target_event_id,
-            project=project_name,
-            user=user_name,
-            description="Waiting for source file",
-            status="in_progress",
-        )
 
-        error_msg = "Unknown error"
-        payload = None
-        try:
-            process(source_event_id, target_event_id, user_name)
-        except HTTPError as e:
-            # load error message from response
-            error_msg = e.response.json()["detail"]
-            logging.error(f"API error: {error_msg}")
-
-        except Exception as e:
-            logging.exception("Error while processing")
-            error_msg = str(e)
-            payload = {"traceback": traceback.format_exc()}
-        else:
+def run_upload(res: dict) -> None:
+    """Process an upload enrolled on and set the final status"""
+    source_event_id = res["dependsOn"]
+    target_event_id = res["id"]
+    source_event = ayon.get(f"events/{source_event_id}")
+    project_name = source_event["project"]
+    user_name = source_event["user"]
+
+    # Projects split from an archive stop with the import of the archive
+    parent = (source_event.get("summary") or {}).get("parent")
+    watch = [parent] if parent else None
+
+    ayon.update_event(
+        target_event_id,
+        project=project_name,
+        user=user_name,
+        description="Waiting for source file",
+        status="in_progress",
+    )
+
+    error_msg = "Unknown error"
+    payload = None
+    try:
+        process(source_event_id, target_event_id, user_name, watch)
+    except ImportCancelled as e:
+        # Restarted events are enrolled again, aborted ones stay aborted.
+        # Either way, the status set from the server is kept.
+        logging.warning(str(e))
+        if e.event_id != target_event_id:
+            # The import of the archive was cancelled
             ayon.update_event(
                 target_event_id,
-                status="finished",
-                user=user_name,
-                description="Successfully imported",
+                status="aborted",
+                description=f"Import of the archive {e.status}",
             )
-            continue
+        elif e.status == "aborted":
+            ayon.update_event(target_event_id, description="Import aborted")
+        return
+    except JobRefused as e:
+        # Restarted events are enrolled again, by a node with more room
+        logging.warning(f"Releasing the upload: {e}")
+        release_job(source_event_id, target_event_id, str(e))
+        return
+    except HTTPError as e:
+        # load error message from response
+        error_msg = e.response.json()["detail"]
+        logging.error(f"API error: {error_msg}")
 
+    except Exception as e:
+        logging.exception("Error while processing")
+        error_msg = str(e)
+        payload = {"traceback": traceback.format_exc()}
+    else:
         ayon.update_event(
             target_event_id,
-            status="failed",
-            description=error_msg,
-            payload=payload,
+            status="finished",
+            user=user_name,
+            description="Successfully imported",
         )
+        return
+
+    ayon.update_event(
+        target_event_id,
+        status="failed",
+        description=error_msg,
+        payload=payload,
+    )
+
+
+def assist_uploads(sender: str, upload_ids: set[str]) -> bool:
+    """Process one of the waiting uploads. Returns False if there is none
+
+    Nothing is enrolled while the node has no room for another job.
+    """
+    if not can_accept_job():
+        return False
+    if (res := enroll_upload(sender, upload_ids)) is None:
+        return False
+    run_upload(res)
+    return True
+
+
+def main():
+    logging.info(f"Starting import processor as {config.service_name}")
+    os.makedirs(config.work_dir, exist_ok=True)
+
+    if config.max_jobs < 2:
+        worker(config.service_name)
+        return
+
+    # Every job slot is a separate process enrolling on its own,
+    # so one long import does not block the jobs queued behind it.
+
+    slots: dict[str, multiprocessing.Process] = {}
+    while True:
+        for i in range(config.max_jobs):
+            sender = f"{config.service_name}-{i}"
+            slot = slots.get(sender)
+            if slot is not None and slot.is_alive():
+                continue
+            if slot is not None:
+                logging.warning(f"Worker {sender} exited ({slot.exitcode})")
+            slot = multiprocessing.Process(target=worker, args=(sender,), name=sender)
+            slot.start()
+            slots[sender] = slot
+        time.sleep(5)
 
 
 if __name__ == "__main__":
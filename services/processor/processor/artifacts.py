@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import logging
+import sqlite3
+
+from contextlib import contextmanager
+
+from typing import Any, Generator
+
+from .common import config
+from .database import backup_database, is_memory_database, load_database, open_database
+from .resources import MB
+from .schema import SCHEMA_VERSION
+
+# Artifacts of processed uploads
+#
+# Uploads are identified by the sha256 computed by the server while
+# uploading. When the same export is uploaded again (typically after
+# a failed deploy), the intermediate database and the thumbnails are
+# reused, so the download, extraction and parsing are skipped.
+#
+# The cache is opt-in (ARTIFACT_DIR) and limited by size. Reused
+# artifacts are copied to the job directory while holding a shared
+# lock, which keeps pruning from removing them mid-copy.
+
+LOCK_FILE = "lock"
+
+
+def artifact_path(checksum: str) -> str | None:
+    if not config.artifact_dir:
+        return None
+    return os.path.join(config.artifact_dir, checksum)
+
+
+@contextmanager
+def artifact_lock(path: str, exclusive: bool = False) -> Generator[bool, None, None]:
+    """Lock the artifacts of an upload
+
+    Yields False when an exclusive lock is requested and the artifacts
+    are in use. Shared locks wait for the exclusive ones.
+    """
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        try:
+            if exclusive:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fcntl.flock(f, fcntl.LOCK_SH)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def directory_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return size
+
+
+def load_artifacts(checksum: str | None) -> dict[str, Any] | None:
+    """Return metadata of stored artifacts of the upload
+
+    Returns None when there is nothing to reuse, or when the
+    intermediate database is forced to be created again.
+    """
+    if not checksum or config.force:
+        return None
+    if (path := artifact_path(checksum)) is None:
+        return None
+
+    meta_path = os.path.join(path, "meta.json")
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # Databases of an older schema are parsed again
+    if meta.get("schema") != SCHEMA_VERSION:
+        return None
+    if not os.path.isfile(os.path.join(path, "project.db")):
+        return None
+
+    # Mark as recently used, so it survives pruning
+    os.utime(meta_path)
+
+    meta["sqlite_path"] = os.path.join(path, "project.db")
+    thumbnail_dir = os.path.join(path, "thumbnails")
+    meta["thumbnail_dir"] = thumbnail_dir if os.path.isdir(thumbnail_dir) else None
+    return meta
+
+
+def store_artifacts(
+    checksum: str | None,
+    conn: sqlite3.Connection,
+    thumbnail_dir: str | None,
+    project_name: str,
+    plan: dict[str, Any],
+) -> None:
+    """Keep the intermediate database and thumbnails of the upload"""
+    if not checksum or (path := artifact_path(checksum)) is None:
+        return
+    if plan.get("database_size", 0) > config.artifact_max_size * MB:
+        logging.info("Intermediate database exceeds the artifact size limit")
+        return
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp_path, exist_ok=True)
+        backup_database(conn, os.path.join(tmp_path, "project.db"))
+        if thumbnail_dir:
+            shutil.copytree(thumbnail_dir, os.path.join(tmp_path, "thumbnails"))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "project_name": project_name,
+                    "plan": plan,
+                    "schema": SCHEMA_VERSION,
+                    "created_at": time.time(),
+                },
+                f,
+            )
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+    except (OSError, sqlite3.Error):
+        # Caching is an optimization only, the import goes on
+        logging.exception("Unable to store upload artifacts")
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    prune_artifacts()
+
+
+def restore_artifacts(
+    artifacts: dict[str, Any],
+    sqlite_path: str,
+    job_dir: str,
+) -> tuple[sqlite3.Connection, str | None] | None:
+    """Copy the stored database and thumbnails to the job
+
+    Returns a connection to the copy of the database and the copied
+    thumbnail directory, the stored ones stay untouched. Returns None
+    when the artifacts were pruned or replaced since they were loaded,
+    the upload is then processed again.
+    """
+    path = os.path.dirname(artifacts["sqlite_path"])
+    thumbnail_dir = None
+    try:
+        with artifact_lock(path):
+            if not os.path.isfile(artifacts["sqlite_path"]):
+                return None
+            if artifacts["thumbnail_dir"]:
+                thumbnail_dir = os.path.join(job_dir, "project", "thumbnails")
+                shutil.copytree(artifacts["thumbnail_dir"], thumbnail_dir)
+            if is_memory_database(sqlite_path):
+                return load_database(artifacts["sqlite_path"]), thumbnail_dir
+            os.makedirs(os.path.dirname(sqlite_path), exist_ok=True)
+            shutil.copyfile(artifacts["sqlite_path"], sqlite_path)
+    except FileNotFoundError:
+        # Pruned before the lock was taken, or replaced by a newer copy
+        if thumbnail_dir:
+            shutil.rmtree(thumbnail_dir, ignore_errors=True)
+        if not is_memory_database(sqlite_path) and os.path.exists(sqlite_path):
+            os.remove(sqlite_path)
+        return None
+    return open_database(sqlite_path), thumbnail_dir
+
+
+def prune_artifacts() -> None:
+    """Remove least recently used artifacts over the size limit
+
+    Baselines of incremental imports count towards the limit too.
+    Artifacts being copied to a job are skipped.
+    """
+    if not config.artifact_dir:
+        return
+
+    entries = []
+    for name in os.listdir(config.artifact_dir):
+        meta_path = os.path.join(config.artifact_dir, name, "meta.json")
+        try:
+            entries.append((os.path.getmtime(meta_path), name))
+        except OSError:
+            continue
+
+    baseline_dir = os.path.join(config.artifact_dir, "baselines")
+    if os.path.isdir(baseline_dir):
+        for name in os.listdir(baseline_dir):
+            try:
+                mtime = os.path.getmtime(os.path.join(baseline_dir, name))
+            except OSError:
+                continue
+            entries.append((mtime, os.path.join("baselines", name)))
+
+    entries.sort(reverse=True)
+    total = 0
+    for _, name in entries:
+        path = os.path.join(config.artifact_dir, name)
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+            if total > config.artifact_max_size * MB:
+                logging.info(f"Removing baseline {name}")
+                os.remove(path)
+            continue
+
+        total += directory_size(path)
+        if total <= config.artifact_max_size * MB:
+            continue
+        with artifact_lock(path, exclusive=True) as locked:
+            if not locked:
+                continue
+            logging.info(f"Removing artifacts of upload {name}")
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import logging
+import importlib.util
+
+from typing import Any, Callable
+
+from .ayon import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_RETRIES, GraphQLResponse
+from .common import config
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncAyon:
+    """Asyncio counterpart of the Ayon client
+
+    Provides the same surface (`request`, `gql`, `update_event`,
+    `download_private_file` and HTTP method shortcuts), so many
+    requests can be in flight at once over a shared connection pool.
+    With HTTP/2 enabled (requires the `h2` package), concurrent
+    requests are multiplexed over a single connection.
+    """
+
+    def __init__(
+        self,
+        pool_size: int | None = None,
+        http2: bool | None = None,
+    ):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the async client")
+
+        pool_size = pool_size or config.http_pool_size
+        http2 = config.http2 if http2 is None else http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logging.warning("h2 is not installed. Using HTTP/1.1")
+            http2 = False
+
+        self.server_url = config.server_url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "X-Api-Key": config.api_key,
+            },
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=config.http_keepalive,
+            ),
+            timeout=httpx.Timeout(60, connect=10),
+            http2=http2,
+        )
+
+    async def __aenter__(self) -> "AsyncAyon":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def gql(self, query, **kwargs):
+        data = {"query": query, "variables": kwargs}
+        response = await self.client.post(self.server_url + "/graphql", json=data)
+        return GraphQLResponse(**response.json())
+
+    async def request(self, method, endpoint, **kwargs):
+        response = await self.client.request(
+            method, self.server_url + "/api/" + endpoint, **kwargs
+        )
+        response.raise_for_status()
+        if response.status_code in [204, 201]:
+            return None
+        return response.json()
+
+    async def get(self, endpoint: str, **kwargs: Any):
+        return await self.request("get", endpoint, **kwargs)
+
+    async def post(self, endpoint: str, **kwargs: Any):
+        return await self.request("post", endpoint, **kwargs)
+
+    async def put(self, endpoint: str, **kwargs: Any):
+        return await self.request("put", endpoint, **kwargs)
+
+    async def patch(self, endpoint: str, **kwargs: Any):
+        return await self.request("patch", endpoint, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs: Any):
+        return await self.request("delete", endpoint, **kwargs)
+
+    async def update_event(self, event_id: str, **kwargs: Any):
+        return await self.patch(f"events/{event_id}", json=kwargs)
+
+    async def download_private_file(
+        self,
+        source_path: str,
+        target_path: str,
+        expected_size: int | None = None,
+        checksum: str | None = None,
+        on_progress: Callable[[int, int | None], None] | None = None,
+    ) -> dict[str, Any]:
+        """Stream an uploaded file to the disk, resuming broken downloads
+
+        See `Ayon.download_private_file`
+        """
+        url = (
+            f"{self.server_url}/api/addons/{config.addon_name}/"
+            f"{config.addon_version}/download/{source_path}"
+        )
+        hasher = hashlib.sha256()
+        received = 0
+        total = None
+        failures = 0
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+
+        with open(target_path, "wb") as f:
+            while True:
+                headers = {"Range": f"bytes={received}-"} if received else {}
+                try:
+                    async with self.client.stream("GET", url, headers=headers) as res:
+                        res.raise_for_status()
+                        if received and res.status_code != 206:
+                            f.seek(0)
+                            f.truncate()
+                            hasher = hashlib.sha256()
+                            received = 0
+
+                        if content_range := res.headers.get("Content-Range"):
+                            total = int(content_range.split("/")[-1])
+                        elif content_length := res.headers.get("Content-Length"):
+                            total = received + int(content_length)
+
+                        async for chunk in res.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            received += len(chunk)
+                            if on_progress:
+                                on_progress(received, total)
+
+                    if total is None or received >= total:
+                        break
+                    raise httpx.RemoteProtocolError("Connection closed early")
+
+                except httpx.TransportError as e:
+                    failures += 1
+                    if failures > DOWNLOAD_RETRIES:
+                        raise
+                    logging.warning(
+                        f"Download interrupted at {received} bytes: {e}. Resuming"
+                    )
+                    await asyncio.sleep(min(2**failures, 30))
+
+        elapsed = loop.time() - start_time
+
+        if expected_size is not None and received != expected_size:
+            raise Exception(
+                f"Downloaded {received} bytes, expected {expected_size} bytes"
+            )
+
+        digest = hasher.hexdigest()
+        if checksum and digest != checksum:
+            raise Exception("Checksum of the downloaded file does not match")
+
+        return {
+            "size": received,
+            "sha256": digest,
+            "seconds": round(elapsed, 2),
+            "throughput": round(received / max(elapsed, 0.001)),
+        }
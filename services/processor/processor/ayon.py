@@ -1,7 +1,15 @@
+import time
+import hashlib
+import logging
 import requests
-from typing import Any
+
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable
 from .common import config
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 10
+
 
 class GraphQLResponse:
     def __init__(self, **response):
@@ -27,6 +35,12 @@ class Ayon:
         self.server_url = config.server_url.rstrip("/")
         self.access_token = config.api_key
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=config.http_pool_size,
+            pool_maxsize=config.http_pool_size,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update(
             {
                 "Content-Type": "application/json",
@@ -48,19 +62,122 @@ class Ayon:
             return None
         return response.json()
 
-    def __getattr__(self, method: str):
-        def wrapper(endpoint: str, **kwargs: dict[str, Any]):
-            return self.request(method, endpoint, **kwargs)
+    def get(self, endpoint: str, **kwargs: Any):
+        return self.request("get", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs: Any):
+        return self.request("post", endpoint, **kwargs)
+
+    def put(self, endpoint: str, **kwargs: Any):
+        return self.request("put", endpoint, **kwargs)
+
+    def patch(self, endpoint: str, **kwargs: Any):
+        return self.request("patch", endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs: Any):
+        return self.request("delete", endpoint, **kwargs)
+
+    @property
+    def addon_endpoint(self) -> str:
+        """Addon endpoint path to be used with the request methods"""
+        return f"addons/{config.addon_name}/{config.addon_version}"
+
+    @property
+    def addon_url(self) -> str:
+        return (
+            f"{self.server_url}/api/addons/{config.addon_name}/{config.addon_version}"
+        )
+
+    def download_private_file(
+        self,
+        source_path: str,
+        target_path: str,
+        expected_size: int | None = None,
+        checksum: str | None = None,
+        on_progress: Callable[[int, int | None], None] | None = None,
+    ) -> dict[str, Any]:
+        """Stream an uploaded file from the addon to the disk
+
+        The file is written in chunks, so memory use does not depend
+        on the file size. When the connection breaks, the download
+        resumes from the last received byte using a HTTP Range request.
 
-        return wrapper
+        The result is verified against the expected size and sha256
+        checksum (when provided). Returns download statistics.
+        """
+        url = f"{self.addon_url}/download/{source_path}"
+        hasher = hashlib.sha256()
+        received = 0
+        total = None
+        failures = 0
+        start_time = time.monotonic()
 
-    def download_private_file(self, source_path: str, target_path: str):
-        url = f"{self.server_url}/addons/{config.addon_name}/{config.addon_version}"
-        url += f"/private/{source_path}"
-        res = requests.get(url, stream=True, headers={"X-Api-Key": self.access_token})
-        res.raise_for_status()
         with open(target_path, "wb") as f:
-            f.write(res.content)
+            while True:
+                headers = {"Range": f"bytes={received}-"} if received else {}
+                try:
+                    with self.session.get(
+                        url,
+                        headers=headers,
+                        stream=True,
+                        timeout=(10, 60),
+                    ) as res:
+                        res.raise_for_status()
+                        if received and res.status_code != 206:
+                            # Range is not supported. Start over
+                            f.seek(0)
+                            f.truncate()
+                            hasher = hashlib.sha256()
+                            received = 0
+
+                        if content_range := res.headers.get("Content-Range"):
+                            total = int(content_range.split("/")[-1])
+                        elif content_length := res.headers.get("Content-Length"):
+                            total = received + int(content_length)
+
+                        for chunk in res.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            received += len(chunk)
+                            if on_progress:
+                                on_progress(received, total)
+
+                    # Without a known length, the end of the stream
+                    # is the end of the file
+                    if total is None or received >= total:
+                        break
+                    raise requests.ConnectionError("Connection closed early")
+
+                except (
+                    requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                ) as e:
+                    failures += 1
+                    if failures > DOWNLOAD_RETRIES:
+                        raise
+                    logging.warning(
+                        f"Download interrupted at {received} bytes: {e}. Resuming"
+                    )
+                    time.sleep(min(2**failures, 30))
+
+        elapsed = time.monotonic() - start_time
+
+        if expected_size is not None and received != expected_size:
+            raise Exception(
+                f"Downloaded {received} bytes, expected {expected_size} bytes"
+            )
+
+        digest = hasher.hexdigest()
+        if checksum and digest != checksum:
+            raise Exception("Checksum of the downloaded file does not match")
+
+        return {
+            "size": received,
+            "sha256": digest,
+            "seconds": round(elapsed, 2),
+            "throughput": round(received / max(elapsed, 0.001)),
+        }
 
     def update_event(self, event_id: str, **kwargs: dict[str, Any]):
         return self.patch(f"events/{event_id}", json=kwargs) 
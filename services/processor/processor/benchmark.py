@@ -0,0 +1,87 @@
+"""Compare the sync and async clients on many small operations requests
+
+Creates a scratch project, sends the given number of single-folder
+operations requests with both clients and deletes the project.
+
+Usage: python -m processor.benchmark [requests] [concurrency]
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import logging
+
+from .ayon import ayon
+from .async_ayon import AsyncAyon
+
+
+def folder_operation(name: str) -> dict:
+    return {
+        "type": "create",
+        "entityType": "folder",
+        "entityId": uuid.uuid4().hex,
+        "data": {"name": name, "folderType": "Folder"},
+    }
+
+
+def bench_sync(project_name: str, count: int) -> float:
+    start_time = time.monotonic()
+    for i in range(count):
+        ayon.post(
+            f"projects/{project_name}/operations",
+            json={"operations": [folder_operation(f"sync_{i}")], "canFail": True},
+        )
+    return time.monotonic() - start_time
+
+
+async def bench_async(
+    project_name: str,
+    count: int,
+    concurrency: int,
+    http2: bool,
+) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    prefix = "h2" if http2 else "async"
+
+    async with AsyncAyon(pool_size=concurrency, http2=http2) as client:
+
+        async def send(i: int) -> None:
+            async with semaphore:
+                await client.post(
+                    f"projects/{project_name}/operations",
+                    json={
+                        "operations": [folder_operation(f"{prefix}_{i}")],
+                        "canFail": True,
+                    },
+                )
+
+        start_time = time.monotonic()
+        await asyncio.gather(*(send(i) for i in range(count)))
+        return time.monotonic() - start_time
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    project_name = f"import_benchmark_{int(time.time())}"
+    ayon.post("projects", json={"name": project_name, "code": "bench"})
+    try:
+        results = [("sync (requests)", bench_sync(project_name, count))]
+        for http2 in (False, True):
+            label = f"async x{concurrency} ({'HTTP/2' if http2 else 'HTTP/1.1'})"
+            elapsed = asyncio.run(bench_async(project_name, count, concurrency, http2))
+            results.append((label, elapsed))
+    finally:
+        ayon.delete(f"projects/{project_name}")
+
+    for label, elapsed in results:
+        logging.info(
+            f"{label:<28} {count} requests in {elapsed:6.2f}s "
+            f"({count / elapsed:7.1f} req/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 import logging
 import sqlite3
 
+from .tree import has_folder_tree
+
 
 def run_checks(conn: sqlite3.Connection):
     cursor = conn.cursor()
 
     cursor.execute(
         """
-        SELECT count(id) FROM entities WHERE type = 'hero_version'
-        AND source_version IS NOT NULL
-        AND source_version NOT IN
-            (SELECT id FROM entities WHERE type = 'version')
+        SELECT count(id) FROM hero_versions
+        WHERE source_version IS NOT NULL
+        AND source_version NOT IN (SELECT id FROM versions)
         """
     )
     orphaned_hero_versions = cursor.fetchone()[0]
@@ -18,7 +19,7 @@ def run_checks(conn: sqlite3.Connection):
     # get all hero versions count
     cursor.execute(
         """
-        SELECT count(id) FROM entities WHERE type = 'hero_version'
+        SELECT count(id) FROM hero_versions
         """
     )
     hero_versions = cursor.fetchone()[0]
@@ -28,3 +29,15 @@ def run_checks(conn: sqlite3.Connection):
             f"{orphaned_hero_versions} of {hero_versions} hero "
             "versions have no source version"
         )
+
+    # Folders missing in the folder tree have no path to the root
+    # (their parent does not exist) and are not deployed
+    if has_folder_tree(conn):
+        cursor.execute(
+            """
+            SELECT count(id) FROM assets
+            WHERE id NOT IN (SELECT id FROM folder_tree)
+            """
+        )
+        if unreachable_folders := cursor.fetchone()[0]:
+            logging.warning(f"{unreachable_folders} folders have no parent folder")
@@ -1,4 +1,5 @@
 import socket
+import hashlib
 import logging
 import uuid
 
@@ -13,9 +14,19 @@ handler.setFormatter(logging.Formatter("%(message)s"))
 logging.basicConfig(level="INFO", handlers=[handler])
 
 
+OID_NAMESPACE = uuid.NAMESPACE_OID.bytes
+
+
 def mongoid2uuid(mongoid: str) -> str:
-    """Convert a MongoDB ID to a UUID"""
-    return uuid.uuid5(uuid.NAMESPACE_OID, mongoid).hex
+    """Convert a MongoDB ID to a UUID
+
+    Same as uuid.uuid5(uuid.NAMESPACE_OID, mongoid).hex, without
+    the UUID object, as it is called for every ID of the project.
+    """
+    digest = bytearray(hashlib.sha1(OID_NAMESPACE + mongoid.encode()).digest()[:16])
+    digest[6] = digest[6] & 0x0F | 0x50
+    digest[8] = digest[8] & 0x3F | 0x80
+    return digest.hex()
 
 
 class Config(BaseSettings):
@@ -48,6 +59,155 @@ class Config(BaseSettings):
         env="ayon_service_name",
     )
 
+    work_dir: str = Field(
+        "/tmp/openpype_import",
+        title="Working directory",
+        description="Directory where per-job working directories are created",
+    )
+    max_jobs: int = Field(
+        1,
+        title="Concurrent jobs",
+        description="Number of import jobs processed in parallel",
+    )
+    min_free_memory: int = Field(
+        1024,
+        title="Minimum free memory",
+        description="Available memory (MB) required to accept a new job",
+    )
+    min_free_disk: int = Field(
+        10240,
+        title="Minimum free disk space",
+        description="Free space (MB) in the working directory "
+        "required to accept a new job",
+    )
+
+    shared_private_dir: str | None = Field(
+        None,
+        title="Shared private directory",
+        description="Path where the addon private directory is mounted. "
+        "Uploads found there are used directly instead of downloading them",
+    )
+    artifact_dir: str | None = Field(
+        None,
+        title="Artifact directory",
+        description="Intermediate databases and thumbnails of processed "
+        "uploads are kept there, so uploading the same export again "
+        "skips the download and parsing. Disabled when empty",
+    )
+    artifact_max_size: int = Field(
+        10240,
+        title="Artifact size limit",
+        description="Size (MB) of the artifact directory. Least recently "
+        "used uploads are removed to stay under it",
+    )
+    shard_dir: str | None = Field(
+        None,
+        title="Shard directory",
+        description="Directory shared by all processor replicas. "
+        "Intermediate databases are stored there, so other replicas "
+        "can help deploying large projects",
+    )
+    shards: int = Field(
+        0,
+        title="Shards",
+        description="Number of work units large projects are split to "
+        "after the folder stage. 0 disables sharding",
+    )
+    shard_min_entities: int = Field(
+        100000,
+        title="Minimum entities to shard",
+        description="Projects with fewer entities are deployed by one processor",
+    )
+    shard_timeout: int = Field(
+        600,
+        title="Shard timeout",
+        description="Seconds without progress after which a shard is "
+        "considered stalled and restarted on another replica",
+    )
+    http_pool_size: int = Field(
+        20,
+        title="HTTP pool size",
+        description="Maximum number of connections kept open to the server",
+    )
+    http_keepalive: float = Field(
+        30.0,
+        title="HTTP keep-alive",
+        description="Seconds an idle connection is kept open (async client)",
+    )
+    http2: bool = Field(
+        False,
+        title="HTTP/2",
+        description="Multiplex requests over HTTP/2 (async client)",
+    )
+    deploy_concurrency: int = Field(
+        4,
+        title="Deploy concurrency",
+        description="Maximum number of operation batches sent at once "
+        "(async client)",
+    )
+    memory_db_limit: int = Field(
+        1024,
+        title="In-memory database limit",
+        description="Intermediate databases estimated to be smaller (MB) "
+        "are kept in memory",
+    )
+    memory_db_backup: bool = Field(
+        False,
+        title="Back up in-memory databases",
+        description="Store in-memory databases in the artifact directory, "
+        "so the same upload is not parsed again, and keep baselines of all "
+        "imports, not only incremental ones",
+    )
+
+    scheduling: str = Field(
+        "sjf",
+        title="Scheduling policy",
+        description="'sjf' to enroll on the smallest waiting upload first, "
+        "'fifo' to enroll in the upload order",
+    )
+    queue_aging: float = Field(
+        600,
+        title="Queue aging",
+        description="Size (MB) an upload is treated as smaller by "
+        "for every minute it waits, so large uploads are not starved",
+    )
+    size_class: str = Field(
+        "any",
+        title="Size class",
+        description="'small' or 'large' to enroll only on uploads smaller "
+        "or not smaller than large_job_size, 'any' to take all of them",
+    )
+    large_job_size: int = Field(
+        5120,
+        title="Large job size",
+        description="Uploads of this size (MB) or larger are large jobs",
+    )
+
+    pickup_mode: str = Field(
+        "websocket",
+        title="Job pickup mode",
+        description="'websocket' to enroll as soon as an upload is finished, "
+        "'poll' to rely on polling only",
+    )
+    poll_interval: float = Field(
+        1.0,
+        title="Poll interval",
+        description="Initial delay (seconds) between enroll attempts when idle",
+    )
+    max_poll_interval: float = Field(
+        60.0,
+        title="Maximum poll interval",
+        description="Upper bound (seconds) of the enroll backoff",
+    )
+
+    import_mode: str = Field(
+        "full",
+        title="Import mode",
+        description="Default for uploads not choosing one. 'full' replaces "
+        "the project, 'incremental' sends only changes since the previous "
+        "import of the same project, 'staged' replaces it when finished, "
+        "'tiered' makes it usable before versions are deployed",
+    )
     force: bool = Field(
         False,
         title="Force",
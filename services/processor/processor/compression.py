@@ -0,0 +1,114 @@
+import io
+import os
+import gzip
+import zipfile
+
+from contextlib import contextmanager
+from typing import BinaryIO, Generator
+
+from .progress import ProgressReporter
+from .resources import MB
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZIP_MAGIC = b"PK\x03\x04"
+
+COPY_CHUNK_SIZE = 4 * MB
+
+
+def detect_encoding(path: str) -> str | None:
+    """Return 'gzip' or 'zstd' for compressed files, None otherwise"""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic == ZSTD_MAGIC:
+        return "zstd"
+    return None
+
+
+@contextmanager
+def open_source(path: str) -> Generator[tuple[BinaryIO, BinaryIO], None, None]:
+    """Open a possibly compressed file for reading
+
+    Yields the decompressed stream and the underlying file. Position
+    of the underlying file tells how much of the file was consumed,
+    which is what progress is estimated from.
+    """
+    with open(path, "rb") as raw:
+        encoding = detect_encoding(path)
+        if encoding == "gzip":
+            with gzip.GzipFile(fileobj=raw) as stream:
+                yield stream, raw
+        elif encoding == "zstd":
+            if zstandard is None:
+                raise Exception("zstandard package is needed to read zstd files")
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                raw, read_across_frames=True
+            )
+            with io.BufferedReader(reader, COPY_CHUNK_SIZE) as stream:
+                yield stream, raw
+        else:
+            yield raw, raw
+
+
+def is_compressed_archive(path: str) -> bool:
+    """Check whether the file is a compressed zip archive"""
+    if detect_encoding(path) is None:
+        return False
+    with open_source(path) as (stream, _):
+        return stream.read(4) == ZIP_MAGIC
+
+
+def decompress_file(
+    source_path: str,
+    target_path: str,
+    progress: ProgressReporter | None = None,
+) -> None:
+    """Decompress the file, reporting progress of the compressed input"""
+    if progress:
+        progress.start("Decompressing source file", unit="MB", scale=MB)
+    total = os.path.getsize(source_path)
+    with open_source(source_path) as (stream, raw), open(target_path, "wb") as f:
+        while chunk := stream.read(COPY_CHUNK_SIZE):
+            f.write(chunk)
+            if progress:
+                progress.update(raw.tell(), total)
+                progress.check()
+
+
+def extract_archive(
+    archive_path: str,
+    target_dir: str,
+    progress: ProgressReporter | None = None,
+) -> None:
+    """Extract the zip archive, reporting progress of the extracted bytes
+
+    Members are copied in chunks with a cancellation checkpoint
+    between them, a single project file may have many gigabytes.
+    """
+    root = os.path.realpath(target_dir)
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        members = archive.infolist()
+        if progress:
+            progress.start("Extracting archive", unit="MB", scale=MB)
+            progress.update(0, sum(info.file_size for info in members))
+        for info in members:
+            target_path = os.path.realpath(os.path.join(root, info.filename))
+            if not target_path.startswith(root + os.sep):
+                raise Exception(f"Invalid path in the archive: {info.filename}")
+            if info.is_dir():
+                os.makedirs(target_path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with archive.open(info) as src, open(target_path, "wb") as dst:
+                while chunk := src.read(COPY_CHUNK_SIZE):
+                    dst.write(chunk)
+                    if progress:
+                        progress.advance(len(chunk))
+                        progress.check()
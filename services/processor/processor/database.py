@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+from contextlib import closing
+
+from . import payload, schema
+
+# Intermediate database
+#
+# Small and medium projects are parsed to an in-memory database
+# (see ImportPlan.intermediate_db), which is handed to the deploy
+# as is. Databases are copied to files, for artifacts, baselines
+# and background jobs, using the SQLite backup API, which works
+# the same for both.
+
+MEMORY_DATABASE = ":memory:"
+
+
+def open_database(path: str, uri: bool = False) -> sqlite3.Connection:
+    """Open an intermediate database, MEMORY_DATABASE for a new in-memory one"""
+    conn = sqlite3.connect(path, uri=uri)
+    payload.register_functions(conn)
+    schema.register_functions(conn)
+    return conn
+
+
+def is_memory_database(path: str | None) -> bool:
+    return path == MEMORY_DATABASE
+
+
+def backup_database(conn: sqlite3.Connection, path: str) -> None:
+    """Copy the database to a file
+
+    The copy is written next to the target and moved in place,
+    so readers never see an incomplete file.
+    """
+    conn.commit()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with closing(sqlite3.connect(tmp_path)) as target:
+            conn.backup(target)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_database(path: str) -> sqlite3.Connection:
+    """Open an in-memory copy of a database file"""
+    conn = open_database(MEMORY_DATABASE)
+    with closing(sqlite3.connect(path)) as source:
+        source.backup(conn)
+    return conn
@@ -1,27 +1,61 @@
 import os
-import json
 import sqlite3
 import time
 import logging
 
-from typing import Any, Generator
-
 from .checks import run_checks
 from .project import parse_project
 from .common import mongoid2uuid
 from .ayon import ayon
-from .folders import folders_by_parent
-from .products import get_products
-from .versions import get_versions, get_hero_versions
-from .representations import get_representations
-
-BATCH_SIZE = 100
-
-
-def deploy(conn: sqlite3.Connection, thumbnail_dir: str | None = None):
+from .folders import folders_at_depth
+from .operations import batch_process_ops, deploy_products
+from .database import open_database
+from .payload import unpack_payload
+from .schema import count_rows
+from .shards import coordinate_shards, load_thumbnails, save_thumbnails, should_shard
+from .incremental import deploy_delta, find_baseline, save_baseline, update_anatomy
+from .staging import staging_project, switch_project
+from .tiers import deploy_tiers
+from .tree import ensure_folder_tree
+from .progress import ProgressReporter
+
+
+def count_entities(conn: sqlite3.Connection) -> dict[str, int]:
+    """Count entities to deploy by their type"""
+    db = conn.cursor()
+    counts = count_rows(conn)
+    db.execute(
+        """
+        SELECT count(*) FROM hero_versions AS h
+        INNER JOIN versions AS v ON h.source_version = v.id
+        """
+    )
+    counts["hero_version"] = db.fetchone()[0]
+    return counts
+
+
+def deploy(
+    conn: sqlite3.Connection,
+    thumbnail_dir: str | None = None,
+    progress: ProgressReporter | None = None,
+    sqlite_path: str | None = None,
+    concurrency: int = 1,
+    mode: str = "full",
+    keep_baseline: bool = False,
+) -> str:
+    """Deploy the intermediate database. Returns the project name
+
+    In the incremental mode, an existing project is updated using
+    the differences from the previously imported database. In the
+    staged mode, the project is deployed under a temporary name and
+    replaces the live one when finished. In the tiered mode, versions
+    and representations are deployed after the rest of the project,
+    possibly in background. The database is kept as a baseline
+    for the next incremental import when `keep_baseline` is set.
+    """
     start_time = time.monotonic()
     db = conn.cursor()
-    db.execute("SELECT name, data FROM entities WHERE type = 'project'")
+    db.execute("SELECT name, data FROM project")
 
     project_row = db.fetchone()
 
@@ -29,7 +63,7 @@ def deploy(conn: sqlite3.Connection, thumbnail_dir: str | None = None):
 
     db.execute(
         """
-        SELECT DISTINCT (entity_type) FROM entities
+        SELECT DISTINCT (entity_type) FROM assets
         WHERE entity_type IS NOT NULL AND entity_type != 'Project'
         """
     )
@@ -42,124 +76,165 @@ def deploy(conn: sqlite3.Connection, thumbnail_dir: str | None = None):
 
     # Force load task types
 
-    db.execute(" SELECT data FROM entities WHERE type = 'asset'")
+    db.execute("SELECT data FROM assets")
     task_type_map = {}
     for row in db.fetchall():
-        data = json.loads(row[0])
+        data = unpack_payload(row[0])
         for task_name, task in data.get("tasks", {}).items():
             task_type_map[task["type"].lower()] = {"name": task_name}
 
     # Deploy project
     logging.info("Deploying project")
 
-    project = parse_project(*project_row, folder_types, task_type_map)
+    live_project = parse_project(*project_row, folder_types, task_type_map)
+    if mode == "staged":
+        # Deployed under a temporary name, the live project
+        # is replaced once everything is deployed
+        project = staging_project(live_project)
+    else:
+        project = live_project
     project_name = project["name"]
 
-    try:
-        ayon.delete(f"projects/{project_name}")
-    except Exception:
-        pass
-    else:
-        logging.info("Deleted existing project")
+    baseline = find_baseline(project_name) if mode == "incremental" else None
+    known_thumbnails: dict[str, str] = {}
 
-    ayon.post("projects", json=project)
+    if baseline:
+        # Thumbnails deployed by the previous import are not sent again
+        with open_database(baseline) as base_conn:
+            known_thumbnails = load_thumbnails(base_conn)
+        update_anatomy(project_name, project["anatomy"])
+    else:
+        try:
+            ayon.delete(f"projects/{project_name}")
+        except Exception:
+            pass
+        else:
+            logging.info("Deleted existing project")
 
-    # TOOOL
+        ayon.post("projects", json=project)
 
-    def execute_ops(ops: list[dict[str, Any]]) -> int:
-        counter = 0
-        if not ops:
-            return 0
-        res = ayon.post(
-            f"projects/{project_name}/operations",
-            json={"operations": ops, "canFail": True},
+    thumbnails = deploy_thumbnails(
+        project_name,
+        thumbnail_dir,
+        progress,
+        known_thumbnails,
+    )
+    save_thumbnails(conn, thumbnails)
+
+    if baseline:
+        deploy_delta(
+            conn,
+            project_name,
+            baseline,
+            thumbnails,
+            task_type_map,
+            folder_types,
+            progress,
+            concurrency,
         )
-        if not (res["success"]):
-            for res_op in res["operations"]:
-                if not res_op["success"]:
-                    msg = (
-                        f"Unable to deploy {res_op['entityType']} {res_op['entityId']}"
-                    )
-                    if detail := res_op.get("detail"):
-                        msg += f": {detail}"
-                    logging.error(msg)
-                else:
-                    counter += 1
-        else:
-            counter += len(ops)
-        return counter
-
-    def bach_process_ops(ops_generator: Generator[dict[str, Any], None, None]):
-        ops = []
-        counter = 0
-        for op in ops_generator:
-            ops.append(op)
-            if len(ops) >= BATCH_SIZE:
-                counter += execute_ops(ops)
-                ops = []
-        counter += execute_ops(ops)
-        return counter
-
-    # Deploy thumbnails (stupid, but we need them first)
-
-    thumbnails = {}
-    if thumbnail_dir:
-        for path in os.listdir(thumbnail_dir):
-            if path.endswith(".jpg"):
-                original_id = mongoid2uuid(path.split("_")[0])
-                logging.info(f"Deploying thumbnail {original_id}")
-                with open(os.path.join(thumbnail_dir, path), "rb") as f:
-                    response = ayon.post(
-                        f"projects/{project_name}/thumbnails",
-                        headers={"Content-Type": "image/jpeg"},
-                        data=f.read(),
-                    )
-                    if response:
-                        thumbnails[original_id] = response["id"]
+        logging.info(f"Deployed in {time.monotonic() - start_time:.2f}s")
+        return project_name
+
+    counts = count_entities(conn)
+    if mode == "tiered":
+        tier_types = ["asset", "subset"]
+    else:
+        tier_types = ["asset", "subset", "version", "hero_version", "representation"]
+    total = sum(counts.get(key, 0) for key in tier_types)
+    if progress:
+        progress.start("Deploying project", total=total)
 
     # Deploy folders and tasks
-    # We need to do this per-parent to ensure the parent exists
-    # before the child is created.
+    # Folders are deployed level by level to ensure the parent exists
+    # before the child is created. Tasks follow the folders of each level.
 
     logging.info("Deploying folders and tasks")
-
-    def deploy_folders(parent_id: str | None) -> int:
-        ops = []
-        children_ids = []
-        counter = 0
-        for operation in folders_by_parent(
-            parent_id, conn, thumbnails=thumbnails, task_type_map=task_type_map, folder_types=folder_types,
-        ):
-            ops.append(operation)
-            if "entityId" in operation:
-                children_ids.append(operation["entityId"])
-
-        counter += execute_ops(ops)
-
-        for child_id in children_ids:
-            counter += deploy_folders(child_id)
-        return counter
-
-    count = deploy_folders(None)
+    if progress:
+        progress.label = "folders and tasks"
+
+    ensure_folder_tree(conn)
+    db.execute("SELECT max(depth) FROM folder_tree")
+    max_depth = db.fetchone()[0]
+
+    count = 0
+    for depth in range(0 if max_depth is None else max_depth + 1):
+        folder_ops, task_ops = folders_at_depth(
+            depth,
+            conn,
+            thumbnails=thumbnails,
+            task_type_map=task_type_map,
+            folder_types=folder_types,
+        )
+        count += batch_process_ops(project_name, iter(folder_ops), progress, concurrency)
+        count += batch_process_ops(project_name, iter(task_ops), None, concurrency)
     logging.info(f"Deployed {count} folders and tasks")
 
-    logging.info("Deploying products")
-    count = bach_process_ops(get_products(conn))
-    logging.info(f"Deployed {count} products")
-
-    logging.info("Deploying versions")
-    count = bach_process_ops(get_versions(conn, thumbnails))
-    logging.info(f"Deployed {count} versions")
-
-    logging.info("Deploying hero versions")
-    count = bach_process_ops(get_hero_versions(conn, thumbnails))
-    logging.info(f"Deployed {count} hero versions")
+    if mode == "tiered":
+        deploy_tiers(
+            conn,
+            project_name,
+            thumbnails,
+            progress,
+            concurrency,
+            keep_baseline,
+        )
+    elif progress and should_shard(sqlite_path, total):
+        coordinate_shards(
+            conn,
+            sqlite_path,
+            project_name,
+            thumbnails,
+            progress,
+            concurrency,
+        )
+    else:
+        deploy_products(
+            conn,
+            project_name,
+            thumbnails,
+            progress,
+            concurrency=concurrency,
+        )
 
-    logging.info("Deploying representations")
-    count = bach_process_ops(get_representations(conn))
-    logging.info(f"Deployed {count} representations")
+    if mode == "staged":
+        switch_project(live_project, project_name)
 
     logging.info(f"Deployed in {time.monotonic() - start_time:.2f}s")
+    return live_project["name"]
+
+
+def deploy_thumbnails(
+    project_name: str,
+    thumbnail_dir: str | None,
+    progress: ProgressReporter | None = None,
+    known: dict[str, str] | None = None,
+) -> dict[str, str]:
+    """Upload thumbnails, except the known ones
+
+    Returns Ayon thumbnail IDs by the original thumbnail ID.
+    """
+    thumbnails = dict(known or {})
+    if not thumbnail_dir:
+        return thumbnails
+
+    for path in os.listdir(thumbnail_dir):
+        if not path.endswith(".jpg"):
+            continue
+        original_id = mongoid2uuid(path.split("_")[0])
+        if original_id in thumbnails:
+            continue
+        logging.info(f"Deploying thumbnail {original_id}")
+        with open(os.path.join(thumbnail_dir, path), "rb") as f:
+            response = ayon.post(
+                f"projects/{project_name}/thumbnails",
+                headers={"Content-Type": "image/jpeg"},
+                data=f.read(),
+            )
+            if response:
+                thumbnails[original_id] = response["id"]
+        if progress:
+            progress.check()
+    return thumbnails
 
 
 #
@@ -167,8 +242,30 @@ def deploy(conn: sqlite3.Connection, thumbnail_dir: str | None = None):
 #
 
 
-def deploy_project(sqlite_path: str, thumbnail_dir: str | None = None):
-    assert os.path.exists(sqlite_path), "SQLite database does not exist"
-    with sqlite3.connect(sqlite_path) as conn:
-        run_checks(conn)
-        deploy(conn, thumbnail_dir)
+def deploy_project(
+    conn: sqlite3.Connection,
+    thumbnail_dir: str | None = None,
+    progress: ProgressReporter | None = None,
+    concurrency: int = 1,
+    mode: str = "full",
+    sqlite_path: str | None = None,
+    keep_baseline: bool = False,
+):
+    """Deploy the intermediate database opened by the caller
+
+    The path of the database is needed to deploy it in shards,
+    in-memory databases are deployed by this processor alone.
+    """
+    run_checks(conn)
+    project_name = deploy(
+        conn,
+        thumbnail_dir,
+        progress,
+        sqlite_path,
+        concurrency,
+        mode,
+        keep_baseline,
+    )
+    if keep_baseline and mode != "tiered":
+        # Tiered imports save it when versions are deployed
+        save_baseline(conn, project_name)
@@ -0,0 +1,234 @@
+import logging
+import sqlite3
+
+from pydantic import BaseModel, Field
+
+from .schema import count_rows
+from .tree import build_folder_tree, ensure_folder_tree, subtree_condition
+
+# Selective import
+#
+# Filters are applied to the intermediate database before deploy:
+# entities that are not imported are deleted from it, so they are
+# never shaped to operations nor sent to the server.
+#
+# Incremental imports compare the whole project to its baseline,
+# a filtered database would delete everything left out, so filters
+# are refused in that mode.
+
+PRODUCT_TYPE_EXPR = """
+    replace(
+        COALESCE(
+            json_extract(payload(data), '$.family'),
+            json_extract(payload(data), '$.families[0]'),
+            'unknown'
+        ),
+        '.',
+        '_'
+    )
+"""
+
+
+class ImportFilters(BaseModel):
+    """Parts of the project to import. Empty filters import everything"""
+
+    folders: list[str] = Field(
+        default_factory=list,
+        description="Folder path globs (e.g. 'shots/sq010*'). Matching folders "
+        "are imported with their subfolders and parents",
+    )
+    product_types: list[str] = Field(
+        default_factory=list,
+        description="Product types (families) to import",
+    )
+    hero_only: bool = Field(
+        False,
+        description="Import only hero versions and their source versions",
+    )
+    latest_versions: int | None = Field(
+        None,
+        description="Import only this many latest versions of each product",
+    )
+    after: str | None = Field(
+        None,
+        description="Import versions created at or after this date (YYYY-MM-DD)",
+    )
+    before: str | None = Field(
+        None,
+        description="Import versions created before this date (YYYY-MM-DD)",
+    )
+    representations: list[str] = Field(
+        default_factory=list,
+        description="Representation names to import",
+    )
+
+    class Config:
+        extra = "forbid"
+
+    @property
+    def empty(self) -> bool:
+        return self == ImportFilters()
+
+
+def version_time(date: str) -> str:
+    """Convert a date to the format of OpenPype version times"""
+    return date.replace("-", "").replace(":", "")
+
+
+def filter_folders(db: sqlite3.Cursor, patterns: list[str]) -> None:
+    """Keep folders matching the globs, their subfolders and parents"""
+    conditions = " OR ".join(["path GLOB ? OR path GLOB ? || '/*'"] * len(patterns))
+    params = [p for pattern in patterns for p in (pattern, pattern)]
+    db.execute("DROP TABLE IF EXISTS temp.matched_folders")
+    db.execute(
+        f"""
+        CREATE TEMP TABLE matched_folders AS
+        SELECT id, path FROM folder_tree WHERE {conditions}
+        """,
+        params,
+    )
+
+    # Parents are kept to preserve the hierarchy, but not their products
+    db.execute(
+        """
+        DELETE FROM subsets
+        WHERE parent NOT IN (SELECT id FROM temp.matched_folders)
+        """
+    )
+    db.execute(
+        f"""
+        DELETE FROM assets
+        WHERE id NOT IN (SELECT id FROM temp.matched_folders)
+        AND id NOT IN (
+            SELECT t.id FROM folder_tree AS t
+            INNER JOIN temp.matched_folders AS m
+            ON {subtree_condition("m.path", "t.path")}
+        )
+        """
+    )
+    db.execute("DROP TABLE temp.matched_folders")
+
+
+def remove_orphans(db: sqlite3.Cursor) -> None:
+    """Remove entities whose parents were filtered out"""
+    db.execute(
+        """
+        DELETE FROM subsets
+        WHERE parent NOT IN (SELECT id FROM assets)
+        """
+    )
+    db.execute(
+        """
+        DELETE FROM versions
+        WHERE parent NOT IN (SELECT id FROM subsets)
+        """
+    )
+    db.execute(
+        """
+        DELETE FROM hero_versions
+        WHERE parent NOT IN (SELECT id FROM subsets)
+        OR source_version NOT IN (SELECT id FROM versions)
+        """
+    )
+    db.execute(
+        """
+        DELETE FROM representations
+        WHERE parent NOT IN (SELECT id FROM versions)
+        AND parent NOT IN (SELECT id FROM hero_versions)
+        """
+    )
+
+
+def apply_filters(conn: sqlite3.Connection, filters: ImportFilters) -> dict[str, int]:
+    """Remove entities excluded by the filters from the database
+
+    Returns the number of remaining entities by type.
+    """
+    db = conn.cursor()
+    ensure_folder_tree(conn)
+
+    if filters.folders:
+        filter_folders(db, filters.folders)
+
+    if filters.product_types:
+        product_types = [t.replace(".", "_") for t in filters.product_types]
+        placeholders = ", ".join("?" * len(product_types))
+        db.execute(
+            f"""
+            DELETE FROM subsets
+            WHERE {PRODUCT_TYPE_EXPR} NOT IN ({placeholders})
+            """,
+            product_types,
+        )
+
+    if filters.after or filters.before:
+        db.execute(
+            """
+            DELETE FROM versions
+            WHERE (
+                (? IS NOT NULL AND COALESCE(json_extract(payload(data), '$.time'), '') < ?)
+                OR
+                (? IS NOT NULL AND COALESCE(json_extract(payload(data), '$.time'), '') >= ?)
+            )
+            """,
+            (
+                filters.after,
+                version_time(filters.after or ""),
+                filters.before,
+                version_time(filters.before or ""),
+            ),
+        )
+
+    if filters.hero_only:
+        db.execute(
+            """
+            DELETE FROM versions
+            WHERE id NOT IN (
+                SELECT source_version FROM hero_versions
+                WHERE source_version IS NOT NULL
+            )
+            """
+        )
+
+    if filters.latest_versions:
+        db.execute(
+            """
+            DELETE FROM versions WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY parent
+                        ORDER BY CAST(json_extract(payload(data), '$.version') AS INTEGER) DESC
+                    ) AS n
+                    FROM versions
+                ) WHERE n > ?
+            )
+            """,
+            (filters.latest_versions,),
+        )
+
+    if filters.representations:
+        placeholders = ", ".join("?" * len(filters.representations))
+        db.execute(
+            f"""
+            DELETE FROM representations
+            WHERE name NOT IN ({placeholders})
+            """,
+            filters.representations,
+        )
+
+    remove_orphans(db)
+
+    # Products left without any version would be empty
+    if filters.hero_only or filters.latest_versions or filters.after or filters.before:
+        db.execute(
+            """
+            DELETE FROM subsets
+            WHERE id NOT IN (SELECT parent FROM versions)
+            """
+        )
+    conn.commit()
+    build_folder_tree(conn)
+
+    counts = count_rows(conn)
+    logging.info(f"Filtered entities: {counts}")
+    return counts
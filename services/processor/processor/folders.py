@@ -1,7 +1,8 @@
-import json
 import sqlite3
 from typing import Any, Generator
 from .common import config
+from .payload import unpack_payload
+from .schema import key_uuid
 
 NOT_FOLDER_ATTRIB = ["tools_env", "avalon_mongo_id", "parents", "tasks"]
 
@@ -49,56 +50,72 @@ def parse_folder(source: dict[str, Any], thumbnails, folder_types) -> dict[str,
     }
 
 
-def folders_by_parent(
-    parent_id: str | None,
+def folders_at_depth(
+    depth: int,
     conn: sqlite3.Connection,
     thumbnails=None,
     task_type_map=None,
     folder_types: list[str] = [],
-) -> Generator[dict[str, Any], None, None]:
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Folder and task operations of one level of the folder tree
+
+    Folders of the level do not depend on each other, so they
+    may be deployed at once, followed by their tasks.
+    """
     db = conn.cursor()
-    cond = (
-        "visual_parent IS NULL"
-        if parent_id is None
-        else f"visual_parent = '{parent_id}'"
-    )
-    query = f"""
-        SELECT id, name, entity_type, visual_parent, data
-        FROM entities WHERE type = 'asset' AND {cond}
+    db.execute(
         """
-    db.execute(query)
+        SELECT e.id, e.name, e.entity_type, e.visual_parent, e.data
+        FROM folder_tree AS t
+        INNER JOIN assets AS e ON e.id = t.id
+        WHERE t.depth = ?
+        ORDER BY t.path
+        """,
+        (depth,),
+    )
+    folder_ops = []
+    task_ops = []
     for row in db.fetchall():
-        folder_data = json.loads(row[4])
+        folder_id = row[0].hex()
+        folder_data = unpack_payload(row[4])
         tasks_data = folder_data.pop("tasks", {})
-        yield parse_folder(
-            {
-                "id": row[0],
-                "name": row[1],
-                "entity_type": row[2],
-                "visual_parent": row[3],
-                "data": folder_data,
-            },
-            thumbnails,
-            folder_types,
+        folder_ops.append(
+            parse_folder(
+                {
+                    "id": folder_id,
+                    "name": row[1],
+                    "entity_type": row[2],
+                    "visual_parent": key_uuid(row[3]),
+                    "data": folder_data,
+                },
+                thumbnails,
+                folder_types,
+            )
         )
+        task_ops.extend(get_task_ops(folder_id, tasks_data, task_type_map))
+    return folder_ops, task_ops
 
-        # In OP3, tasks are stored on Assets (folders),
-        # so we deploy the tasks as part of the folder
 
-        for task_name, task_data in tasks_data.items():
-
-            task_type = task_type_map.get(task_data["type"].lower())
-            if task_type is None:
-                continue
-            task_type_name = task_type["name"]
+def get_task_ops(
+    folder_id: str,
+    tasks_data: dict[str, Any],
+    task_type_map: dict[str, Any],
+) -> Generator[dict[str, Any], None, None]:
+    """Create operations of the tasks stored on an asset"""
+    for task_name, task_data in tasks_data.items():
 
-            yield {
-                "type": "create",
-                "entityType": "task",
-                "data": {
-                    "folderId": row[0],
-                    "name": task_name,
-                    "taskType": task_type_name,
-                    "status": config.default_status,
-                },
-            }
+        task_type = task_type_map.get(task_data["type"].lower())
+        if task_type is None:
+            continue
+        task_type_name = task_type["name"]
+
+        yield {
+            "type": "create",
+            "entityType": "task",
+            "data": {
+                "folderId": folder_id,
+                "name": task_name,
+                "taskType": task_type_name,
+                "status": config.default_status,
+            },
+        }
@@ -0,0 +1,438 @@
+import os
+import json
+import logging
+import sqlite3
+
+from contextlib import closing
+from typing import Any, Generator
+
+from .artifacts import prune_artifacts
+from .ayon import ayon
+from .common import config
+from .database import backup_database, open_database
+from .folders import get_task_ops, parse_folder
+from .operations import batch_process_ops, execute_ops
+from .payload import unpack_payload
+from .products import get_products
+from .progress import ProgressReporter
+from .representations import get_representations
+from .schema import COLUMNS, SCHEMA_VERSION, TABLES, key_uuid, schema_version
+from .scope import set_scope
+from .versions import get_hero_versions, get_versions
+
+# Incremental re-import
+#
+# After every successful deploy, the intermediate database is kept
+# as a baseline of the project. Entity IDs are derived from the Mongo
+# IDs, so when the project is imported again, the new database is
+# compared to the baseline row by row and only entities that were
+# created, changed or deleted are sent to the server.
+#
+# Baselines are kept in the artifact directory and count towards
+# its size limit.
+
+ENTITY_TYPES = {
+    "asset": "folder",
+    "subset": "product",
+    "version": "version",
+    "hero_version": "version",
+    "representation": "representation",
+}
+
+
+def column_changed(column: str) -> str:
+    """SQL condition of a column differing from the baseline
+
+    Payloads are compared decompressed, compressing the same payload
+    again does not have to give the same bytes.
+    """
+    if column == "data":
+        return "(n.data IS NOT o.data AND payload(n.data) IS NOT payload(o.data))"
+    return f"n.{column} IS NOT o.{column}"
+
+
+CREATED_QUERY = " UNION ALL ".join(
+    f"""
+    SELECT id FROM main.{TABLES[entity_type]}
+    WHERE id NOT IN (SELECT id FROM base.{TABLES[entity_type]})
+    """
+    for entity_type in ENTITY_TYPES
+)
+
+CHANGED_QUERY = " UNION ALL ".join(
+    f"""
+    SELECT n.id FROM main.{TABLES[entity_type]} AS n
+    INNER JOIN base.{TABLES[entity_type]} AS o ON o.id = n.id
+    WHERE {" OR ".join(column_changed(c) for c in COLUMNS[entity_type])}
+    """
+    for entity_type in ENTITY_TYPES
+)
+
+# Hero versions are built from their source version
+CHANGED_HEROES_QUERY = """
+    SELECT id FROM main.hero_versions
+    WHERE source_version IN (SELECT id FROM temp.scope)
+"""
+
+DELETED_QUERY = " UNION ALL ".join(
+    f"""
+    SELECT id, '{entity_type}' FROM base.{TABLES[entity_type]}
+    WHERE id NOT IN (SELECT id FROM main.{TABLES[entity_type]})
+    """
+    for entity_type in ENTITY_TYPES
+)
+
+FOLDER_TASKS_QUERY = """
+query FolderTasks(
+  $projectName: String!
+  $folderIds: [String!]!
+  $first: Int!
+  $after: String
+) {
+  project(name: $projectName) {
+    tasks(folderIds: $folderIds, first: $first, after: $after) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      edges {
+        node {
+          id
+          name
+          folderId
+        }
+      }
+    }
+  }
+}
+"""
+
+# Folders per task query, and tasks per page of its results
+FOLDER_PAGE_SIZE = 500
+TASK_PAGE_SIZE = 2000
+
+
+def baseline_path(project_name: str) -> str | None:
+    """Path of the last imported database of the project"""
+    if not config.artifact_dir:
+        return None
+    return os.path.join(config.artifact_dir, "baselines", f"{project_name}.db")
+
+
+def save_baseline(conn: sqlite3.Connection, project_name: str) -> None:
+    """Keep the deployed database for the next incremental import"""
+    if (path := baseline_path(project_name)) is None:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        backup_database(conn, path)
+    except (OSError, sqlite3.Error):
+        logging.exception("Unable to store the baseline database")
+    prune_artifacts()
+
+
+def find_baseline(project_name: str) -> str | None:
+    """Return the baseline database if the project can be updated in place"""
+    path = baseline_path(project_name)
+    if path is None or not os.path.isfile(path):
+        logging.info(f"No baseline of {project_name}, importing it as a whole")
+        return None
+    with closing(open_database(path)) as conn:
+        if schema_version(conn) != SCHEMA_VERSION:
+            logging.info(f"Baseline of {project_name} is outdated, importing as a whole")
+            return None
+    try:
+        ayon.get(f"projects/{project_name}")
+    except Exception:
+        logging.info(f"Project {project_name} does not exist, importing it as a whole")
+        return None
+
+    # Mark as recently used, so it survives pruning
+    os.utime(path)
+    return path
+
+
+def update_anatomy(project_name: str, anatomy: dict[str, Any]) -> None:
+    """Add folder and task types the project does not have yet
+
+    The delta may use types added to the export since the previous
+    import. Types added in Ayon meanwhile are kept.
+    """
+    project = ayon.get(f"projects/{project_name}")
+    patch = {}
+    for key, anatomy_key in (("folderTypes", "folder_types"), ("taskTypes", "task_types")):
+        types = list(project.get(key) or [])
+        names = {item["name"] for item in types}
+        missing = [item for item in anatomy[anatomy_key] if item["name"] not in names]
+        if missing:
+            logging.info(f"Adding {', '.join(i['name'] for i in missing)} to {key}")
+            patch[key] = types + missing
+    if patch:
+        ayon.patch(f"projects/{project_name}", json=patch)
+
+
+def as_updates(
+    ops: Generator[dict[str, Any], None, None],
+) -> Generator[dict[str, Any], None, None]:
+    """Turn create operations to updates of the existing entities
+
+    Statuses are left as they are, they may have been changed
+    in Ayon since the previous import.
+    """
+    for op in ops:
+        data = {k: v for k, v in op["data"].items() if k != "status"}
+        yield {**op, "type": "update", "data": data}
+
+
+def folder_depths(conn: sqlite3.Connection, schema: str) -> dict[str, int]:
+    """Depths of the folders by their hex ID"""
+    db = conn.cursor()
+    db.execute(f"SELECT id, depth FROM {schema}.folder_tree")
+    return {row[0].hex(): row[1] for row in db.fetchall()}
+
+
+def get_existing_tasks(
+    project_name: str,
+    folder_ids: list[str],
+) -> dict[str, dict[str, str]]:
+    """Return IDs of the tasks of the folders by folder ID and task name"""
+    result: dict[str, dict[str, str]] = {}
+    for i in range(0, len(folder_ids), FOLDER_PAGE_SIZE):
+        cursor = None
+        while True:
+            res = ayon.gql(
+                FOLDER_TASKS_QUERY,
+                projectName=project_name,
+                folderIds=folder_ids[i : i + FOLDER_PAGE_SIZE],
+                first=TASK_PAGE_SIZE,
+                after=cursor,
+            )
+            tasks = res["project"]["tasks"]
+            for edge in tasks["edges"]:
+                node = edge["node"]
+                result.setdefault(node["folderId"], {})[node["name"]] = node["id"]
+            if not tasks["pageInfo"]["hasNextPage"]:
+                break
+            cursor = tasks["pageInfo"]["endCursor"]
+    return result
+
+
+def get_baseline_tasks(conn: sqlite3.Connection) -> dict[str, set[str]]:
+    """Names of the tasks of the folders in scope when previously imported"""
+    db = conn.cursor()
+    db.execute(
+        """
+        SELECT id, data FROM base.assets
+        WHERE id IN (SELECT id FROM temp.scope)
+        """
+    )
+    result = {}
+    for row in db.fetchall():
+        data = unpack_payload(row[1]) if row[1] is not None else {}
+        result[row[0].hex()] = set(data.get("tasks") or {})
+    return result
+
+
+def get_folder_ops(
+    conn: sqlite3.Connection,
+    project_name: str,
+    created: set[str],
+    changed: set[str],
+    thumbnails: dict[str, str],
+    task_type_map: dict[str, Any],
+    folder_types: list[str],
+) -> list[list[dict[str, Any]]]:
+    """Folder and task operations in groups to be sent one after another
+
+    Folders are grouped by their depth, so parents exist before
+    their children, and tasks follow the folders of each level.
+    Tasks removed from the export since the previous import are
+    deleted, tasks added in Ayon meanwhile are kept.
+    """
+    depths = folder_depths(conn, "main")
+    existing_tasks = get_existing_tasks(
+        project_name,
+        sorted(folder_id for folder_id in changed if folder_id in depths),
+    )
+    baseline_tasks = get_baseline_tasks(conn)
+
+    db = conn.cursor()
+    db.execute(
+        """
+        SELECT id, name, entity_type, visual_parent, data
+        FROM assets WHERE id IN (SELECT id FROM temp.scope)
+        """
+    )
+    folder_levels: dict[int, list[dict[str, Any]]] = {}
+    task_levels: dict[int, list[dict[str, Any]]] = {}
+    for row in db.fetchall():
+        folder_id = row[0].hex()
+        folder_data = unpack_payload(row[4])
+        tasks_data = folder_data.pop("tasks", {})
+        op = parse_folder(
+            {
+                "id": folder_id,
+                "name": row[1],
+                "entity_type": row[2],
+                "visual_parent": key_uuid(row[3]),
+                "data": folder_data,
+            },
+            thumbnails,
+            folder_types,
+        )
+        task_ops = list(get_task_ops(folder_id, tasks_data, task_type_map))
+
+        depth = depths.get(folder_id, 0)
+        folder_ops = folder_levels.setdefault(depth, [])
+        ops = task_levels.setdefault(depth, [])
+        if folder_id in created:
+            folder_ops.append(op)
+            ops.extend(task_ops)
+            continue
+
+        folder_ops.extend(as_updates(iter([op])))
+        tasks = existing_tasks.get(folder_id, {})
+        for task_op in task_ops:
+            if task_id := tasks.pop(task_op["data"]["name"], None):
+                ops.append(
+                    {
+                        "type": "update",
+                        "entityType": "task",
+                        "entityId": task_id,
+                        "data": {"taskType": task_op["data"]["taskType"]},
+                    }
+                )
+            else:
+                ops.append(task_op)
+        for task_name, task_id in tasks.items():
+            if task_name in baseline_tasks.get(folder_id, ()):
+                ops.append(
+                    {"type": "delete", "entityType": "task", "entityId": task_id}
+                )
+
+    result = []
+    for depth in sorted(folder_levels):
+        result.append(folder_levels[depth])
+        result.append(task_levels[depth])
+    return result
+
+
+def get_delete_ops(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Delete operations, children before their parents"""
+    order = ["representation", "hero_version", "version", "subset"]
+    depths = folder_depths(conn, "base")
+
+    db = conn.cursor()
+    db.execute(DELETED_QUERY)
+    deleted = [(row[0].hex(), row[1]) for row in db.fetchall()]
+    deleted.sort(
+        key=lambda row: (
+            order.index(row[1]) if row[1] in order else len(order),
+            -depths.get(row[0], 0),
+        )
+    )
+
+    ops = []
+    for entity_id, entity_type in deleted:
+        op = {
+            "type": "delete",
+            "entityType": ENTITY_TYPES[entity_type],
+            "entityId": entity_id,
+        }
+        if entity_type == "asset":
+            # Tasks of the folder go with it
+            op["force"] = True
+        ops.append(op)
+    return ops
+
+
+def deploy_delta(
+    conn: sqlite3.Connection,
+    project_name: str,
+    baseline: str,
+    thumbnails: dict[str, str],
+    task_type_map: dict[str, Any],
+    folder_types: list[str],
+    progress: ProgressReporter | None = None,
+    concurrency: int = 1,
+) -> None:
+    """Deploy only the differences from the baseline database"""
+    if not os.path.isfile(baseline):
+        # Attaching a missing database would create an empty one
+        raise Exception(f"Baseline {baseline} was removed")
+    db = conn.cursor()
+    db.execute("ATTACH DATABASE ? AS base", (baseline,))
+    try:
+        created_count = set_scope(conn, CREATED_QUERY)
+        db.execute("SELECT id FROM temp.scope")
+        created = {row[0].hex() for row in db.fetchall()}
+
+        set_scope(conn, CHANGED_QUERY)
+        db.execute(f"INSERT OR IGNORE INTO temp.scope {CHANGED_HEROES_QUERY}")
+        db.execute("SELECT id FROM temp.scope")
+        changed = {row[0].hex() for row in db.fetchall()}
+
+        delete_ops = get_delete_ops(conn)
+        logging.info(
+            f"Incremental import: {created_count} created, {len(changed)} changed, "
+            f"{len(delete_ops)} deleted entities"
+        )
+        if progress:
+            progress.start(
+                "Deploying changes",
+                total=created_count + len(changed) + len(delete_ops),
+            )
+
+        # Folders go level by level, both new and changed ones
+        set_scope(conn, f"{CREATED_QUERY} UNION {CHANGED_QUERY}")
+        if progress:
+            progress.label = "folders and tasks"
+        for ops in get_folder_ops(
+            conn,
+            project_name,
+            created,
+            changed,
+            thumbnails,
+            task_type_map,
+            folder_types,
+        ):
+            batch_process_ops(project_name, iter(ops), progress, concurrency)
+
+        # Created entities first, then the changed ones,
+        # as changes may move entities under the new ones
+
+        for label, scope in (("new", created), ("changed", changed)):
+            set_scope(
+                conn,
+                "SELECT uuid_key(value) FROM json_each(?)",
+                (json.dumps(sorted(scope)),),
+            )
+            stages = [
+                ("products", get_products(conn, True)),
+                ("versions", get_versions(conn, thumbnails, True)),
+                ("hero versions", get_hero_versions(conn, thumbnails, True)),
+                ("representations", get_representations(conn, True)),
+            ]
+            for stage, ops in stages:
+                if progress:
+                    progress.label = f"{label} {stage}"
+                if label == "changed":
+                    ops = as_updates(ops)
+                count = batch_process_ops(project_name, ops, progress, concurrency)
+                logging.info(f"Deployed {count} {label} {stage}")
+
+        # Deletes are sequential, children must go before parents
+
+        if progress:
+            progress.label = "deleted entities"
+        count = 0
+        for i in range(0, len(delete_ops), 100):
+            batch = delete_ops[i : i + 100]
+            count += execute_ops(project_name, batch)
+            if progress:
+                progress.advance(len(batch))
+                progress.check()
+        logging.info(f"Deleted {count} entities")
+    finally:
+        conn.commit()
+        db.execute("DETACH DATABASE base")
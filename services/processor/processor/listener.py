@@ -0,0 +1,109 @@
+import json
+import time
+import random
+import logging
+import threading
+
+from .common import config
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+
+class Backoff:
+    """Exponential backoff with full jitter
+
+    Delays grow from `minimum` up to `maximum` seconds with every
+    call to `next` and are randomized, so idle processors don't
+    hit the server in lockstep.
+    """
+
+    def __init__(self, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.attempts = 0
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+    def next(self) -> float:
+        ceiling = min(self.maximum, self.minimum * 2**self.attempts)
+        self.attempts += 1
+        return random.uniform(self.minimum, ceiling)
+
+
+class EventListener(threading.Thread):
+    """Listen to server events and wake up the worker
+
+    Connects to the server websocket and subscribes to the given
+    topics. Whenever a matching event arrives, `wait` returns
+    immediately, so the worker enrolls without waiting for the
+    next poll. Reconnects with a backoff when the connection drops.
+    """
+
+    def __init__(self, topics: list[str]):
+        super().__init__(daemon=True, name="event-listener")
+        self.topics = topics
+        self.wakeup = threading.Event()
+        self.backoff = Backoff(config.poll_interval, config.max_poll_interval)
+
+    @property
+    def url(self) -> str:
+        url = config.server_url.rstrip("/")
+        if url.startswith("https://"):
+            return "wss://" + url.removeprefix("https://") + "/ws"
+        return "ws://" + url.removeprefix("http://") + "/ws"
+
+    def listen(self) -> None:
+        conn = websocket.create_connection(
+            self.url,
+            header={"X-Api-Key": config.api_key},
+        )
+        try:
+            conn.send(
+                json.dumps(
+                    {
+                        "topic": "auth",
+                        "token": config.api_key,
+                        "subscribe": self.topics,
+                    }
+                )
+            )
+            while True:
+                message = json.loads(conn.recv())
+                self.backoff.reset()
+                if message.get("topic") in self.topics:
+                    self.wakeup.set()
+        finally:
+            conn.close()
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logging.debug(f"Event listener disconnected: {e}")
+            time.sleep(self.backoff.next())
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for a matching event or the timeout
+
+        Returns True if the worker was woken up by an event
+        """
+        woken = self.wakeup.wait(timeout)
+        self.wakeup.clear()
+        return woken
+
+
+def create_listener(topics: list[str]) -> EventListener | None:
+    """Start an event listener if the pickup mode allows it"""
+    if config.pickup_mode != "websocket":
+        return None
+    if websocket is None:
+        logging.warning("websocket-client is not installed. Falling back to polling")
+        return None
+    listener = EventListener(topics)
+    listener.start()
+    return listener
@@ -0,0 +1,201 @@
+import struct
+import logging
+
+from typing import Any, BinaryIO, Generator
+
+from .common import mongoid2uuid
+
+# mongodump files
+#
+# mongodump writes a collection as a sequence of BSON documents,
+# each prefixed by its length, so they are read one at a time.
+# Documents are decoded straight to the values the parser expects:
+# ObjectIds become UUIDs, dates are dropped and numbers are native,
+# just like extended JSON after replace_mongo_types, which is
+# therefore not needed for them.
+
+INT32 = struct.Struct("<i")
+INT64 = struct.Struct("<q")
+DOUBLE = struct.Struct("<d")
+
+unpack_int32 = INT32.unpack_from
+unpack_double = DOUBLE.unpack_from
+
+# Element types by their first byte
+DOUBLE_TYPE = 0x01
+STRING_TYPE = 0x02
+DOCUMENT_TYPE = 0x03
+ARRAY_TYPE = 0x04
+BINARY_TYPE = 0x05
+UNDEFINED_TYPE = 0x06
+OBJECT_ID_TYPE = 0x07
+BOOLEAN_TYPE = 0x08
+DATETIME_TYPE = 0x09
+NULL_TYPE = 0x0A
+REGEX_TYPE = 0x0B
+DB_POINTER_TYPE = 0x0C
+CODE_TYPE = 0x0D
+SYMBOL_TYPE = 0x0E
+CODE_WITH_SCOPE_TYPE = 0x0F
+INT32_TYPE = 0x10
+TIMESTAMP_TYPE = 0x11
+INT64_TYPE = 0x12
+DECIMAL128_TYPE = 0x13
+MIN_KEY_TYPE = 0xFF
+MAX_KEY_TYPE = 0x7F
+
+ELEMENT_TYPES = {*range(DOUBLE_TYPE, DECIMAL128_TYPE + 1), MIN_KEY_TYPE, MAX_KEY_TYPE}
+
+# Binary subtypes holding UUIDs
+UUID_SUBTYPES = [0x03, 0x04]
+
+# Documents larger than this are not valid BSON (MongoDB limit is 16 MB)
+MAX_DOCUMENT_SIZE = 64 * 1024 * 1024
+
+
+def is_bson(head: bytes) -> bool:
+    """Check whether the data starts with a BSON document
+
+    A document starts with its length and the type of its first
+    element. Unlike JSON, BSON is full of NUL bytes.
+    """
+    if len(head) < 5:
+        return False
+    (length,) = INT32.unpack_from(head)
+    return (
+        5 <= length <= MAX_DOCUMENT_SIZE
+        and head[4] in ELEMENT_TYPES
+        and b"\x00" in head[:64]
+    )
+
+
+def decode_string(data: bytes, pos: int) -> tuple[str, int]:
+    (length,) = INT32.unpack_from(data, pos)
+    if length < 1:
+        raise Exception("Invalid BSON string")
+    pos += 4
+    return data[pos : pos + length - 1].decode("utf-8"), pos + length
+
+
+def decode_cstring(data: bytes, pos: int) -> tuple[str, int]:
+    end = data.index(b"\x00", pos)
+    return data[pos:end].decode("utf-8"), end + 1
+
+
+def decode_value(data: bytes, element_type: int, pos: int) -> tuple[Any, int]:
+    """Decode the value of an element. Returns it and the position after it
+
+    Types OpenPype does not store are decoded to None.
+    """
+    if element_type == INT64_TYPE:
+        return INT64.unpack_from(data, pos)[0], pos + 8
+    if element_type == DATETIME_TYPE:
+        # Same as parse_mongo_date, dates are not imported
+        return None, pos + 8
+    if element_type in (NULL_TYPE, UNDEFINED_TYPE, MIN_KEY_TYPE, MAX_KEY_TYPE):
+        return None, pos
+    if element_type in (CODE_TYPE, SYMBOL_TYPE):
+        return decode_string(data, pos)
+    if element_type == BINARY_TYPE:
+        (length,) = INT32.unpack_from(data, pos)
+        if length < 0:
+            raise Exception("Invalid BSON binary")
+        subtype = data[pos + 4]
+        value = data[pos + 5 : pos + 5 + length]
+        if subtype in UUID_SUBTYPES and length == 16:
+            return value.hex(), pos + 5 + length
+        logging.warning(f"Unhandled BSON binary subtype: {subtype}")
+        return None, pos + 5 + length
+
+    # Skipped, but their size must be known to read further
+    if element_type == REGEX_TYPE:
+        _, pos = decode_cstring(data, pos)
+        _, pos = decode_cstring(data, pos)
+    elif element_type == DB_POINTER_TYPE:
+        _, pos = decode_string(data, pos)
+        pos += 12
+    elif element_type == CODE_WITH_SCOPE_TYPE:
+        (length,) = INT32.unpack_from(data, pos)
+        if length < 4:
+            raise Exception("Invalid BSON code with scope")
+        pos += length
+    elif element_type == TIMESTAMP_TYPE:
+        pos += 8
+    elif element_type == DECIMAL128_TYPE:
+        pos += 16
+    else:
+        raise Exception(f"Invalid BSON element type {element_type:#x}")
+    logging.warning(f"Unhandled BSON type: {element_type:#x}")
+    return None, pos
+
+
+def decode_document(
+    data: bytes,
+    pos: int = 0,
+    array: bool = False,
+) -> tuple[dict[str, Any] | list[Any], int]:
+    """Decode the document at the position
+
+    Returns the document (a list for arrays) and the position after it.
+    Elements OpenPype uses the most are decoded in place, this is
+    where most of the import of a mongodump file is spent.
+    """
+    (length,) = unpack_int32(data, pos)
+    end = pos + length - 1
+    if length < 5 or end >= len(data) or data[end] != 0:
+        raise Exception("Invalid BSON document")
+
+    result = [] if array else {}
+    pos += 4
+    while pos < end:
+        element_type = data[pos]
+        name_end = data.index(0, pos + 1)
+        name = data[pos + 1 : name_end]
+        pos = name_end + 1
+
+        if element_type == STRING_TYPE:
+            (size,) = unpack_int32(data, pos)
+            if size < 1:
+                raise Exception("Invalid BSON string")
+            value = data[pos + 4 : pos + 3 + size].decode()
+            pos += 4 + size
+        elif element_type == DOCUMENT_TYPE or element_type == ARRAY_TYPE:
+            value, pos = decode_document(data, pos, element_type == ARRAY_TYPE)
+        elif element_type == INT32_TYPE:
+            value = unpack_int32(data, pos)[0]
+            pos += 4
+        elif element_type == OBJECT_ID_TYPE:
+            value = mongoid2uuid(data[pos : pos + 12].hex())
+            pos += 12
+        elif element_type == DOUBLE_TYPE:
+            value = unpack_double(data, pos)[0]
+            pos += 8
+        elif element_type == BOOLEAN_TYPE:
+            value = data[pos] != 0
+            pos += 1
+        else:
+            value, pos = decode_value(data, element_type, pos)
+
+        # Names of array items are their indices
+        if array:
+            result.append(value)
+        else:
+            result[name.decode()] = value
+    if pos != end:
+        # The last element reaches past the end of the document
+        raise Exception("Invalid BSON document")
+    return result, end + 1
+
+
+def read_documents(stream: BinaryIO) -> Generator[dict[str, Any], None, None]:
+    """Read the BSON documents of a mongodump file one by one"""
+    while header := stream.read(4):
+        if len(header) == 4:
+            (length,) = INT32.unpack(header)
+            if not 5 <= length <= MAX_DOCUMENT_SIZE:
+                raise Exception(f"Invalid BSON document size {length}")
+            body = stream.read(length - 4)
+            if len(body) == length - 4:
+                yield decode_document(header + body)[0]
+                continue
+        raise Exception("BSON file is truncated")
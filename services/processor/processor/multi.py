@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import shutil
+import logging
+import zipfile
+
+from typing import Any, Callable
+
+from .ayon import ayon
+from .compression import COPY_CHUNK_SIZE
+from .planner import PROJECT_FILES
+from .progress import ImportCancelled, ProgressReporter
+
+from requests.exceptions import HTTPError
+
+# Multi-project archives
+#
+# An archive without a project file at its root, but with one export
+# per top level directory (e.g. projA/project.json, projA/thumbnails,
+# projB/database.json) is an archive of many projects. It is split
+# to one upload per project, so the projects are queued, scheduled
+# and imported like any other upload, by all job slots and replicas.
+# The import of the archive waits for them and rolls their statuses
+# up to its summary. When it is aborted or restarted, the running
+# imports of its projects stop by watching it and the waiting ones
+# are aborted before they are enrolled.
+
+DONE_STATUSES = ["finished", "failed", "aborted"]
+
+# Status of uploads the job list does not return, e.g. deleted ones
+MISSING_STATUS = "missing"
+
+# Upload IDs per job list request, the server limit
+CHILD_PAGE_SIZE = 500
+
+
+def find_projects(upload_path: str) -> list[str]:
+    """Directories of the projects in a multi-project archive
+
+    Returns an empty list for single project uploads.
+    """
+    if not zipfile.is_zipfile(upload_path):
+        return []
+    with zipfile.ZipFile(upload_path) as archive:
+        names = archive.namelist()
+    if any(name in PROJECT_FILES for name in names):
+        return []
+    projects = set()
+    for name in names:
+        parts = name.split("/")
+        if len(parts) == 2 and parts[1] in PROJECT_FILES:
+            projects.add(parts[0])
+    return sorted(projects)
+
+
+def split_archive(upload_path: str, directory: str, target_path: str) -> None:
+    """Write the export in the directory as a single project archive"""
+    prefix = f"{directory}/"
+    with zipfile.ZipFile(upload_path) as source, zipfile.ZipFile(
+        target_path,
+        "w",
+        compression=zipfile.ZIP_DEFLATED,
+        compresslevel=1,
+    ) as target:
+        for info in source.infolist():
+            if info.is_dir() or not info.filename.startswith(prefix):
+                continue
+            name = info.filename[len(prefix) :]
+            with source.open(info) as src, target.open(name, "w", force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def upload_project(
+    path: str,
+    name: str,
+    source_summary: dict[str, Any],
+    parent_event_id: str,
+) -> str:
+    """Upload a single project archive. Returns the upload event ID
+
+    Import options of the archive apply to all its projects.
+    """
+    headers = {
+        "Content-Type": "application/zip",
+        "X-Ayon-Project-Name": name,
+        "X-Ayon-Anatomy-Preset": source_summary.get("anatomy_preset") or "_",
+        "X-Ayon-Parent-Job": parent_event_id,
+    }
+    if mode := source_summary.get("mode"):
+        headers["X-Ayon-Import-Mode"] = mode
+    if filters := source_summary.get("filters"):
+        headers["X-Ayon-Import-Filters"] = json.dumps(filters)
+
+    with open(path, "rb") as f:
+        res = ayon.post(f"{ayon.addon_endpoint}/import", headers=headers, data=f)
+    return res["uploadId"]
+
+
+def child_jobs(upload_ids: set[str]) -> dict[str, dict[str, Any]]:
+    """Return the import jobs of the uploads by upload ID
+
+    Uploads not enrolled on yet have no process ID.
+    """
+    ids = sorted(upload_ids)
+    result = {}
+    for i in range(0, len(ids), CHILD_PAGE_SIZE):
+        batch = ids[i : i + CHILD_PAGE_SIZE]
+        jobs = ayon.get(
+            f"{ayon.addon_endpoint}/list",
+            params={"ids": batch, "limit": len(batch)},
+        )
+        for job in jobs:
+            result[job["uploadId"]] = job
+    return result
+
+
+def child_statuses(upload_ids: set[str]) -> dict[str, str]:
+    """Return statuses of the imports of the uploads by upload ID
+
+    Uploads missing from the job list never finish, they are reported
+    as missing instead of being waited for.
+    """
+    jobs = child_jobs(upload_ids)
+    result = {}
+    for upload_id in upload_ids:
+        job = jobs.get(upload_id)
+        if job is None:
+            result[upload_id] = MISSING_STATUS
+        elif job["processId"] is None and job["status"] not in DONE_STATUSES:
+            result[upload_id] = "pending"
+        else:
+            result[upload_id] = job["status"]
+    return result
+
+
+def abort_children(upload_ids: set[str], status: str) -> None:
+    """Abort the uploads no processor has enrolled on yet
+
+    Enrolled ones watch the import of the archive and stop by
+    themselves.
+    """
+    for upload_id, job in child_jobs(upload_ids).items():
+        if job["processId"] is not None or job["status"] in DONE_STATUSES:
+            continue
+        try:
+            ayon.update_event(
+                upload_id,
+                status="aborted",
+                description=f"Import of the archive {status}",
+            )
+        except HTTPError as e:
+            logging.error(f"Unable to abort upload {upload_id}: {e}")
+
+
+def fan_out(
+    upload_path: str,
+    projects: list[str],
+    source_summary: dict[str, Any],
+    job_dir: str,
+    progress: ProgressReporter,
+    assist: Callable[[set[str]], bool] | None = None,
+) -> None:
+    """Import the projects of the archive as separate uploads
+
+    While waiting for them, `assist` is called with the IDs of the
+    pending uploads to process one of them in this job slot too, so
+    the import finishes even with a single slot. Projects that are
+    not finished, missing ones included, fail the import.
+    """
+    logging.info(f"Splitting the archive to {len(projects)} projects")
+    progress.start("Splitting archive", total=len(projects), unit="projects")
+
+    children: dict[str, str] = {}
+
+    def check() -> None:
+        try:
+            progress.check()
+        except ImportCancelled as e:
+            abort_children(set(children), e.status)
+            raise
+
+    rollup: dict[str, dict[str, str]] = {}
+    part_path = os.path.join(job_dir, "project.part.zip")
+    for directory in projects:
+        progress.label = directory
+        split_archive(upload_path, directory, part_path)
+        try:
+            upload_id = upload_project(
+                part_path,
+                directory,
+                source_summary,
+                progress.event_id,
+            )
+        except HTTPError as e:
+            # Rejected by the upload validation, the rest goes on
+            logging.error(f"Unable to upload {directory}: {e}")
+            rollup[directory] = {"upload": None, "status": "rejected"}
+        else:
+            children[upload_id] = directory
+            rollup[directory] = {"upload": upload_id, "status": "pending"}
+        finally:
+            os.remove(part_path)
+        progress.advance()
+        check()
+    progress.update_summary(projects=rollup)
+
+    progress.start("Importing projects", total=len(children), unit="projects")
+    pending = set(children)
+    while pending:
+        changed = False
+        for upload_id, status in child_statuses(pending).items():
+            directory = children[upload_id]
+            if rollup[directory]["status"] != status:
+                rollup[directory]["status"] = status
+                changed = True
+            if status in DONE_STATUSES or status == MISSING_STATUS:
+                pending.discard(upload_id)
+                progress.advance()
+        if changed:
+            progress.update_summary(projects=rollup)
+        if not pending:
+            break
+        check()
+
+        if assist is None or not assist(pending):
+            time.sleep(5)
+
+    failed = [d for d, child in rollup.items() if child["status"] != "finished"]
+    if failed:
+        raise Exception(f"{len(failed)} of {len(rollup)} projects failed")
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import sqlite3
+
+from typing import Any, Generator, Iterable
+
+from .ayon import ayon
+from .async_ayon import AsyncAyon
+from .products import get_products
+from .versions import get_versions, get_hero_versions
+from .representations import get_representations
+from .progress import ProgressReporter
+
+BATCH_SIZE = 100
+
+
+def count_successful(res: dict[str, Any], ops: list[dict[str, Any]]) -> int:
+    """Log failed operations of a response. Returns the number of successful ones"""
+    if res["success"]:
+        return len(ops)
+    counter = 0
+    for res_op in res["operations"]:
+        if not res_op["success"]:
+            msg = f"Unable to deploy {res_op['entityType']} {res_op['entityId']}"
+            if detail := res_op.get("detail"):
+                msg += f": {detail}"
+            logging.error(msg)
+        else:
+            counter += 1
+    return counter
+
+
+def execute_ops(project_name: str, ops: list[dict[str, Any]]) -> int:
+    """Send a batch of operations. Returns the number of successful ones"""
+    if not ops:
+        return 0
+    res = ayon.post(
+        f"projects/{project_name}/operations",
+        json={"operations": ops, "canFail": True},
+    )
+    return count_successful(res, ops)
+
+
+async def execute_ops_async(
+    client: AsyncAyon,
+    project_name: str,
+    ops: list[dict[str, Any]],
+) -> int:
+    """Send a batch of operations with the async client"""
+    if not ops:
+        return 0
+    res = await client.post(
+        f"projects/{project_name}/operations",
+        json={"operations": ops, "canFail": True},
+    )
+    return count_successful(res, ops)
+
+
+def iter_batches(
+    ops_generator: Iterable[dict[str, Any]],
+    size: int = BATCH_SIZE,
+) -> Generator[list[dict[str, Any]], None, None]:
+    batch = []
+    for op in ops_generator:
+        batch.append(op)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def batch_process_ops(
+    project_name: str,
+    ops_generator: Generator[dict[str, Any], None, None],
+    progress: ProgressReporter | None = None,
+    concurrency: int = 1,
+) -> int:
+    """Send operations in batches, up to `concurrency` batches at once
+
+    Concurrent batches are sent by the async client, sequential ones
+    by the sync client. Operations yielded by one generator must not
+    depend on each other, as concurrent batches may be processed
+    by the server in any order.
+    """
+    if concurrency > 1:
+        return asyncio.run(
+            send_batches(project_name, ops_generator, progress, concurrency)
+        )
+
+    counter = 0
+    for batch in iter_batches(ops_generator):
+        counter += execute_ops(project_name, batch)
+        if progress:
+            progress.advance(len(batch))
+            progress.check()
+    return counter
+
+
+async def send_batches(
+    project_name: str,
+    ops_generator: Iterable[dict[str, Any]],
+    progress: ProgressReporter | None,
+    concurrency: int,
+) -> int:
+    """Keep up to `concurrency` batches in flight over one connection pool"""
+    counter = 0
+    in_flight: dict[asyncio.Task, int] = {}
+
+    async def collect(return_when: str) -> None:
+        nonlocal counter
+        done, _ = await asyncio.wait(in_flight, return_when=return_when)
+        for task in done:
+            batch_size = in_flight.pop(task)
+            counter += task.result()
+            if progress:
+                progress.advance(batch_size)
+        if progress:
+            progress.check()
+
+    async with AsyncAyon(pool_size=concurrency) as client:
+        try:
+            for batch in iter_batches(ops_generator):
+                task = asyncio.create_task(
+                    execute_ops_async(client, project_name, batch)
+                )
+                in_flight[task] = len(batch)
+                if len(in_flight) >= concurrency:
+                    await collect(asyncio.FIRST_COMPLETED)
+            if in_flight:
+                await collect(asyncio.ALL_COMPLETED)
+        finally:
+            # A failed batch or a cancelled import stops the others
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+    return counter
+
+
+def deploy_products(
+    conn: sqlite3.Connection,
+    project_name: str,
+    thumbnails: dict[str, str],
+    progress: ProgressReporter | None = None,
+    scoped: bool = False,
+    concurrency: int = 1,
+) -> None:
+    """Deploy products, their versions and representations
+
+    Folders must already exist. When scoped, only entities
+    in the current scope are deployed. Each entity type is deployed
+    with up to `concurrency` requests in flight.
+    """
+
+    stages = [
+        ("products", get_products(conn, scoped)),
+        ("versions", get_versions(conn, thumbnails, scoped)),
+        ("hero versions", get_hero_versions(conn, thumbnails, scoped)),
+        ("representations", get_representations(conn, scoped)),
+    ]
+
+    for label, ops_generator in stages:
+        logging.info(f"Deploying {label}")
+        if progress:
+            progress.label = label
+        count = batch_process_ops(
+            project_name,
+            ops_generator,
+            progress,
+            concurrency,
+        )
+        logging.info(f"Deployed {count} {label}")
@@ -1,10 +1,19 @@
+import io
+import os
 import json
+import base64
 import logging
 import time
 import sqlite3
 
 from typing import Any, Generator
 from .common import mongoid2uuid
+from .compression import open_source
+from .mongodump import is_bson, read_documents
+from .payload import pack_payload
+from .progress import ProgressReporter
+from .schema import TABLES, create_indices, create_schema, insert_query, uuid_key
+from .tree import build_folder_tree
 
 
 VALID_TYPES = [
@@ -18,51 +27,66 @@ VALID_TYPES = [
 ]
 
 
-SQLITE_SCHEMA = """
-    CREATE TABLE IF NOT EXISTS entities (
-        id TEXT PRIMARY KEY,
-        type TEXT,
-        entity_type TEXT,
-        parent TEXT,
-        visual_parent TEXT,
-        source_version TEXT,
-        name TEXT,
-        data TEXT
-    );
-"""
-
-SCHEMA_INDICES = [
-    "CREATE INDEX IF NOT EXISTS entities_type_idx ON entities (type);",
-    "CREATE INDEX IF NOT EXISTS entities_entity_type_idx ON entities (entity_type);",
-    "CREATE INDEX IF NOT EXISTS entities_parent_idx ON entities (parent);",
-    "CREATE INDEX IF NOT EXISTS entities_visual_parent_idx ON entities (visual_parent);",
-    "CREATE INDEX IF NOT EXISTS entities_source_version_idx ON entities (source_version);",
-]
-
 # Fields we don't want to move from the top level to data
 HANDLED_TLC = ["_id", "data", "name", "parent", "type", "schema"]
 
 
 def is_list_of_jsons(source_path: str) -> bool:
     """Check if the source file is a list of JSONs"""
-    with open(source_path, "r") as source_file:
+    with open_source(source_path) as (source_file, _):
         first_line = source_file.readline()
-        return not first_line.startswith("[")
+        return not first_line.startswith(b"[")
+
+
+def is_bson_dump(source_path: str) -> bool:
+    """Check if the source file is a mongodump BSON file"""
+    with open_source(source_path) as (source_file, _):
+        return is_bson(source_file.read(64))
+
+
+def source_iterator(
+    source_path: str,
+    progress: ProgressReporter | None = None,
+) -> Generator[dict[str, Any], None, None]:
+    """Iterate over the source file and yield each entity
 
+    Entities are yielded with MongoDB types replaced by native values.
 
-def source_iterator(source_path: str) -> Generator[dict[str, Any], None, None]:
-    """Iterate over the source file and yield each entity"""
+    When progress is provided, it is updated every 1000 entities.
+    For list of JSONs and BSON files, the total count is estimated
+    from the number of bytes read so far.
 
-    if is_list_of_jsons(source_path):
+    Compressed (gzip, zstd) source files are decompressed on the fly.
+    """
+
+    if is_bson_dump(source_path):
+        logging.info("Source file is a mongodump BSON file")
+        size = os.path.getsize(source_path)
+        with open_source(source_path) as (source_file, raw_file):
+            for i, entity in enumerate(read_documents(source_file), 1):
+                yield entity
+                if progress and i % 1000 == 0:
+                    progress.update(i, i * size // max(raw_file.tell(), 1))
+                    progress.check()
+    elif is_list_of_jsons(source_path):
         logging.info("Source file is a list of JSONs")
-        with open(source_path, "r") as source_file:
-            for line in source_file:
-                yield json.loads(line)
+        size = os.path.getsize(source_path)
+        with open_source(source_path) as (source_file, raw_file):
+            for i, line in enumerate(source_file, 1):
+                if not line.strip():
+                    continue
+                yield replace_mongo_types(json.loads(line))
+                if progress and i % 1000 == 0:
+                    progress.update(i, i * size // max(raw_file.tell(), 1))
+                    progress.check()
     else:
-        with open(source_path, "r") as source_file:
-            data = json.load(source_file)
-            for entity in data:
-                yield entity
+        with open_source(source_path) as (source_file, _):
+            data = json.load(io.TextIOWrapper(source_file, encoding="utf-8"))
+            for i, entity in enumerate(data, 1):
+                yield replace_mongo_types(entity)
+                if progress and i % 1000 == 0:
+                    progress.update(i, len(data))
+                    progress.check()
 
 
 def parse_mongo_id(mongo_id: str) -> str:
@@ -77,54 +101,83 @@ def parse_mongo_date(mongo_date: str) -> str:
     return time.strftime("%Y-%m-%d", time.gmtime(mongo_date["$date"] / 1000))
 
 
+def parse_mongo_binary(mongo_binary: dict[str, Any]) -> str | dict[str, Any]:
+    """Convert a MongoDB UUID binary to a hex string, like the BSON decoder
+
+    Other binaries are kept as they are.
+    """
+    binary = mongo_binary["$binary"]
+    if isinstance(binary, dict) and binary.get("subType") in ("03", "04"):
+        data = base64.b64decode(binary["base64"])
+        if len(data) == 16:
+            return data.hex()
+    logging.warning(f"Unhandled MongoDB binary: {mongo_binary}")
+    return mongo_binary
+
+
+def replace_mongo_value(value: Any) -> Any:
+    """Return the value with MongoDB types replaced by native types"""
+    if isinstance(value, dict):
+        if len(value) == 1 and next(iter(value)).startswith("$"):
+            value_key = next(iter(value))
+            if value_key == "$numberInt":
+                return int(value[value_key])
+            elif value_key == "$numberDouble":
+                return float(value[value_key])
+            elif value_key == "$numberLong":
+                return int(value[value_key])
+            elif value_key == "$oid":
+                return parse_mongo_id(value)
+            elif value_key == "$date":
+                return parse_mongo_date(value)
+            elif value_key == "$uuid":
+                return value[value_key].replace("-", "")
+            elif value_key == "$binary":
+                return parse_mongo_binary(value)
+            # Kept as they are, they may be user data as well
+            logging.warning(f"Unhandled MongoDB type: {value}")
+            return value
+        return replace_mongo_types(value)
+    if isinstance(value, list):
+        return [replace_mongo_value(item) for item in value]
+    return value
+
+
 def replace_mongo_types(obj: dict[str, Any] | list[Any]) -> dict[str, Any] | list[Any]:
     """Recursively replace $numberInt, $numberDouble, $numberLong,
-    and $oid types with native types"""
+    and $oid types with native types
+
+    Values are replaced in dictionaries and lists alike, so the result
+    is the same as decoding the entity from a mongodump BSON file.
+    Other types are kept, where the BSON decoder drops them.
+    """
 
     if isinstance(obj, dict):
         for key, value in obj.items():
-            if (
-                isinstance(value, dict)
-                and len(value) == 1
-                and list(value.keys())[0].startswith("$")
-            ):
-                value_key = list(value.keys())[0]
-                if value_key == "$numberInt":
-                    obj[key] = int(obj[key][value_key])
-                elif value_key == "$numberDouble":
-                    obj[key] = float(obj[key][value_key])
-                elif value_key == "$numberLong":
-                    obj[key] = int(obj[key][value_key])
-                elif value_key == "$oid":
-                    obj[key] = parse_mongo_id(obj[key])
-                elif value_key == "$date":
-                    obj[key] = parse_mongo_date(obj[key])
-                else:
-                    logging.warning(f"Unhandled MongoDB type: {obj[key]}")
-            elif isinstance(obj[key], dict):
-                replace_mongo_types(obj[key])
-
-            elif isinstance(obj[key], list):
-                obj[key] = [replace_mongo_types(item) for item in obj[key]]
-
-            else:
-                pass  # Do nothing, since the value is not a MongoDB type
-    return obj
+            obj[key] = replace_mongo_value(value)
+        return obj
+    return [replace_mongo_value(item) for item in obj]
 
 
-def create_sqlite_db(source_path: str, sqlite_path: str) -> str:
-    """Parse the MongoDB JSON file and create a SQLite database
+def create_sqlite_db(
+    source_path: str,
+    conn: sqlite3.Connection,
+    progress: ProgressReporter | None = None,
+) -> str:
+    """Parse the MongoDB JSON or BSON file to a SQLite database
 
     We need this to do fast lookups of the data.
+    Entities go to the table of their type (see schema.py).
     Fields needed for search are converted to columns,
-    the rest is cleaned up and stored as JSON in 'data' column.
+    the rest is cleaned up and stored as compressed JSON
+    in 'data' column (see payload.py). Workfiles are not imported
+    and are skipped.
 
     Clean-up involves converting mongo IDs to UUIDs, converting
     mongo types to naive json values, and removing fields that
     are not needed at all.
 
-    The intermediate database is stored as a file, so it can be
-    used for multiple imports.
+    The database is either a file or in memory (see database.py).
 
     Returns a parsed project name
     """
@@ -136,22 +189,18 @@ def create_sqlite_db(source_path: str, sqlite_path: str) -> str:
     # logging.info("Opening SQLite database")
 
     actual_project_name = None
-    with sqlite3.connect(sqlite_path) as conn:
+    with conn:
         db = conn.cursor()
-        db.execute("DROP TABLE IF EXISTS entities;")
-        db.execute(SQLITE_SCHEMA)
-        for index in SCHEMA_INDICES:
-            db.execute(index)
+        create_schema(conn)
+        inserts = {entity_type: insert_query(entity_type) for entity_type in TABLES}
 
         i = 0
         start_time = time.time()
         logging.info("Opening source file")
-        for row in source_iterator(source_path):
-
-            # Clean-up mongo types
-            row = replace_mongo_types(row)
-
-            if (_type := row.get("type")) not in VALID_TYPES:
+        if progress:
+            progress.start("Creating intermediate database")
+        for row in source_iterator(source_path, progress):
+            if (_type := row.get("type")) not in TABLES:
                 continue
 
             _data = row.get("data", {})
@@ -200,80 +249,66 @@ def create_sqlite_db(source_path: str, sqlite_path: str) -> str:
             # Construct DB row
 
             parsed_row = {
-                "id": row["_id"],
-                "type": _type,
+                "id": uuid_key(row["_id"]),
                 "entity_type": entity_type,
-                "parent": row["parent"] if row.get("parent") else None,
-                "visual_parent": visual_parent,
-                "source_version": source_version,
+                "parent": uuid_key(row.get("parent") or None),
+                "visual_parent": uuid_key(visual_parent),
+                "source_version": uuid_key(source_version),
                 "name": name,
-                "data": json.dumps(payload),
+                "data": pack_payload(payload),
             }
 
-            db.execute(
-                """
-                INSERT INTO entities VALUES (
-                    :id,
-                    :type,
-                    :entity_type,
-                    :parent,
-                    :visual_parent,
-                    :source_version,
-                    :name,
-                    :data
-                )
-                """,
-                parsed_row,
-            )
+            db.execute(inserts[_type], parsed_row)
             i += 1
             if i % 1000 == 0:
                 logging.info(f"Inserted {i} rows into SQLite database")
 
+        logging.info("Indexing SQLite database")
+        create_indices(conn)
+
         logging.info("Removing orphaned subsets")
         db.execute(
             """
-            DELETE FROM entities
-            WHERE type = 'subset'
-            AND parent NOT IN (SELECT id FROM entities WHERE type = 'asset')
+            DELETE FROM subsets
+            WHERE parent NOT IN (SELECT id FROM assets)
             """
         )
 
         logging.info("Removing orphaned versions")
         db.execute(
             """
-            DELETE FROM entities
-            WHERE type = 'version'
-            AND parent NOT IN (SELECT id FROM entities WHERE type = 'subset')
+            DELETE FROM versions
+            WHERE parent NOT IN (SELECT id FROM subsets)
             """
         )
 
         logging.info("Removing orphaned representations")
         db.execute(
             """
-            DELETE FROM entities
-            WHERE type = 'representation'
-            AND parent NOT IN (SELECT id FROM entities WHERE type IN ('version', 'hero_version'))
+            DELETE FROM representations
+            WHERE parent NOT IN (SELECT id FROM versions)
+            AND parent NOT IN (SELECT id FROM hero_versions)
             """
         )
 
         logging.info("Removing versions without representations")
         db.execute(
             """
-            DELETE FROM entities
-            WHERE type = 'version'
-            AND id NOT IN (SELECT parent FROM entities WHERE type = 'representation')
+            DELETE FROM versions
+            WHERE id NOT IN (SELECT parent FROM representations)
             """
         )
 
         logging.info("Removing subsets whithout versions")
         db.execute(
             """
-            DELETE FROM entities
-            WHERE type = 'subset'
-            AND id NOT IN (SELECT parent FROM entities WHERE type = 'version')
+            DELETE FROM subsets
+            WHERE id NOT IN (SELECT parent FROM versions)
             """
         )
 
+        logging.info("Building folder tree")
+        build_folder_tree(conn)
 
         logging.info(f"Inserted {i} rows into SQLite database")
         logging.info(f"SQLite database created {time.time() - start_time:.2f}s")
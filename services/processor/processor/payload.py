@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import zlib
+
+from typing import Any
+
+# Compact payloads
+#
+# The data column holds most of the intermediate database. Payloads
+# are stored as zlib-compressed JSON, using a preset dictionary of the
+# keys and values OpenPype entities repeat, so even the small payloads
+# of representations shrink to a fraction of their size.
+#
+# The first byte of a compressed payload is the dictionary version.
+# Databases created before payloads were compressed store JSON text,
+# which is read as is.
+#
+# SQL reads payloads with the payload(data) function, available
+# on connections opened by database.open_database.
+
+PAYLOAD_VERSION = 1
+
+# Most frequent strings go last, zlib prefers the closest matches
+PAYLOAD_DICTIONARIES = {
+    1: b"".join(
+        [
+            b'"sites": [{"name": "studio", "created_dt": "", "id": ',
+            b'"sites": [], "size": "hash": "path": "_id": ',
+            b'"data": {"families": [], "family": "render", "subset": "',
+            b'"source": "machine": "thumbnail_id": null, "comment": "',
+            b'"inputLinks": [], "dependencies": [], "tags": [], ',
+            b'"resolutionWidth": 1920, "resolutionHeight": 1080, ',
+            b'"pixelAspect": 1.0, "fps": 25, "handleStart": 0, "handleEnd": 0, ',
+            b'"clipIn": 1, "clipOut": 1, "frameStart": 1001, "frameEnd": 1001, ',
+            b'"tools": [], "parents": [], "tasks": {"type": "Compositing"}, ',
+            b'"task": {"name": "", "type": "", "short": ""}, "username": "',
+            b'"context": {"root": {"work": "', b'"}, "project": {"name": "',
+            b'", "code": "', b'"}, "hierarchy": "', b'", "asset": "',
+            b'", "family": "', b'", "subset": "', b'", "version": ',
+            b', "representation": "', b'", "ext": "', b'", "frame": "',
+            b'"template": "{root[work]}/{project[name]}/{hierarchy}/{asset}'
+            b"/publish/{family}/{subset}/v{version:0>3}/{project[code]}_"
+            b"{asset}_{subset}_v{version:0>3}<_{output}><.{frame:0>4}>"
+            b'.{representation}", ',
+            b'"path": "{root[work]}/', b'/publish/', b'"files": [{"_id": "',
+            b'"author": "', b'"time": "', b'"version": ',
+        ]
+    )
+}
+
+
+def pack_payload(payload: dict[str, Any]) -> bytes:
+    """Compress the payload of an entity for storing"""
+    compressor = zlib.compressobj(
+        level=6,
+        zdict=PAYLOAD_DICTIONARIES[PAYLOAD_VERSION],
+    )
+    data = json.dumps(payload).encode("utf-8")
+    return bytes([PAYLOAD_VERSION]) + compressor.compress(data) + compressor.flush()
+
+
+def unpack_json(data: bytes | str | None) -> str | None:
+    """Return the payload as JSON text
+
+    Raises ValueError for payloads of unknown versions and truncated ones.
+    """
+    if data is None or isinstance(data, str):
+        return data
+    if not data or data[0] not in PAYLOAD_DICTIONARIES:
+        raise ValueError("Unknown payload version")
+    decompressor = zlib.decompressobj(zdict=PAYLOAD_DICTIONARIES[data[0]])
+    text = decompressor.decompress(data[1:]) + decompressor.flush()
+    if not decompressor.eof:
+        raise ValueError("Payload is truncated")
+    return text.decode("utf-8")
+
+
+def unpack_payload(data: bytes | str) -> dict[str, Any]:
+    """Return the payload of an entity"""
+    return json.loads(unpack_json(data))
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Make the payload SQL function available on the connection"""
+    conn.create_function("payload", 1, unpack_json, deterministic=True)
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import zipfile
+import logging
+
+from pydantic import BaseModel, Field
+
+from .common import config
+from .operations import BATCH_SIZE
+from .compression import COPY_CHUNK_SIZE, open_source
+from .mongodump import decode_document, is_bson
+from .parser import VALID_TYPES
+from .resources import MB, available_memory, free_disk_space
+from .shards import sharding_enabled
+
+PROJECT_FILES = ["project.json", "database.json", "project.bson", "database.bson"]
+
+# Top level documents of mongodump files start with their ObjectId
+BSON_ID_ELEMENT = b"\x07_id\x00"
+
+SAMPLE_WINDOWS = 8
+WINDOW_SIZE = 2 * MB
+
+# Rough costs used for the estimates
+
+DB_ROW_OVERHEAD = 120  # bytes of keys, indices and row headers per entity
+PAYLOAD_RATIO = 0.5  # size of compressed payloads vs source JSON
+JSON_MEMORY_FACTOR = 8  # memory of parsed python objects vs JSON text
+PARSE_RATE = 20 * MB  # bytes of source parsed per second
+BATCH_SECONDS = 0.5  # time to process one batch of operations
+FOLDER_SECONDS = 0.05  # time to deploy one folder level or thumbnail
+PARALLEL_MIN_REQUESTS = 200  # deploy smaller projects sequentially
+
+
+class JobRefused(Exception):
+    """The node cannot fit the job, another node may take it"""
+
+
+class ImportPlan(BaseModel):
+    """Estimated cost of an import and the decisions based on it"""
+
+    archive_size: int = Field(..., description="Uploaded file size")
+    extracted_size: int = Field(..., description="Size of the archive contents")
+    source_size: int = Field(..., description="Size of the project file")
+    source_format: str = Field(..., description="'json', 'jsonl' or 'bson'")
+    thumbnails: int = Field(..., description="Number of thumbnails")
+    entities: dict[str, int] = Field(..., description="Estimated entity counts")
+    database_size: int = Field(..., description="Intermediate database size")
+    peak_memory: int = Field(..., description="Peak memory use")
+    requests: int = Field(..., description="Number of requests to the server")
+    duration: int = Field(..., description="Approximate duration in seconds")
+    intermediate_db: str = Field(..., description="'memory' or 'disk'")
+    concurrency: int = Field(..., description="Concurrent deploy requests")
+    refused: str | None = Field(None, description="Reason to refuse the job")
+
+
+def find_project_file(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    for info in archive.infolist():
+        if info.filename in PROJECT_FILES:
+            return info
+    raise Exception("Project file not found")
+
+
+def count_window(
+    text: str,
+    counts: dict[str, int],
+    decoder: json.JSONDecoder,
+) -> int:
+    """Count entity types in a window of the project file
+
+    Returns the number of bytes the entities were found in.
+    """
+    sampled_bytes = 0
+    pos = text.find('{"_id"')
+    while pos != -1:
+        try:
+            entity, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            # Truncated at the end of the window
+            break
+        if isinstance(entity, dict) and (_type := entity.get("type")):
+            counts[_type] = counts.get(_type, 0) + 1
+            sampled_bytes += end - pos
+            pos = text.find('{"_id"', end)
+        else:
+            # Nested object (e.g. a representation file)
+            pos = text.find('{"_id"', pos + 1)
+    return sampled_bytes
+
+
+def count_bson_window(data: bytes, counts: dict[str, int]) -> int:
+    """Count entity types in a window of a mongodump file
+
+    Documents are found by their ObjectId, which is preceded
+    by the length of the document.
+
+    Returns the number of bytes the entities were found in.
+    """
+    sampled_bytes = 0
+    pos = data.find(BSON_ID_ELEMENT, 4)
+    while pos != -1:
+        start = pos - 4
+        try:
+            entity, end = decode_document(data, start)
+        except Exception:
+            # Truncated at the end of the window or not a document
+            pos = data.find(BSON_ID_ELEMENT, pos + 1)
+            continue
+        if _type := entity.get("type"):
+            counts[_type] = counts.get(_type, 0) + 1
+            sampled_bytes += end - start
+            pos = data.find(BSON_ID_ELEMENT, end + 4)
+        else:
+            # Nested document (e.g. a representation file)
+            pos = data.find(BSON_ID_ELEMENT, pos + 1)
+    return sampled_bytes
+
+
+def source_format_of(head: bytes) -> str:
+    if is_bson(head):
+        return "bson"
+    return "json" if head.lstrip().startswith(b"[") else "jsonl"
+
+
+def count_entities(
+    chunk: bytes,
+    source_format: str,
+    counts: dict[str, int],
+    decoder: json.JSONDecoder,
+) -> int:
+    """Count entity types in a window of a project file of any format"""
+    if source_format == "bson":
+        return count_bson_window(chunk, counts)
+    text = chunk.decode("utf-8", errors="ignore")
+    return count_window(text, counts, decoder)
+
+
+def sample_entities(
+    archive: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+) -> tuple[str, dict[str, int], int]:
+    """Count entity types in windows spread over the project file
+
+    Entities are found by their '{"_id"' prefix, so the same code works
+    for JSON arrays and JSON lines. BSON documents are found by their
+    ObjectId element. Exports are usually ordered by type,
+    which is why a single window at the start would not be enough.
+
+    Returns the source format, entity counts by type and the number
+    of sampled bytes they were found in.
+    """
+    decoder = json.JSONDecoder()
+    counts: dict[str, int] = {}
+    sampled_bytes = 0
+
+    with archive.open(info) as f:
+        chunk = f.read(WINDOW_SIZE)
+        source_format = source_format_of(chunk[:64])
+
+        # Deflated members cannot seek without decompressing from
+        # the start, so the windows are read in a single forward pass
+        step = max(info.file_size // SAMPLE_WINDOWS, WINDOW_SIZE)
+        while chunk:
+            sampled_bytes += count_entities(chunk, source_format, counts, decoder)
+            skip = step - len(chunk)
+            while skip > 0 and (skipped := f.read(min(skip, COPY_CHUNK_SIZE))):
+                skip -= len(skipped)
+            chunk = f.read(WINDOW_SIZE)
+
+    return source_format, counts, sampled_bytes
+
+
+def sample_source(source_path: str) -> tuple[str, dict[str, int], int, int]:
+    """Sample a project file uploaded without a zip archive
+
+    The file may be compressed, so its decompressed size is not known
+    in advance. It is read once and windows are sampled at evenly
+    spaced positions of the compressed input.
+
+    Returns the source format, entity counts by type, the number of
+    sampled bytes and the decompressed size.
+    """
+    decoder = json.JSONDecoder()
+    counts: dict[str, int] = {}
+    sampled_bytes = 0
+    source_size = 0
+    step = max(os.path.getsize(source_path) // SAMPLE_WINDOWS, 1)
+    next_window = 0
+
+    with open_source(source_path) as (f, raw):
+        head = f.read(64)
+        source_size += len(head)
+        source_format = source_format_of(head)
+        while True:
+            if raw.tell() >= next_window:
+                chunk = head + f.read(WINDOW_SIZE)
+                sampled_bytes += count_entities(chunk, source_format, counts, decoder)
+                next_window = raw.tell() + step
+            else:
+                chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            source_size += len(chunk) - len(head)
+            head = b""
+
+    return source_format, counts, sampled_bytes, source_size
+
+
+def plan_import(source_path: str) -> ImportPlan:
+    """Estimate the cost of importing the uploaded archive
+
+    Reads the zip central directory and samples the project file
+    to estimate entity counts (bare, possibly compressed project
+    files are sampled in a single pass). Based on these, it predicts database
+    size, memory use, request count and duration, and decides where
+    the intermediate database lives, how many deploy requests run
+    in parallel and whether the node can handle the job at all.
+    """
+
+    if zipfile.is_zipfile(source_path):
+        with zipfile.ZipFile(source_path, "r") as archive:
+            info = find_project_file(archive)
+            extracted_size = sum(i.file_size for i in archive.infolist())
+            thumbnails = sum(
+                1
+                for i in archive.infolist()
+                if i.filename.startswith("thumbnails/")
+                and i.filename.endswith(".jpg")
+            )
+            source_format, counts, sampled_bytes = sample_entities(archive, info)
+        source_size = info.file_size
+    else:
+        # Bare project file is parsed in place, nothing is extracted
+        source_format, counts, sampled_bytes, source_size = sample_source(
+            source_path
+        )
+        extracted_size = 0
+        thumbnails = 0
+
+    scale = source_size / sampled_bytes if sampled_bytes else 0
+    entities = {
+        _type: round(count * scale)
+        for _type, count in counts.items()
+        if _type in VALID_TYPES
+    }
+    entity_count = sum(entities.values())
+    entity_size = source_size / entity_count if entity_count else 0
+
+    database_size = round(source_size * PAYLOAD_RATIO + entity_count * DB_ROW_OVERHEAD)
+
+    # Deploy loads all rows of one type at once.
+    # JSON arrays are also loaded as a whole by the parser.
+    peak_memory = max(entities.values(), default=0) * entity_size
+    if source_format == "json":
+        peak_memory = max(peak_memory, source_size)
+    peak_memory = round(peak_memory * JSON_MEMORY_FACTOR)
+
+    folders = entities.get("asset", 0)
+    batches = math.ceil((entity_count - folders) / BATCH_SIZE)
+    requests = batches + folders + thumbnails + 2
+
+    concurrency = 1
+    if requests >= PARALLEL_MIN_REQUESTS:
+        concurrency = config.deploy_concurrency
+
+    in_memory = (
+        not sharding_enabled()
+        and database_size < config.memory_db_limit * MB
+        and peak_memory + database_size < available_memory()
+    )
+
+    duration = (
+        source_size / PARSE_RATE
+        + batches * BATCH_SECONDS / concurrency
+        + (folders + thumbnails) * FOLDER_SECONDS
+    )
+
+    refused = None
+    needed = extracted_size + (0 if in_memory else database_size)
+    free = free_disk_space(config.work_dir)
+    if needed > free:
+        refused = (
+            f"Not enough disk space: {needed // MB} MB needed, {free // MB} MB free"
+        )
+
+    plan = ImportPlan(
+        archive_size=os.path.getsize(source_path),
+        extracted_size=extracted_size,
+        source_size=source_size,
+        source_format=source_format,
+        thumbnails=thumbnails,
+        entities=entities,
+        database_size=database_size,
+        peak_memory=peak_memory,
+        requests=requests,
+        duration=round(duration),
+        intermediate_db="memory" if in_memory else "disk",
+        concurrency=concurrency,
+        refused=refused,
+    )
+    logging.info(
+        f"Import plan: {entity_count} entities, "
+        f"{database_size // MB} MB {plan.intermediate_db} database, "
+        f"{peak_memory // MB} MB peak memory, {requests} requests, "
+        f"~{plan.duration}s with concurrency {concurrency}"
+    )
+    return plan
@@ -1,25 +1,30 @@
-import json
 import sqlite3
 
 from typing import Generator, Any
 from .common import config
+from .payload import unpack_payload
+from .scope import scope_condition
 
 
-def get_products(conn: sqlite3.Connection) -> Generator[dict[str, Any], None, None]:
+def get_products(
+    conn: sqlite3.Connection,
+    scoped: bool = False,
+) -> Generator[dict[str, Any], None, None]:
     db = conn.cursor()
     db.execute(
-        """
+        f"""
         SELECT id, parent, name, data
-        FROM entities WHERE type = 'subset'
-        -- AND parent IN (SELECT id FROM entities WHERE type = 'asset')
-        -- AND id IN (SELECT parent FROM entities WHERE type = 'version')
+        FROM subsets WHERE TRUE
+        {scope_condition(scoped)}
+        -- AND parent IN (SELECT id FROM assets)
+        -- AND id IN (SELECT parent FROM versions)
         """
     )
     for row in db.fetchall():
-        subset_id = row[0]
-        parent_id = row[1]
+        subset_id = row[0].hex()
+        parent_id = row[1].hex()
         subset_name = row[2]
-        subset_data = json.loads(row[3])
+        subset_data = unpack_payload(row[3])
 
         families = subset_data.pop("families", [])
         if (family := subset_data.pop("family", None)) is None:
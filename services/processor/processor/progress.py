@@ -0,0 +1,191 @@
+import time
+import logging
+import threading
+
+from typing import Any
+
+from .ayon import Ayon, ayon
+
+# Process event statuses that mean the import should stop
+CANCEL_STATUSES = ["aborted", "restarted"]
+
+# The event is updated at least this often (seconds), even when
+# nothing changed, so others can tell a stalled job from a slow one
+HEARTBEAT_INTERVAL = 60
+
+
+class ImportCancelled(Exception):
+    """Raised at a checkpoint when the process event was cancelled
+
+    `event_id` is the cancelled event, the process event itself
+    or one of the watched events.
+    """
+
+    def __init__(self, status: str, event_id: str | None = None):
+        super().__init__(f"Import {status}")
+        self.status = status
+        self.event_id = event_id
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+
+class ProgressReporter:
+    """Publish the progress of an import to its process event
+
+    Recording progress is just an attribute update, so it can be called
+    from the hot loops. A background thread publishes the latest state
+    at most once per `interval` seconds, coalescing everything that
+    happened in between, and skips the request if nothing changed,
+    apart from a heartbeat every HEARTBEAT_INTERVAL seconds.
+
+    The same thread watches the event status (and the status of events
+    in `watch`, such as the parent import). When any of them is aborted
+    or restarted from the server, the next call to `check` raises
+    ImportCancelled.
+    """
+
+    def __init__(
+        self,
+        event_id: str,
+        interval: float = 5.0,
+        watch: list[str] | None = None,
+    ):
+        self.event_id = event_id
+        self.interval = interval
+        self.watch = [event_id, *(watch or [])]
+        self.stage: str | None = None
+        self.label: str | None = None
+        self.unit = "rows"
+        self.scale = 1
+        self.done = 0
+        self.total: int | None = None
+        self.started_at = time.monotonic()
+        self.cancelled: str | None = None
+        self.cancelled_by: str | None = None
+        self.summary: dict[str, Any] = {}
+
+        # Separate client, so the thread never shares a connection
+        # with the requests made by the import itself
+        self.client = Ayon()
+        self.published: tuple[str, float | None] | None = None
+        self.published_at = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run,
+            daemon=True,
+            name="progress-reporter",
+        )
+
+    def __enter__(self) -> "ProgressReporter":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def start(
+        self,
+        stage: str,
+        total: int | None = None,
+        unit: str = "rows",
+        scale: int = 1,
+    ) -> None:
+        """Start a new stage and reset the counters"""
+        self.stage = stage
+        self.label = None
+        self.unit = unit
+        self.scale = scale
+        self.done = 0
+        self.total = total
+        self.started_at = time.monotonic()
+
+    def update(self, done: int, total: int | None = None) -> None:
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def advance(self, count: int = 1) -> None:
+        self.done += count
+
+    def update_summary(self, **kwargs: Any) -> None:
+        """Add values to the event summary and publish it right away"""
+        self.summary.update(kwargs)
+        ayon.update_event(self.event_id, summary=self.summary)
+
+    def check(self) -> None:
+        """Cancellation checkpoint"""
+        if self.cancelled:
+            raise ImportCancelled(self.cancelled, self.cancelled_by)
+
+    @property
+    def percent(self) -> float | None:
+        if not self.total:
+            return None
+        return min(100.0, 100.0 * self.done / self.total)
+
+    def describe(self) -> str:
+        description = self.stage or ""
+        if self.label:
+            description += f" ({self.label})"
+
+        elapsed = time.monotonic() - self.started_at
+        details = []
+        if (percent := self.percent) is not None:
+            details.append(f"{percent:.0f}%")
+            if self.done and elapsed > 1:
+                remaining = elapsed / self.done * (self.total - self.done)
+                details.append(f"ETA {format_duration(remaining)}")
+        if self.done and elapsed > 1:
+            details.append(f"{self.done / self.scale / elapsed:.0f} {self.unit}/s")
+        if details:
+            description += ": " + ", ".join(details)
+        return description
+
+    def publish(self) -> None:
+        if self.stage is None:
+            return
+        state = (self.describe(), self.percent)
+        if (
+            state == self.published
+            and time.monotonic() - self.published_at < HEARTBEAT_INTERVAL
+        ):
+            return
+        description, percent = state
+        kwargs = {"description": description}
+        if percent is not None:
+            kwargs["progress"] = round(percent, 1)
+        try:
+            self.client.update_event(self.event_id, **kwargs)
+        except Exception as e:
+            logging.debug(f"Unable to publish progress: {e}")
+            return
+        self.published = state
+        self.published_at = time.monotonic()
+
+    def poll_status(self) -> None:
+        for event_id in self.watch:
+            try:
+                event = self.client.get(f"events/{event_id}")
+            except Exception as e:
+                logging.debug(f"Unable to check the event status: {e}")
+                continue
+            if event["status"] in CANCEL_STATUSES:
+                logging.warning(f"Event {event['status']}. Stopping the import")
+                self.cancelled = event["status"]
+                self.cancelled_by = event_id
+                return
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.poll_status()
+            if self.cancelled:
+                return
+            self.publish()
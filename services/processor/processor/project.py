@@ -1,16 +1,17 @@
-import json
 import logging
 
 from typing import Any
 
+from .payload import unpack_payload
+
 
 def parse_project(
     project_name: str,
-    project_payload: str,
+    project_payload: bytes | str,
     folder_types: list[str],
     task_type_map: dict[str, Any],
 ) -> dict[str, Any]:
-    project_data = json.loads(project_payload)
+    project_data = unpack_payload(project_payload)
 
     # Unused keys
     project_data.pop("entityType", None)
@@ -1,26 +1,29 @@
-import json
 import sqlite3
 
 from typing import Generator, Any
 from .common import config
+from .payload import unpack_payload
+from .scope import scope_condition
 
 
 def get_representations(
     conn: sqlite3.Connection,
+    scoped: bool = False,
 ) -> Generator[dict[str, Any], None, None]:
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT id, parent, name, data
-        FROM entities WHERE type = 'representation'
-        -- AND parent IN (SELECT id FROM entities WHERE type = 'version')
+        FROM representations WHERE TRUE
+        {scope_condition(scoped)}
+        -- AND parent IN (SELECT id FROM versions)
         """
     )
     for row in cursor.fetchall():
-        version_id = row[0]
-        parent_id = row[1]
+        version_id = row[0].hex()
+        parent_id = row[1].hex()
         name = row[2]
-        representation_data = json.loads(row[3])
+        representation_data = unpack_payload(row[3])
 
         # files
         files_field = []
@@ -0,0 +1,44 @@
+import os
+import shutil
+import logging
+
+from .common import config
+
+MB = 1024 * 1024
+
+
+def available_memory() -> int:
+    """Return the memory available for new processes in bytes"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def free_disk_space(path: str) -> int:
+    """Return free space on the volume containing the path in bytes"""
+    return shutil.disk_usage(path).free
+
+
+def can_accept_job() -> bool:
+    """Check whether the node has enough resources to start a new job
+
+    Each job slot calls this before enrolling, so a node busy with
+    a big import stops taking new work instead of running out of
+    memory or disk mid-import.
+    """
+    memory = available_memory()
+    if memory < config.min_free_memory * MB:
+        logging.debug(f"Not enough memory to accept a job: {memory // MB} MB")
+        return False
+
+    disk = free_disk_space(config.work_dir)
+    if disk < config.min_free_disk * MB:
+        logging.debug(f"Not enough disk space to accept a job: {disk // MB} MB")
+        return False
+
+    return True
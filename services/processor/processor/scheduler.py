@@ -0,0 +1,138 @@
+import time
+import logging
+
+from typing import Any
+
+from .ayon import ayon
+from .common import config
+from .resources import MB
+
+UPLOAD_TOPIC = "openpype_import.upload"
+PROCESS_TOPIC = "openpype_import.process"
+
+# Uploads this node released because it could not fit them are left
+# for other nodes for this many seconds
+REFUSED_TTL = 600
+
+refused_jobs: dict[str, float] = {}
+
+
+def refuse_job(upload_id: str) -> None:
+    """Do not enroll on the upload again for a while"""
+    refused_jobs[upload_id] = time.monotonic() + REFUSED_TTL
+
+
+def release_job(source_event_id: str, target_event_id: str, reason: str) -> None:
+    """Give an enrolled upload back to other processors
+
+    Restarted process events are enrolled on again. This node
+    does not enroll on the upload for a while.
+    """
+    refuse_job(source_event_id)
+    ayon.update_event(
+        target_event_id,
+        status="restarted",
+        description=f"Released by {config.service_name}: {reason}",
+    )
+
+
+def is_refused(upload_id: str) -> bool:
+    now = time.monotonic()
+    for job_id, until in list(refused_jobs.items()):
+        if until < now:
+            del refused_jobs[job_id]
+    return upload_id in refused_jobs
+
+
+def job_size(job: dict[str, Any]) -> int:
+    """Size of the job, the archive contents when known"""
+    return job.get("extractedSize") or job["size"]
+
+
+def accepts(job: dict[str, Any]) -> bool:
+    """Check whether the job belongs to the size class of this processor"""
+    large = job_size(job) >= config.large_job_size * MB
+    if config.size_class == "large":
+        return large
+    if config.size_class == "small":
+        return not large
+    return True
+
+
+def priority(job: dict[str, Any]) -> float:
+    """Shortest job first, with aging
+
+    Every minute of waiting makes the job count as queue_aging MB
+    smaller, so a large upload eventually wins over new small ones.
+    """
+    return job_size(job) / MB - job["waiting"] / 60 * config.queue_aging
+
+
+def candidates(queue: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Waiting uploads this processor may take, in the order to try them"""
+    jobs = [job for job in queue if accepts(job) and not is_refused(job["id"])]
+    if config.scheduling == "sjf":
+        jobs.sort(key=priority)
+    return jobs
+
+
+def enroll_upload(
+    sender: str,
+    upload_ids: set[str] | None = None,
+) -> dict[str, Any] | None:
+    """Enroll on the next upload according to the scheduling policy
+
+    The server enroll endpoint picks events first come, first served.
+    The upload is chosen here and enrolled on using a filter, trying
+    the next candidate if another processor was faster. Uploads
+    this node refused recently are skipped.
+
+    Servers ignoring the filter enroll on the oldest upload instead,
+    which is released when this processor would not have chosen it.
+
+    With `upload_ids`, only those uploads are enrolled on.
+    """
+    req = {
+        "sourceTopic": UPLOAD_TOPIC,
+        "targetTopic": PROCESS_TOPIC,
+        "sender": sender,
+        "description": "Importing project",
+    }
+
+    if (
+        upload_ids is None
+        and config.scheduling == "fifo"
+        and config.size_class == "any"
+        and not refused_jobs
+    ):
+        return ayon.post("enroll", json=req)
+
+    queue = ayon.get(f"{ayon.addon_endpoint}/queue")
+    if upload_ids is not None:
+        queue = [job for job in queue if job["id"] in upload_ids]
+    for job in candidates(queue):
+        res = ayon.post(
+            "enroll",
+            json={
+                **req,
+                "filter": {
+                    "conditions": [{"key": "id", "value": job["id"]}],
+                },
+            },
+        )
+        if res is None:
+            continue
+        if res["dependsOn"] != job["id"]:
+            logging.warning("Server ignores enroll filters, scheduling is FIFO")
+            if upload_ids is not None and res["dependsOn"] not in upload_ids:
+                release_job(res["dependsOn"], res["id"], "not an upload it waits for")
+                return None
+            enrolled = next((j for j in queue if j["id"] == res["dependsOn"]), None)
+            # Uploads queued after the queue was listed have an unknown size
+            if enrolled is not None and not (
+                accepts(enrolled) and not is_refused(enrolled["id"])
+            ):
+                release_job(res["dependsOn"], res["id"], "not chosen by its scheduler")
+                return None
+        return res
+    return None
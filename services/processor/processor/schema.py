@@ -0,0 +1,116 @@
+import sqlite3
+
+# Intermediate database schema
+#
+# Every OpenPype entity type has its own table with only the columns
+# the type uses, so no type column and type index are needed and
+# queries of one type never read rows of the others. IDs are stored
+# as 16-byte blobs instead of 32 hex characters, which halves the
+# keys repeated in every index.
+#
+# IDs are hex strings everywhere outside of the database: rows are
+# converted with bytes.hex() when read and hex IDs passed to queries
+# with the uuid_key() SQL function.
+#
+# The schema version is stored as the user_version of the database,
+# databases of other versions are not reused.
+
+SCHEMA_VERSION = 2
+
+# Tables by OpenPype entity type
+TABLES = {
+    "project": "project",
+    "asset": "assets",
+    "subset": "subsets",
+    "version": "versions",
+    "hero_version": "hero_versions",
+    "representation": "representations",
+}
+
+# Columns of the tables by OpenPype entity type, besides the ID
+COLUMNS = {
+    "project": ["name", "data"],
+    "asset": ["entity_type", "visual_parent", "name", "data"],
+    "subset": ["parent", "name", "data"],
+    "version": ["parent", "data"],
+    "hero_version": ["parent", "source_version", "data"],
+    "representation": ["parent", "name", "data"],
+}
+
+KEY_COLUMNS = ["id", "parent", "visual_parent", "source_version"]
+
+SCHEMA_INDICES = [
+    "CREATE INDEX assets_visual_parent_idx ON assets (visual_parent)",
+    "CREATE INDEX subsets_parent_idx ON subsets (parent)",
+    "CREATE INDEX versions_parent_idx ON versions (parent)",
+    "CREATE INDEX hero_versions_parent_idx ON hero_versions (parent)",
+    "CREATE INDEX hero_versions_source_version_idx ON hero_versions (source_version)",
+    "CREATE INDEX representations_parent_idx ON representations (parent)",
+]
+
+
+def uuid_key(uuid: str | None) -> bytes | None:
+    """Key of the hex UUID, as stored in the database"""
+    if uuid is None:
+        return None
+    return bytes.fromhex(uuid)
+
+
+def key_uuid(key: bytes | None) -> str | None:
+    """Hex UUID of the key read from the database"""
+    if key is None:
+        return None
+    return key.hex()
+
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    """Create empty entity tables, replacing the existing ones"""
+    db = conn.cursor()
+    db.execute("DROP TABLE IF EXISTS entities")
+    for entity_type, table in TABLES.items():
+        columns = ", ".join(
+            f"{column} {'BLOB' if column in KEY_COLUMNS + ['data'] else 'TEXT'}"
+            for column in COLUMNS[entity_type]
+        )
+        db.execute(f"DROP TABLE IF EXISTS {table}")
+        db.execute(
+            f"CREATE TABLE {table} (id BLOB PRIMARY KEY, {columns}) WITHOUT ROWID"
+        )
+    db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def create_indices(conn: sqlite3.Connection) -> None:
+    """Index the entity tables, done once they are filled"""
+    db = conn.cursor()
+    for index in SCHEMA_INDICES:
+        db.execute(index)
+
+
+def insert_query(entity_type: str) -> str:
+    columns = ["id", *COLUMNS[entity_type]]
+    return (
+        f"INSERT INTO {TABLES[entity_type]} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(':' + column for column in columns)})"
+    )
+
+
+def count_rows(conn: sqlite3.Connection, schema: str = "main") -> dict[str, int]:
+    """Number of stored entities by their type"""
+    db = conn.cursor()
+    counts = {}
+    for entity_type, table in TABLES.items():
+        db.execute(f"SELECT count(*) FROM {schema}.{table}")
+        if count := db.fetchone()[0]:
+            counts[entity_type] = count
+    return counts
+
+
+def schema_version(conn: sqlite3.Connection, schema: str = "main") -> int:
+    db = conn.cursor()
+    db.execute(f"PRAGMA {schema}.user_version")
+    return db.fetchone()[0]
+
+
+def register_functions(conn: sqlite3.Connection) -> None:
+    """Make the uuid_key SQL function available on the connection"""
+    conn.create_function("uuid_key", 1, uuid_key, deterministic=True)
@@ -0,0 +1,24 @@
+import sqlite3
+
+
+def set_scope(conn: sqlite3.Connection, query: str, params: dict | tuple = ()) -> int:
+    """Limit the deployed entities to the IDs returned by the query
+
+    IDs are stored in a temporary table, which entity generators
+    join when called with `scoped=True`. The query returns keys,
+    hex IDs are converted with uuid_key(). Returns the number of
+    entities in the scope.
+    """
+    db = conn.cursor()
+    db.execute("DROP TABLE IF EXISTS temp.scope")
+    db.execute("CREATE TEMP TABLE scope (id BLOB PRIMARY KEY)")
+    db.execute(f"INSERT OR IGNORE INTO temp.scope {query}", params)
+    db.execute("SELECT count(*) FROM temp.scope")
+    return db.fetchone()[0]
+
+
+def scope_condition(scoped: bool, column: str = "id") -> str:
+    """SQL condition limiting the column to the current scope"""
+    if not scoped:
+        return ""
+    return f"AND {column} IN (SELECT id FROM temp.scope)"
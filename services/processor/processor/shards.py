@@ -0,0 +1,311 @@
+import os
+import time
+import logging
+import sqlite3
+import traceback
+
+from typing import Any
+
+from .ayon import ayon
+from .common import config
+from .scope import set_scope
+from .operations import deploy_products
+from .database import open_database
+from .progress import ImportCancelled, ProgressReporter
+
+SHARD_TOPIC = "openpype_import.shard"
+SHARD_PROCESS_TOPIC = "openpype_import.shard_process"
+DONE_STATUSES = ["finished", "failed", "aborted"]
+
+# Shard ranges are hex IDs, as they are passed in event payloads
+SHARD_SCOPE_QUERY = """
+    WITH bounds(first, last) AS (SELECT uuid_key(:first), uuid_key(:last)),
+    shard_versions(id) AS (
+        SELECT id FROM versions, bounds WHERE parent BETWEEN first AND last
+        UNION ALL
+        SELECT id FROM hero_versions, bounds WHERE parent BETWEEN first AND last
+    )
+    SELECT id FROM subsets, bounds WHERE id BETWEEN first AND last
+    UNION ALL
+    SELECT id FROM shard_versions
+    UNION ALL
+    SELECT r.id FROM representations AS r
+    INNER JOIN shard_versions AS v ON r.parent = v.id
+"""
+
+# Stalled shards are restarted this many times, then they fail
+SHARD_RETRIES = 2
+
+
+def sharding_enabled() -> bool:
+    return bool(config.shard_dir) and config.shards > 1
+
+
+def shared_database_path(event_id: str) -> str | None:
+    """Path of the intermediate database in the shard directory
+
+    Returns None if sharding is not configured.
+    """
+    if not sharding_enabled():
+        return None
+    return os.path.join(config.shard_dir, f"{event_id}.db")
+
+
+def should_shard(sqlite_path: str | None, entity_count: int) -> bool:
+    """Check whether the project should be deployed in shards
+
+    The database must be in the shard directory, so other
+    replicas can read it.
+    """
+    if not (sharding_enabled() and sqlite_path):
+        return False
+    db_dir = os.path.dirname(os.path.abspath(sqlite_path))
+    if db_dir != os.path.abspath(config.shard_dir):
+        return False
+    return entity_count >= config.shard_min_entities
+
+
+def split_products(conn: sqlite3.Connection, shards: int) -> list[tuple[str, str]]:
+    """Split products to contiguous ID ranges of similar size"""
+    db = conn.cursor()
+    db.execute(
+        """
+        SELECT min(id), max(id) FROM (
+            SELECT id, NTILE(?) OVER (ORDER BY id) AS shard
+            FROM subsets
+        )
+        GROUP BY shard ORDER BY shard
+        """,
+        (shards,),
+    )
+    return [(first.hex(), last.hex()) for first, last in db.fetchall()]
+
+
+def save_thumbnails(conn: sqlite3.Connection, thumbnails: dict[str, str]) -> None:
+    """Store the deployed thumbnail IDs for the shard workers"""
+    db = conn.cursor()
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS thumbnails (
+            original_id TEXT PRIMARY KEY,
+            thumbnail_id TEXT
+        )
+        """
+    )
+    db.executemany(
+        "INSERT OR REPLACE INTO thumbnails VALUES (?, ?)",
+        thumbnails.items(),
+    )
+    conn.commit()
+
+
+def load_thumbnails(conn: sqlite3.Connection) -> dict[str, str]:
+    db = conn.cursor()
+    try:
+        db.execute("SELECT original_id, thumbnail_id FROM thumbnails")
+    except sqlite3.OperationalError:
+        return {}
+    return dict(db.fetchall())
+
+
+def shard_jobs(event_id: str) -> list[dict[str, Any]]:
+    """Return the shards of the import with the status of their jobs
+
+    Shards no processor enrolled on yet are pending. `idle` is
+    the number of seconds since the job was last updated.
+    """
+    return ayon.get(f"{ayon.addon_endpoint}/shards/{event_id}")
+
+
+def is_stalled(job: dict[str, Any]) -> bool:
+    """Check whether the processor of the shard stopped reporting
+
+    Running jobs update their event at least once a minute, so
+    a job idle for longer than the timeout has lost its processor.
+    """
+    return (
+        job["processId"] is not None
+        and job["status"] in ("pending", "in_progress")
+        and job["idle"] > config.shard_timeout
+    )
+
+
+def restart_shard(job: dict[str, Any], retries: int) -> None:
+    """Put a stalled shard back to the queue, or fail it"""
+    if retries >= SHARD_RETRIES:
+        logging.error(f"Shard {job['shardId']} stalled {retries + 1} times")
+        ayon.update_event(
+            job["processId"],
+            status="failed",
+            description=f"Shard stalled {retries + 1} times",
+        )
+        return
+    logging.warning(f"Shard {job['shardId']} stalled, restarting it")
+    ayon.update_event(
+        job["processId"],
+        status="restarted",
+        description=f"Stalled for {job['idle']:.0f}s, restarted",
+    )
+
+
+def coordinate_shards(
+    conn: sqlite3.Connection,
+    sqlite_path: str,
+    project_name: str,
+    thumbnails: dict[str, str],
+    progress: ProgressReporter,
+    concurrency: int = 1,
+) -> None:
+    """Split the deployment of products to shards and wait for them
+
+    Products are split to contiguous ID ranges, each published as
+    a shard event. Any replica may enroll on these and deploy the
+    products, versions and representations of the range, reading
+    the intermediate database from the shard directory.
+    The coordinator deploys shards as well while waiting. Shards
+    whose processor stops updating them are restarted, so another
+    replica takes them over.
+    """
+
+    save_thumbnails(conn, thumbnails)
+    units = split_products(conn, config.shards)
+    logging.info(f"Splitting the deployment to {len(units)} shards")
+
+    shard_events: dict[str, int] = {}
+    for i, (first, last) in enumerate(units):
+        count = set_scope(conn, SHARD_SCOPE_QUERY, {"first": first, "last": last})
+        res = ayon.post(
+            "events",
+            json={
+                "topic": SHARD_TOPIC,
+                "project": project_name,
+                "dependsOn": progress.event_id,
+                "description": f"Shard {i + 1}/{len(units)} of {project_name}",
+                "payload": {
+                    "database": os.path.basename(sqlite_path),
+                    "project": project_name,
+                    "first": first,
+                    "last": last,
+                    "shard": i,
+                    "shards": len(units),
+                    "concurrency": concurrency,
+                },
+                "finished": True,
+            },
+        )
+        shard_events[res["id"]] = count
+
+    progress.label = "shards"
+    pending = set(shard_events)
+    failed = 0
+    restarts: dict[str, int] = {}
+    sender = f"{config.service_name}-coordinator-{os.getpid()}"
+    while pending:
+        jobs = shard_jobs(progress.event_id)
+        for shard_event_id in pending - {job["shardId"] for job in jobs}:
+            # Removed from the server, it never finishes
+            logging.error(f"Shard {shard_event_id} is missing")
+            pending.discard(shard_event_id)
+            failed += 1
+        for job in jobs:
+            shard_event_id = job["shardId"]
+            if shard_event_id not in pending:
+                continue
+            status = job["status"]
+            if status in DONE_STATUSES:
+                pending.discard(shard_event_id)
+                progress.advance(shard_events[shard_event_id])
+                if status != "finished":
+                    failed += 1
+            elif is_stalled(job):
+                retries = restarts.get(shard_event_id, 0)
+                restart_shard(job, retries)
+                restarts[shard_event_id] = retries + 1
+        if not pending:
+            break
+        progress.check()
+
+        # Help with the shards instead of just waiting
+        if not enroll_shard(sender):
+            time.sleep(5)
+
+    if failed:
+        raise Exception(f"{failed} of {len(shard_events)} shards failed")
+
+
+def process_shard(payload: dict[str, Any], progress: ProgressReporter) -> None:
+    sqlite_path = os.path.join(config.shard_dir, payload["database"])
+    assert os.path.exists(sqlite_path), "Shared database does not exist"
+    with open_database(f"file:{sqlite_path}?mode=ro", uri=True) as conn:
+        thumbnails = load_thumbnails(conn)
+        count = set_scope(
+            conn,
+            SHARD_SCOPE_QUERY,
+            {"first": payload["first"], "last": payload["last"]},
+        )
+        progress.start(
+            f"Deploying shard {payload['shard'] + 1}/{payload['shards']}",
+            total=count,
+        )
+        deploy_products(
+            conn,
+            payload["project"],
+            thumbnails,
+            progress,
+            scoped=True,
+            concurrency=payload.get("concurrency", 1),
+        )
+
+
+def enroll_shard(sender: str) -> bool:
+    """Enroll and process a shard job. Returns False if there is none"""
+    if not config.shard_dir:
+        return False
+
+    res = ayon.post(
+        "enroll",
+        json={
+            "sourceTopic": SHARD_TOPIC,
+            "targetTopic": SHARD_PROCESS_TOPIC,
+            "sender": sender,
+            "description": "Deploying shard",
+        },
+    )
+    if res is None:
+        return False
+
+    source_event = ayon.get(f"events/{res['dependsOn']}")
+    target_event_id = res["id"]
+    ayon.update_event(
+        target_event_id,
+        project=source_event["project"],
+        status="in_progress",
+        description="Deploying shard",
+    )
+
+    try:
+        with ProgressReporter(
+            target_event_id,
+            watch=[source_event["dependsOn"]],
+        ) as progress:
+            process_shard(source_event["payload"], progress)
+    except ImportCancelled as e:
+        logging.warning(f"Shard {e}")
+        if progress.cancelled_by != target_event_id:
+            # The whole import was cancelled
+            ayon.update_event(target_event_id, status="aborted", description=str(e))
+    except Exception as e:
+        logging.exception("Error while deploying shard")
+        ayon.update_event(
+            target_event_id,
+            status="failed",
+            description=str(e),
+            payload={"traceback": traceback.format_exc()},
+        )
+    else:
+        ayon.update_event(
+            target_event_id,
+            status="finished",
+            description="Shard deployed",
+        )
+    return True
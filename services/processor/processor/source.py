@@ -0,0 +1,92 @@
+import os
+import logging
+
+from typing import Any
+
+from .ayon import ayon
+from .common import config
+from .resources import MB
+from .progress import ProgressReporter
+
+
+def shared_upload_path(
+    source_event_id: str,
+    source_summary: dict[str, Any],
+) -> str | None:
+    """Return the path of the upload on the shared volume
+
+    Returns None when the shared private directory is not configured,
+    the file is not reachable, or it does not match the uploaded size
+    (for example when the mount is stale).
+    """
+    if not config.shared_private_dir:
+        return None
+
+    path = os.path.join(config.shared_private_dir, source_event_id)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        logging.warning(f"Upload not found in the shared directory: {path}")
+        return None
+
+    expected_size = source_summary.get("size")
+    if expected_size is not None and size != expected_size:
+        logging.warning(f"Shared upload size does not match: {path}")
+        return None
+    return path
+
+
+def fetch_source(
+    source_event_id: str,
+    target_event_id: str,
+    source_summary: dict[str, Any],
+    job_dir: str,
+    progress: ProgressReporter | None = None,
+) -> str:
+    """Make the uploaded file available to the processor
+
+    If the addon private directory is mounted, the upload is opened
+    in place. Otherwise it is downloaded to the job directory.
+    Returns the path of the uploaded file.
+    """
+
+    if path := shared_upload_path(source_event_id, source_summary):
+        logging.info(f"Using the upload from the shared directory: {path}")
+        return path
+
+    target_path = os.path.join(job_dir, "source.zip")
+
+    ayon.update_event(
+        target_event_id,
+        status="in_progress",
+        description="Downloading source file",
+    )
+
+    if progress:
+        progress.start(
+            "Downloading source file",
+            total=source_summary.get("size"),
+            unit="MB",
+            scale=MB,
+        )
+
+    def on_progress(received: int, total: int | None) -> None:
+        if progress:
+            progress.update(received, total)
+            progress.check()
+
+    download = ayon.download_private_file(
+        source_event_id,
+        target_path,
+        expected_size=source_summary.get("size"),
+        checksum=source_summary.get("sha256"),
+        on_progress=on_progress,
+    )
+    assert download["size"] > 0, "Source file is empty"
+    logging.info(
+        f"Downloaded {download['size'] // MB} MB in {download['seconds']}s "
+        f"({download['throughput'] / MB:.1f} MB/s)"
+    )
+    if progress:
+        progress.update_summary(download=download)
+    return target_path
@@ -0,0 +1,52 @@
+import logging
+
+from typing import Any
+
+from .ayon import ayon
+
+# Staged import
+#
+# The project is deployed under a temporary name while the live one
+# stays available. Once the deploy is finished, the server addon
+# replaces the live project with the staged one. A failed import
+# leaves the live project untouched.
+
+STAGING_SUFFIX = "_import_staging"
+
+# Same limits as the server addon, the staging project must fit them
+MAX_PROJECT_NAME_LENGTH = 63 - len("project_")
+MAX_PROJECT_CODE_LENGTH = 64
+
+
+def staging_project(project: dict[str, Any]) -> dict[str, Any]:
+    """Project payload for the staging project
+
+    Project codes are unique, so the staging project gets its own
+    until the switch-over.
+    """
+    if len(project["name"] + STAGING_SUFFIX) > MAX_PROJECT_NAME_LENGTH:
+        raise Exception(
+            f"Project name {project['name']} is too long for a staged import"
+        )
+    if len(project["code"] + STAGING_SUFFIX) > MAX_PROJECT_CODE_LENGTH:
+        raise Exception(
+            f"Project code {project['code']} is too long for a staged import"
+        )
+    return {
+        **project,
+        "name": project["name"] + STAGING_SUFFIX,
+        "code": project["code"] + STAGING_SUFFIX,
+    }
+
+
+def switch_project(project: dict[str, Any], staging_name: str) -> None:
+    """Replace the live project with the staging one"""
+    logging.info(f"Switching {project['name']} to the staged import")
+    ayon.post(
+        f"{ayon.addon_endpoint}/switch",
+        json={
+            "projectName": project["name"],
+            "stagingName": staging_name,
+            "code": project["code"],
+        },
+    )
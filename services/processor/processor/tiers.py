@@ -0,0 +1,272 @@
+import os
+import json
+import logging
+import sqlite3
+import traceback
+
+from .ayon import ayon
+from .common import config
+from .database import backup_database, open_database
+from .incremental import save_baseline
+from .operations import batch_process_ops
+from .products import get_products
+from .progress import ImportCancelled, ProgressReporter
+from .representations import get_representations
+from .scope import set_scope
+from .shards import load_thumbnails
+from .versions import get_hero_versions, get_versions
+
+# Tiered import
+#
+# The skeleton of the project (anatomy, folders, tasks and products)
+# is deployed first, so the project can be browsed right away.
+# Versions and representations follow, newest first. When a shard
+# directory is configured, they are deployed by a background job,
+# which processors pick only when there are no uploads waiting.
+
+TIER_TOPIC = "openpype_import.tier"
+TIER_PROCESS_TOPIC = "openpype_import.tier_process"
+
+# Number of versions deployed together with their representations
+CONTENT_WINDOW = 1000
+
+VERSION_ORDER_QUERY = """
+    SELECT id FROM versions
+    ORDER BY COALESCE(json_extract(payload(data), '$.time'), '') DESC, id
+"""
+
+WINDOW_SCOPE_QUERY = """
+    SELECT uuid_key(value) FROM json_each(:versions)
+    UNION ALL
+    SELECT id FROM hero_versions
+    WHERE source_version IN (SELECT uuid_key(value) FROM json_each(:versions))
+"""
+
+WINDOW_REPRESENTATIONS_QUERY = """
+    INSERT OR IGNORE INTO temp.scope
+    SELECT id FROM representations
+    WHERE parent IN (SELECT id FROM temp.scope)
+"""
+
+
+def can_defer_content() -> bool:
+    """Check whether the content tier may run as a background job
+
+    The database must be readable by whichever processor picks the job.
+    """
+    return bool(config.shard_dir)
+
+
+def content_database_path(event_id: str) -> str:
+    return os.path.join(config.shard_dir, f"{event_id}.content.db")
+
+
+def report_tiers(event_id: str, **tiers: str) -> None:
+    """Merge tier statuses to the summary of the process event"""
+    summary = ayon.get(f"events/{event_id}").get("summary") or {}
+    summary["tiers"] = {**summary.get("tiers", {}), **tiers}
+    ayon.update_event(event_id, summary=summary)
+
+
+def count_content(conn: sqlite3.Connection) -> int:
+    db = conn.cursor()
+    db.execute(
+        """
+        SELECT
+            (SELECT count(*) FROM versions)
+            + (SELECT count(*) FROM hero_versions)
+            + (SELECT count(*) FROM representations)
+        """
+    )
+    return db.fetchone()[0]
+
+
+def deploy_content(
+    conn: sqlite3.Connection,
+    project_name: str,
+    thumbnails: dict[str, str],
+    progress: ProgressReporter | None = None,
+    concurrency: int = 1,
+) -> None:
+    """Deploy versions and representations, newest versions first
+
+    Versions are deployed in windows, each followed by its hero
+    versions and representations, so the recent work is complete
+    long before the whole project is.
+    """
+    db = conn.cursor()
+    db.execute(VERSION_ORDER_QUERY)
+    version_ids = [row[0].hex() for row in db.fetchall()]
+
+    counts = {"versions": 0, "hero versions": 0, "representations": 0}
+    for i in range(0, len(version_ids), CONTENT_WINDOW):
+        window = version_ids[i : i + CONTENT_WINDOW]
+        set_scope(conn, WINDOW_SCOPE_QUERY, {"versions": json.dumps(window)})
+        db.execute(WINDOW_REPRESENTATIONS_QUERY)
+
+        stages = [
+            ("versions", get_versions(conn, thumbnails, True)),
+            ("hero versions", get_hero_versions(conn, thumbnails, True)),
+            ("representations", get_representations(conn, True)),
+        ]
+        for label, ops_generator in stages:
+            if progress:
+                progress.label = label
+            counts[label] += batch_process_ops(
+                project_name,
+                ops_generator,
+                progress,
+                concurrency,
+            )
+
+    for label, count in counts.items():
+        logging.info(f"Deployed {count} {label}")
+
+
+def defer_content(
+    conn: sqlite3.Connection,
+    project_name: str,
+    progress: ProgressReporter,
+    concurrency: int = 1,
+    keep_baseline: bool = False,
+) -> None:
+    """Publish the content tier as a background job
+
+    The database is copied to the shard directory, as the working
+    directory of the import is removed when the import ends
+    and in-memory databases are gone with it.
+    """
+    backup_database(conn, content_database_path(progress.event_id))
+    ayon.post(
+        "events",
+        json={
+            "topic": TIER_TOPIC,
+            "project": project_name,
+            "dependsOn": progress.event_id,
+            "description": f"Versions and representations of {project_name}",
+            "payload": {
+                "database": os.path.basename(content_database_path(progress.event_id)),
+                "project": project_name,
+                "concurrency": concurrency,
+                "baseline": keep_baseline,
+            },
+            "finished": True,
+        },
+    )
+
+
+def deploy_tiers(
+    conn: sqlite3.Connection,
+    project_name: str,
+    thumbnails: dict[str, str],
+    progress: ProgressReporter | None = None,
+    concurrency: int = 1,
+    keep_baseline: bool = False,
+) -> None:
+    """Deploy products, then the content tier, inline or in background
+
+    Folders must already exist. The project is usable once products
+    are deployed. The baseline for incremental imports, if kept,
+    is saved when the content tier is finished.
+    """
+    if progress:
+        progress.label = "products"
+    count = batch_process_ops(project_name, get_products(conn), progress, concurrency)
+    logging.info(f"Deployed {count} products")
+
+    if progress and can_defer_content():
+        defer_content(conn, project_name, progress, concurrency, keep_baseline)
+        progress.update_summary(tiers={"skeleton": "finished", "content": "pending"})
+        logging.info("Project is usable, versions are deployed in background")
+        return
+
+    if progress:
+        progress.update_summary(tiers={"skeleton": "finished", "content": "in_progress"})
+        progress.start("Deploying versions", total=count_content(conn))
+    deploy_content(conn, project_name, thumbnails, progress, concurrency)
+    if progress:
+        progress.update_summary(tiers={"skeleton": "finished", "content": "finished"})
+    if keep_baseline:
+        save_baseline(conn, project_name)
+
+
+def process_content(
+    payload: dict,
+    progress: ProgressReporter,
+) -> None:
+    sqlite_path = os.path.join(config.shard_dir, payload["database"])
+    assert os.path.exists(sqlite_path), "Content database does not exist"
+    project_name = payload["project"]
+    with open_database(sqlite_path) as conn:
+        progress.start("Deploying versions", total=count_content(conn))
+        deploy_content(
+            conn,
+            project_name,
+            load_thumbnails(conn),
+            progress,
+            payload.get("concurrency", 1),
+        )
+        if payload.get("baseline"):
+            save_baseline(conn, project_name)
+
+
+def enroll_content(sender: str) -> bool:
+    """Enroll and process a content tier job. Returns False if there is none"""
+    if not can_defer_content():
+        return False
+
+    res = ayon.post(
+        "enroll",
+        json={
+            "sourceTopic": TIER_TOPIC,
+            "targetTopic": TIER_PROCESS_TOPIC,
+            "sender": sender,
+            "description": "Deploying versions",
+        },
+    )
+    if res is None:
+        return False
+
+    source_event = ayon.get(f"events/{res['dependsOn']}")
+    process_event_id = source_event["dependsOn"]
+    target_event_id = res["id"]
+    sqlite_path = os.path.join(config.shard_dir, source_event["payload"]["database"])
+    ayon.update_event(
+        target_event_id,
+        project=source_event["project"],
+        status="in_progress",
+        description="Deploying versions",
+    )
+    report_tiers(process_event_id, content="in_progress")
+
+    try:
+        with ProgressReporter(
+            target_event_id,
+            watch=[process_event_id],
+        ) as progress:
+            process_content(source_event["payload"], progress)
+    except ImportCancelled as e:
+        # The project is being imported again, the content is obsolete
+        logging.warning(f"Content tier {e}")
+        if progress.cancelled_by != target_event_id:
+            ayon.update_event(target_event_id, status="aborted", description=str(e))
+        report_tiers(process_event_id, content="aborted")
+        os.remove(sqlite_path)
+    except Exception as e:
+        logging.exception("Error while deploying versions")
+        ayon.update_event(
+            target_event_id,
+            status="failed",
+            description=str(e),
+            payload={"traceback": traceback.format_exc()},
+        )
+        report_tiers(process_event_id, content="failed")
+    else:
+        ayon.update_event(
+            target_event_id,
+            status="finished",
+            description="Versions and representations deployed",
+        )
+        report_tiers(process_event_id, content="finished")
+        os.remove(sqlite_path)
+    return True
@@ -0,0 +1,105 @@
+import logging
+import sqlite3
+
+# Folder tree
+#
+# Folders only reference their visual parent. The folder_tree table
+# materializes the position of every folder reachable from the root,
+# so subtree questions are answered by set-based queries instead of
+# walking the hierarchy. Descendants of a folder are the folders whose
+# path starts with the path of the folder followed by a slash, which
+# is the index range [path || '/', path || '0').
+
+FOLDER_TREE_SCHEMA = """
+    CREATE TABLE folder_tree (
+        id BLOB PRIMARY KEY,
+        depth INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        root BLOB NOT NULL,
+        folder_count INTEGER NOT NULL DEFAULT 0,
+        product_count INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+FOLDER_TREE_INDICES = [
+    "CREATE INDEX folder_tree_depth_idx ON folder_tree (depth)",
+    "CREATE UNIQUE INDEX folder_tree_path_idx ON folder_tree (path)",
+    "CREATE INDEX folder_tree_root_idx ON folder_tree (root)",
+]
+
+FOLDER_TREE_QUERY = """
+    INSERT INTO folder_tree (id, depth, path, root)
+    WITH RECURSIVE tree(id, depth, path, root) AS (
+        SELECT id, 0, name, id FROM assets
+        WHERE visual_parent IS NULL
+        UNION ALL
+        SELECT e.id, t.depth + 1, t.path || '/' || e.name, t.root
+        FROM assets AS e
+        INNER JOIN tree AS t ON e.visual_parent = t.id
+    )
+    SELECT id, depth, path, root FROM tree
+"""
+
+FOLDER_PRODUCTS_QUERY = """
+    CREATE TEMP TABLE folder_products AS
+    SELECT parent AS id, count(*) AS count FROM subsets
+    GROUP BY parent
+"""
+
+# Counts of descendant folders and of products in the whole subtree
+FOLDER_COUNTS_QUERY = """
+    UPDATE folder_tree SET
+    folder_count = (
+        SELECT count(*) FROM folder_tree AS d
+        WHERE d.path >= folder_tree.path || '/'
+        AND d.path < folder_tree.path || '0'
+    ),
+    product_count = COALESCE(
+        (SELECT count FROM temp.folder_products WHERE id = folder_tree.id), 0
+    ) + (
+        SELECT COALESCE(sum(p.count), 0) FROM folder_tree AS d
+        INNER JOIN temp.folder_products AS p ON p.id = d.id
+        WHERE d.path >= folder_tree.path || '/'
+        AND d.path < folder_tree.path || '0'
+    )
+"""
+
+
+def subtree_condition(column: str, path: str) -> str:
+    """SQL condition matching paths in the subtree of the given path"""
+    return f"({column} >= {path} || '/' AND {column} < {path} || '0')"
+
+
+def build_folder_tree(conn: sqlite3.Connection) -> int:
+    """Create the folder tree table. Returns the number of folders in it"""
+    db = conn.cursor()
+    db.execute("DROP TABLE IF EXISTS folder_tree")
+    db.execute(FOLDER_TREE_SCHEMA)
+    db.execute(FOLDER_TREE_QUERY)
+    for index in FOLDER_TREE_INDICES:
+        db.execute(index)
+    db.execute("DROP TABLE IF EXISTS temp.folder_products")
+    db.execute(FOLDER_PRODUCTS_QUERY)
+    db.execute(FOLDER_COUNTS_QUERY)
+    db.execute("DROP TABLE temp.folder_products")
+    conn.commit()
+
+    db.execute("SELECT count(*), max(depth) FROM folder_tree")
+    count, max_depth = db.fetchone()
+    logging.info(f"Folder tree of {count} folders, {(max_depth or 0) + 1} levels")
+    return count
+
+
+def has_folder_tree(conn: sqlite3.Connection, schema: str = "main") -> bool:
+    db = conn.cursor()
+    db.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master "
+        "WHERE type = 'table' AND name = 'folder_tree'"
+    )
+    return db.fetchone() is not None
+
+
+def ensure_folder_tree(conn: sqlite3.Connection) -> None:
+    """Build the folder tree of databases created before it existed"""
+    if not has_folder_tree(conn):
+        build_folder_tree(conn)
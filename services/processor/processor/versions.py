@@ -1,8 +1,9 @@
-import json
 import sqlite3
 
 from typing import Generator, Any
 from .common import config
+from .payload import unpack_payload
+from .scope import scope_condition
 
 
 def parse_version(
@@ -44,39 +45,46 @@ def parse_version(
 def get_hero_versions(
     conn: sqlite3.Connection,
     thumbnails,
+    scoped: bool = False,
 ) -> Generator[dict[str, Any], None, None]:
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT h.id AS hero_id, v.parent, v.data
-        FROM entities AS h
-        INNER JOIN entities AS v ON h.source_version = v.id
+        FROM hero_versions AS h
+        INNER JOIN versions AS v ON h.source_version = v.id
+        WHERE TRUE {scope_condition(scoped, "h.id")}
         """
     )
     for row in cursor.fetchall():
-        version_id = row[0]
-        parent_id = row[1]
-        version_data = json.loads(row[2])
+        version_id = row[0].hex()
+        parent_id = row[1].hex()
+        version_data = unpack_payload(row[2])
         version_number = -version_data["version"]
 
         yield parse_version(version_id, parent_id, version_data, version_number, thumbnails)
 
 
-def get_versions(conn: sqlite3.Connection, thumbnails) -> Generator[dict[str, Any], None, None]:
+def get_versions(
+    conn: sqlite3.Connection,
+    thumbnails,
+    scoped: bool = False,
+) -> Generator[dict[str, Any], None, None]:
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT id, parent, data
-        FROM entities WHERE type = 'version'
-        -- AND parent IN (SELECT id FROM entities WHERE type = 'subset')
-        -- AND id IN (SELECT parent FROM entities WHERE type = 'representation')
+        FROM versions WHERE TRUE
+        {scope_condition(scoped)}
+        -- AND parent IN (SELECT id FROM subsets)
+        -- AND id IN (SELECT parent FROM representations)
         """
     )
 
     for row in cursor.fetchall():
-        version_id = row[0]
-        parent_id = row[1]
-        version_data = json.loads(row[2])
+        version_id = row[0].hex()
+        parent_id = row[1].hex()
+        version_data = unpack_payload(row[2])
         version_number = version_data["version"]
 
 
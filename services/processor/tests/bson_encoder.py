@@ -0,0 +1,48 @@
+import struct
+import uuid
+
+from typing import Any
+
+# Minimal BSON encoder for the tests, covering the types mongodump
+# writes for OpenPype entities.
+
+
+class ObjectId(bytes):
+    """12 byte MongoDB ObjectId"""
+
+
+class Date(int):
+    """Milliseconds since the epoch"""
+
+
+def encode_element(name: str, value: Any) -> bytes:
+    key = name.encode("utf-8") + b"\x00"
+    if value is None:
+        return b"\x0a" + key
+    if isinstance(value, bool):
+        return b"\x08" + key + bytes([value])
+    if isinstance(value, ObjectId):
+        return b"\x07" + key + value
+    if isinstance(value, Date):
+        return b"\x09" + key + struct.pack("<q", value)
+    if isinstance(value, int):
+        if -(2**31) <= value < 2**31:
+            return b"\x10" + key + struct.pack("<i", value)
+        return b"\x12" + key + struct.pack("<q", value)
+    if isinstance(value, float):
+        return b"\x01" + key + struct.pack("<d", value)
+    if isinstance(value, str):
+        data = value.encode("utf-8") + b"\x00"
+        return b"\x02" + key + struct.pack("<i", len(data)) + data
+    if isinstance(value, uuid.UUID):
+        return b"\x05" + key + struct.pack("<i", 16) + b"\x04" + value.bytes
+    if isinstance(value, dict):
+        return b"\x03" + key + encode_document(value)
+    if isinstance(value, list):
+        return b"\x04" + key + encode_document({str(i): v for i, v in enumerate(value)})
+    raise TypeError(f"Unsupported type {type(value)}")
+
+
+def encode_document(document: dict[str, Any]) -> bytes:
+    body = b"".join(encode_element(name, value) for name, value in document.items())
+    return struct.pack("<i", len(body) + 5) + body + b"\x00"
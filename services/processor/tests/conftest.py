@@ -0,0 +1,6 @@
+import os
+
+# The processor reads its configuration from the environment on import
+os.environ.setdefault("AYON_API_KEY", "test")
+os.environ.setdefault("AYON_ADDON_NAME", "openpype_import")
+os.environ.setdefault("AYON_ADDON_VERSION", "0.0.0")
@@ -0,0 +1,151 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from processor import __main__ as main
+from processor import artifacts
+from processor.common import config
+from processor.database import MEMORY_DATABASE
+
+CHECKSUM = "a" * 64
+PLAN = {
+    "archive_size": 1,
+    "extracted_size": 1,
+    "source_size": 1,
+    "source_format": "json",
+    "thumbnails": 0,
+    "entities": {},
+    "database_size": 1000,
+    "peak_memory": 1,
+    "requests": 1,
+    "duration": 1,
+    "intermediate_db": "disk",
+    "concurrency": 1,
+}
+
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    path = tmp_path / "artifacts"
+    path.mkdir()
+    monkeypatch.setattr(config, "artifact_dir", str(path))
+    monkeypatch.setattr(config, "artifact_max_size", 100)
+    monkeypatch.setattr(config, "force", False)
+    return path
+
+
+def store(checksum: str = CHECKSUM, thumbnail_dir: str | None = None) -> None:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE entities (name TEXT)")
+    conn.execute("INSERT INTO entities VALUES ('demo')")
+    artifacts.store_artifacts(checksum, conn, thumbnail_dir, "demo", PLAN)
+
+
+@pytest.mark.parametrize("memory", [False, True])
+def test_restore_artifacts(artifact_dir, tmp_path, memory):
+    thumbnails = tmp_path / "thumbnails"
+    thumbnails.mkdir()
+    (thumbnails / "t.jpg").write_bytes(b"jpg")
+    store(thumbnail_dir=str(thumbnails))
+
+    meta = artifacts.load_artifacts(CHECKSUM)
+    assert meta["project_name"] == "demo"
+    assert meta["plan"] == PLAN
+
+    job_dir = tmp_path / "job"
+    sqlite_path = MEMORY_DATABASE if memory else str(job_dir / "project.db")
+    conn, thumbnail_dir = artifacts.restore_artifacts(meta, sqlite_path, str(job_dir))
+    assert conn.execute("SELECT name FROM entities").fetchall() == [("demo",)]
+    assert os.listdir(thumbnail_dir) == ["t.jpg"]
+
+
+def test_force_ignores_artifacts(artifact_dir, monkeypatch):
+    store()
+    monkeypatch.setattr(config, "force", True)
+    assert artifacts.load_artifacts(CHECKSUM) is None
+
+
+@pytest.mark.parametrize("removed", ["directory", "database"])
+def test_restore_pruned_artifacts(artifact_dir, tmp_path, removed):
+    """Artifacts pruned between loading and restoring are not reused"""
+    thumbnails = tmp_path / "thumbnails"
+    thumbnails.mkdir()
+    store(thumbnail_dir=str(thumbnails))
+    meta = artifacts.load_artifacts(CHECKSUM)
+
+    if removed == "directory":
+        shutil.rmtree(artifact_dir / CHECKSUM)
+    else:
+        os.remove(artifact_dir / CHECKSUM / "project.db")
+
+    job_dir = tmp_path / "job"
+    sqlite_path = str(job_dir / "project.db")
+    assert artifacts.restore_artifacts(meta, sqlite_path, str(job_dir)) is None
+    assert not os.path.exists(sqlite_path)
+    assert not os.path.exists(job_dir / "project" / "thumbnails")
+
+
+def test_prune_least_recently_used(artifact_dir, monkeypatch):
+    for i, checksum in enumerate(["b" * 64, "c" * 64, "d" * 64]):
+        store(checksum)
+        meta_path = artifact_dir / checksum / "meta.json"
+        os.utime(meta_path, (1000 + i, 1000 + i))
+
+    # Only the most recently used one fits
+    size = artifacts.directory_size(str(artifact_dir / ("d" * 64)))
+    monkeypatch.setattr(config, "artifact_max_size", 1)
+    monkeypatch.setattr(artifacts, "MB", size + 1)
+
+    # In use by a job, it is skipped
+    with artifacts.artifact_lock(str(artifact_dir / ("c" * 64))):
+        artifacts.prune_artifacts()
+    assert sorted(os.listdir(artifact_dir)) == ["c" * 64, "d" * 64]
+
+    artifacts.prune_artifacts()
+    assert os.listdir(artifact_dir) == ["d" * 64]
+
+
+class Progress:
+    def __init__(self):
+        self.summary = {}
+
+    def update_summary(self, **kwargs):
+        self.summary.update(kwargs)
+
+
+def test_process_pruned_artifacts(artifact_dir, tmp_path, monkeypatch):
+    """The upload is processed again when its artifacts are pruned meanwhile"""
+    store()
+    calls = []
+
+    class FakeAyon:
+        def get(self, endpoint):
+            return {"summary": {"sha256": CHECKSUM}}
+
+    def restore(meta, sqlite_path, job_dir):
+        shutil.rmtree(artifact_dir / CHECKSUM)
+        return artifacts.restore_artifacts(meta, sqlite_path, job_dir)
+
+    def prepare_source(upload_path, *args):
+        calls.append(("prepare", upload_path))
+        plan = main.ImportPlan(**{**PLAN, "intermediate_db": "memory"})
+        return plan, MEMORY_DATABASE, sqlite3.connect(":memory:"), None, "demo"
+
+    def deploy_database(conn, sqlite_path, plan, *args):
+        calls.append(("deploy", sqlite_path))
+
+    monkeypatch.setattr(main, "ayon", FakeAyon())
+    monkeypatch.setattr(main, "restore_artifacts", restore)
+    monkeypatch.setattr(main, "fetch_upload", lambda *args: "upload.zip")
+    monkeypatch.setattr(main, "find_projects", lambda path: [])
+    monkeypatch.setattr(main, "prepare_source", prepare_source)
+    monkeypatch.setattr(main, "deploy_database", deploy_database)
+    monkeypatch.setattr(config, "memory_db_backup", False)
+
+    progress = Progress()
+    main.process_in_dir("source", "target", "admin", str(tmp_path / "job"), progress)
+    assert calls == [("prepare", "upload.zip"), ("deploy", MEMORY_DATABASE)]
+    assert "reused" not in progress.summary
+
@@ -0,0 +1,210 @@
+import json
+
+from contextlib import closing
+
+import pytest
+
+from pydantic import ValidationError
+
+from processor.database import open_database
+from processor.filters import ImportFilters, apply_filters
+from processor.parser import create_sqlite_db
+
+
+def oid(n: int) -> dict:
+    return {"$oid": f"5f3e0c6b2a1b4c{n:010d}"}
+
+
+PROJECT = {"_id": oid(1), "type": "project", "name": "demo", "data": {}}
+
+
+def folder(n: int, name: str, parent: int | None) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "asset",
+        "name": name,
+        "parent": PROJECT["_id"],
+        "data": {"visualParent": oid(parent) if parent else None},
+    }
+
+
+def product(n: int, name: str, folder: int, family: str) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "subset",
+        "name": name,
+        "parent": oid(folder),
+        "data": {"family": family},
+    }
+
+
+def version(n: int, number: int, product: int, time: str) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "version",
+        "name": number,
+        "parent": oid(product),
+        "data": {"time": time},
+    }
+
+
+def representation(n: int, name: str, parent: int) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "representation",
+        "name": name,
+        "parent": oid(parent),
+    }
+
+
+# shots/sq010/sh010, shots/sq010/sh020, shots/sq020/sh030, assets/char
+ENTITIES = [
+    PROJECT,
+    folder(10, "shots", None),
+    folder(11, "sq010", 10),
+    folder(12, "sh010", 11),
+    folder(13, "sh020", 11),
+    folder(14, "sq020", 10),
+    folder(15, "sh030", 14),
+    folder(16, "assets", None),
+    folder(17, "char", 16),
+    product(20, "reference", 10, "plate"),
+    product(21, "renderMain", 12, "render"),
+    product(22, "camera", 12, "camera"),
+    product(23, "renderMain", 15, "render"),
+    product(24, "modelMain", 17, "model"),
+    version(30, 1, 21, "20230101T100000Z"),
+    version(31, 2, 21, "20230601T100000Z"),
+    version(32, 3, 21, "20240101T100000Z"),
+    version(33, 1, 22, "20230301T100000Z"),
+    version(34, 1, 23, "20230101T100000Z"),
+    version(35, 1, 24, "20220101T100000Z"),
+    version(36, 1, 20, "20220101T100000Z"),
+    {
+        "_id": oid(40),
+        "type": "hero_version",
+        "parent": oid(21),
+        "version_id": oid(31),
+        "data": {},
+    },
+    # Versions without representations are not imported at all
+    *(representation(50 + i, "exr", n) for i, n in enumerate(range(30, 37))),
+    representation(57, "jpg", 31),
+    representation(58, "exr", 40),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    source = tmp_path / "project.json"
+    source.write_text("".join(json.dumps(e) + "\n" for e in ENTITIES))
+    conn = open_database(str(tmp_path / "project.db"))
+    create_sqlite_db(str(source), conn)
+    with closing(conn):
+        yield conn
+
+
+def folder_paths(conn) -> list[str]:
+    return [r[0] for r in conn.execute("SELECT path FROM folder_tree ORDER BY path")]
+
+
+def products(conn) -> list[str]:
+    return sorted(
+        f"{path}/{name}"
+        for path, name in conn.execute(
+            """
+            SELECT t.path, s.name FROM subsets AS s
+            INNER JOIN folder_tree AS t ON t.id = s.parent
+            """
+        )
+    )
+
+
+def version_numbers(conn) -> list[int]:
+    return sorted(
+        n
+        for (n,) in conn.execute(
+            "SELECT json_extract(payload(data), '$.version') FROM versions"
+        )
+    )
+
+
+def test_filter_folders(conn):
+    counts = apply_filters(conn, ImportFilters(folders=["shots/sq010"]))
+    # Parents are kept, without their products
+    assert folder_paths(conn) == [
+        "shots",
+        "shots/sq010",
+        "shots/sq010/sh010",
+        "shots/sq010/sh020",
+    ]
+    assert products(conn) == [
+        "shots/sq010/sh010/camera",
+        "shots/sq010/sh010/renderMain",
+    ]
+    assert counts["asset"] == 4
+
+
+def test_filter_folder_globs(conn):
+    apply_filters(conn, ImportFilters(folders=["*/sh0[13]0", "assets/char"]))
+    assert folder_paths(conn) == [
+        "assets",
+        "assets/char",
+        "shots",
+        "shots/sq010",
+        "shots/sq010/sh010",
+        "shots/sq020",
+        "shots/sq020/sh030",
+    ]
+
+
+def test_filter_product_types(conn):
+    apply_filters(conn, ImportFilters(product_types=["render"]))
+    assert products(conn) == [
+        "shots/sq010/sh010/renderMain",
+        "shots/sq020/sh030/renderMain",
+    ]
+    # Folders are all kept
+    assert len(folder_paths(conn)) == 8
+    assert version_numbers(conn) == [1, 1, 2, 3]
+
+
+def test_filter_latest_versions(conn):
+    apply_filters(conn, ImportFilters(latest_versions=1))
+    assert version_numbers(conn) == [1, 1, 1, 1, 3]
+    # The hero version of a removed version goes with it
+    assert conn.execute("SELECT count(*) FROM hero_versions").fetchone()[0] == 0
+    assert conn.execute("SELECT count(*) FROM representations").fetchone()[0] == 5
+
+
+def test_filter_hero_only(conn):
+    apply_filters(conn, ImportFilters(hero_only=True))
+    assert version_numbers(conn) == [2]
+    assert products(conn) == ["shots/sq010/sh010/renderMain"]
+    assert conn.execute("SELECT count(*) FROM hero_versions").fetchone()[0] == 1
+    assert conn.execute("SELECT count(*) FROM representations").fetchone()[0] == 3
+
+
+def test_filter_dates(conn):
+    apply_filters(conn, ImportFilters(after="2023-01-01", before="2023-06-01"))
+    # Products left without versions are removed
+    assert products(conn) == [
+        "shots/sq010/sh010/camera",
+        "shots/sq010/sh010/renderMain",
+        "shots/sq020/sh030/renderMain",
+    ]
+    assert version_numbers(conn) == [1, 1, 1]
+
+
+def test_filter_representations(conn):
+    apply_filters(conn, ImportFilters(representations=["exr"]))
+    names = conn.execute("SELECT DISTINCT name FROM representations").fetchall()
+    assert names == [("exr",)]
+    assert version_numbers(conn) == [1, 1, 1, 1, 1, 2, 3]
+
+
+def test_unknown_filters():
+    assert ImportFilters().empty
+    assert not ImportFilters(hero_only=True).empty
+    with pytest.raises(ValidationError):
+        ImportFilters(folder=["shots"])
@@ -0,0 +1,146 @@
+import json
+
+from contextlib import closing
+
+import pytest
+
+from processor import incremental, operations
+from processor.common import mongoid2uuid
+from processor.database import open_database
+from processor.parser import create_sqlite_db
+
+PROJECT = {
+    "_id": {"$oid": "5f3e0c6b2a1b4c0000000001"},
+    "type": "project",
+    "name": "demo",
+    "data": {"code": "dm"},
+    "config": {"tasks": {"Compositing": {}, "Animation": {}}},
+}
+
+
+def asset(oid: str, name: str, tasks: dict[str, str]) -> dict:
+    return {
+        "_id": {"$oid": oid},
+        "type": "asset",
+        "name": name,
+        "parent": PROJECT["_id"],
+        "data": {
+            "visualParent": None,
+            "tasks": {name: {"type": task_type} for name, task_type in tasks.items()},
+        },
+    }
+
+
+SH010 = "5f3e0c6b2a1b4c0000000010"
+SH020 = "5f3e0c6b2a1b4c0000000020"
+SH030 = "5f3e0c6b2a1b4c0000000030"
+
+
+class FakeAyon:
+    """Tasks of the project, listed a page at a time"""
+
+    def __init__(self, tasks: list[dict]):
+        self.tasks = tasks
+        self.pages = 0
+        self.operations: list[dict] = []
+
+    def gql(self, query, **kwargs):
+        assert "FolderTasks" in query
+        self.pages += 1
+        tasks = [t for t in self.tasks if t["folderId"] in kwargs["folderIds"]]
+        start = int(kwargs["after"] or 0)
+        end = start + kwargs["first"]
+        page_info = {"hasNextPage": end < len(tasks), "endCursor": str(end)}
+        return {
+            "project": {
+                "tasks": {
+                    "pageInfo": page_info,
+                    "edges": [{"node": t} for t in tasks[start:end]],
+                }
+            }
+        }
+
+    def post(self, endpoint, json):
+        self.operations += json["operations"]
+        return {"success": True, "operations": []}
+
+
+def create_database(path, entities: list[dict]):
+    source = path.with_suffix(".json")
+    source.write_text("".join(json.dumps(e) + "\n" for e in entities))
+    conn = open_database(str(path))
+    create_sqlite_db(str(source), conn)
+    return conn
+
+
+def folder_id(oid: str) -> str:
+    return mongoid2uuid(oid)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    sh010 = folder_id(SH010)
+    fake = FakeAyon(
+        [
+            {"id": "comp", "name": "comp", "folderId": sh010},
+            {"id": "anim", "name": "anim", "folderId": sh010},
+            # Added in Ayon after the previous import
+            {"id": "layout", "name": "layout", "folderId": sh010},
+            {"id": "comp2", "name": "comp", "folderId": folder_id(SH020)},
+        ]
+    )
+    monkeypatch.setattr(incremental, "ayon", fake)
+    monkeypatch.setattr(operations, "ayon", fake)
+    monkeypatch.setattr(incremental, "TASK_PAGE_SIZE", 1)
+    return fake
+
+
+def test_deploy_task_changes(tmp_path, fake):
+    baseline = [
+        PROJECT,
+        asset(SH010, "sh010", {"comp": "Compositing", "anim": "Animation"}),
+        asset(SH020, "sh020", {"comp": "Compositing"}),
+    ]
+    current = [
+        PROJECT,
+        asset(SH010, "sh010", {"comp": "Animation", "light": "Compositing"}),
+        asset(SH020, "sh020", {"comp": "Compositing", "fx": "Compositing"}),
+        asset(SH030, "sh030", {"comp": "Compositing"}),
+    ]
+    create_database(tmp_path / "base.db", baseline).close()
+    task_type_map = {
+        "compositing": {"name": "Compositing"},
+        "animation": {"name": "Animation"},
+    }
+
+    with closing(create_database(tmp_path / "new.db", current)) as conn:
+        incremental.deploy_delta(
+            conn,
+            "demo",
+            str(tmp_path / "base.db"),
+            {},
+            task_type_map,
+            ["Folder"],
+        )
+
+    # One page per task of the changed folders
+    assert fake.pages == 4
+    tasks = [op for op in fake.operations if op["entityType"] == "task"]
+    changes = {
+        (
+            op["type"],
+            op.get("entityId") or op["data"]["folderId"],
+            op["data"].get("name"),
+        )
+        for op in tasks
+        if op["type"] != "delete"
+    }
+    assert changes == {
+        ("update", "comp", None),
+        ("update", "comp2", None),
+        ("create", folder_id(SH010), "light"),
+        ("create", folder_id(SH020), "fx"),
+        ("create", folder_id(SH030), "comp"),
+    }
+    deleted = [op["entityId"] for op in tasks if op["type"] == "delete"]
+    assert deleted == ["anim"]
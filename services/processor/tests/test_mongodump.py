@@ -0,0 +1,118 @@
+import io
+import struct
+import uuid
+
+import pytest
+
+from processor.common import mongoid2uuid
+from processor.mongodump import decode_document, is_bson, read_documents
+
+from bson_encoder import Date, ObjectId, encode_document
+
+OID = "5f3e0c6b2a1b4c0012345678"
+UUID = uuid.UUID("12345678-1234-4234-8234-123456789abc")
+
+
+def element_document(body: bytes) -> bytes:
+    """Document with the raw elements"""
+    return struct.pack("<i", len(body) + 5) + body + b"\x00"
+
+
+def test_round_trip():
+    document = {
+        "_id": ObjectId(bytes.fromhex(OID)),
+        "type": "asset",
+        "name": "sh010",
+        "parent": ObjectId(bytes.fromhex(OID)),
+        "data": {
+            "frameStart": 1001,
+            "frames": 2**40,
+            "fps": 23.976,
+            "active": True,
+            "archived": False,
+            "note": None,
+            "created": Date(1600000000000),
+            "source": UUID,
+            "tags": ["a", "ü"],
+            "inputLinks": [{"id": ObjectId(bytes.fromhex(OID)), "type": "link"}],
+            "parents": [],
+            "tasks": {},
+        },
+    }
+    decoded, pos = decode_document(encode_document(document))
+    assert pos == len(encode_document(document))
+    assert decoded == {
+        "_id": mongoid2uuid(OID),
+        "type": "asset",
+        "name": "sh010",
+        "parent": mongoid2uuid(OID),
+        "data": {
+            "frameStart": 1001,
+            "frames": 2**40,
+            "fps": 23.976,
+            "active": True,
+            "archived": False,
+            "note": None,
+            "created": None,
+            "source": UUID.hex,
+            "tags": ["a", "ü"],
+            "inputLinks": [{"id": mongoid2uuid(OID), "type": "link"}],
+            "parents": [],
+            "tasks": {},
+        },
+    }
+
+
+def test_object_ids_in_arrays():
+    document = {"ids": [ObjectId(bytes.fromhex(OID)), [ObjectId(bytes.fromhex(OID))]]}
+    decoded, _ = decode_document(encode_document(document))
+    assert decoded == {"ids": [mongoid2uuid(OID), [mongoid2uuid(OID)]]}
+
+
+def test_read_documents():
+    documents = [{"_id": ObjectId(bytes.fromhex(OID)), "n": i} for i in range(3)]
+    stream = io.BytesIO(b"".join(encode_document(d) for d in documents))
+    assert [d["n"] for d in read_documents(stream)] == [0, 1, 2]
+    assert list(read_documents(io.BytesIO(b""))) == []
+
+
+@pytest.mark.parametrize("cut", [1, 2, 4, 10])
+def test_read_truncated(cut):
+    data = encode_document({"a": "b"}) + encode_document({"type": "asset"})
+    with pytest.raises(Exception, match="truncated"):
+        list(read_documents(io.BytesIO(data[:-cut])))
+
+
+def test_read_invalid_size():
+    with pytest.raises(Exception, match="Invalid BSON document size"):
+        list(read_documents(io.BytesIO(struct.pack("<i", 3) + b"\x00" * 8)))
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # Missing terminator
+        element_document(b"\x10a\x00\x01\x00\x00\x00")[:-1] + b"\x01",
+        # Unknown element type
+        element_document(b"\x20a\x00"),
+        # Negative string size, would move the reader backwards
+        element_document(b"\x02a\x00" + struct.pack("<i", -3) + b"\x00" * 8),
+        # Negative binary size
+        element_document(b"\x05a\x00" + struct.pack("<i", -9) + b"\x04" + b"\x00" * 8),
+        # String reaching past the end of the document
+        element_document(b"\x02a\x00" + struct.pack("<i", 20) + b"ab\x00"),
+        # Embedded document larger than the data
+        element_document(b"\x03a\x00" + struct.pack("<i", 100) + b"\x00"),
+    ],
+)
+def test_decode_malformed(data):
+    with pytest.raises(Exception):
+        decode_document(data)
+
+
+def test_is_bson():
+    assert is_bson(encode_document({"_id": ObjectId(bytes.fromhex(OID))}))
+    assert not is_bson(b'[{"_id": {"$oid": "' + OID.encode() + b'"}}]')
+    assert not is_bson(b'{"_id": "x"}\n')
+    assert not is_bson(b"\x05\x00")
+    assert not is_bson(b"")
@@ -0,0 +1,179 @@
+import json
+import zipfile
+
+import pytest
+
+from processor import multi
+from processor.progress import ImportCancelled
+
+
+def create_archive(path, names: list[str]) -> str:
+    with zipfile.ZipFile(path, "w") as archive:
+        for name in names:
+            archive.writestr(name, json.dumps({"name": name}))
+    return str(path)
+
+
+class Progress:
+    event_id = "archive"
+
+    def __init__(self, cancel_after: int | None = None):
+        self.summary = {}
+        self.checks = 0
+        self.cancel_after = cancel_after
+        self.label = None
+
+    def start(self, stage, total=None, unit="rows"):
+        pass
+
+    def advance(self, count=1):
+        pass
+
+    def check(self):
+        self.checks += 1
+        if self.cancel_after is not None and self.checks > self.cancel_after:
+            raise ImportCancelled("aborted")
+
+    def update_summary(self, **kwargs):
+        self.summary.update(kwargs)
+
+
+class FakeAyon:
+    """Uploads of the children, imported by `assist`"""
+
+    addon_endpoint = "addons/openpype_import/0.0.0"
+
+    def __init__(self, listed=lambda upload_id: True):
+        self.listed = listed
+        self.jobs: dict[str, dict] = {}
+        self.uploads: list[tuple[dict, list[str]]] = []
+        self.updates: list[tuple[str, dict]] = []
+
+    def post(self, endpoint, headers, data):
+        assert endpoint == f"{self.addon_endpoint}/import"
+        with zipfile.ZipFile(data) as archive:
+            self.uploads.append((headers, archive.namelist()))
+        upload_id = headers["X-Ayon-Project-Name"]
+        self.jobs[upload_id] = {
+            "uploadId": upload_id,
+            "processId": None,
+            "status": "pending",
+        }
+        return {"uploadId": upload_id}
+
+    def get(self, endpoint, params):
+        assert endpoint == f"{self.addon_endpoint}/list"
+        assert len(params["ids"]) <= multi.CHILD_PAGE_SIZE
+        return [
+            self.jobs[upload_id]
+            for upload_id in params["ids"]
+            if self.listed(upload_id)
+        ]
+
+    def update_event(self, event_id, **kwargs):
+        self.updates.append((event_id, kwargs))
+        self.jobs[event_id]["status"] = kwargs["status"]
+
+    def import_child(self, upload_ids: set[str]) -> bool:
+        for upload_id in sorted(upload_ids):
+            job = self.jobs[upload_id]
+            if job["processId"] is None:
+                job["processId"] = f"process-{upload_id}"
+                job["status"] = "failed" if upload_id == "broken" else "finished"
+                return True
+        return False
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeAyon()
+    monkeypatch.setattr(multi, "ayon", fake)
+    monkeypatch.setattr(multi.time, "sleep", lambda seconds: None)
+    return fake
+
+
+def test_find_projects(tmp_path):
+    multiple = create_archive(
+        tmp_path / "multi.zip",
+        ["projA/project.json", "projA/thumbnails/t.jpg", "projB/database.json"],
+    )
+    assert multi.find_projects(multiple) == ["projA", "projB"]
+    single = create_archive(tmp_path / "single.zip", ["project.json", "projA/x.json"])
+    assert multi.find_projects(single) == []
+
+
+def test_fan_out(tmp_path, fake):
+    archive = create_archive(
+        tmp_path / "multi.zip",
+        ["projA/project.json", "projA/thumbnails/t.jpg", "projB/project.json"],
+    )
+    assisted = []
+
+    def assist(upload_ids):
+        assisted.append(set(upload_ids))
+        return fake.import_child(upload_ids)
+
+    progress = Progress()
+    summary = {"mode": "incremental", "filters": {"assets": ["sh010"]}}
+    multi.fan_out(archive, ["projA", "projB"], summary, str(tmp_path), progress, assist)
+
+    headers, names = fake.uploads[0]
+    assert headers["X-Ayon-Parent-Job"] == "archive"
+    assert headers["X-Ayon-Import-Mode"] == "incremental"
+    assert json.loads(headers["X-Ayon-Import-Filters"]) == summary["filters"]
+    # Split to single project archives, not fanned out again
+    assert sorted(names) == ["project.json", "thumbnails/t.jpg"]
+    # Assisting only imports the children still pending
+    assert assisted == [{"projA", "projB"}, {"projB"}]
+    assert progress.summary["projects"] == {
+        "projA": {"upload": "projA", "status": "finished"},
+        "projB": {"upload": "projB", "status": "finished"},
+    }
+
+
+def test_failed_children(tmp_path, fake):
+    archive = create_archive(
+        tmp_path / "multi.zip",
+        ["broken/project.json", "ok/project.json"],
+    )
+    progress = Progress()
+    with pytest.raises(Exception, match="1 of 2 projects failed"):
+        multi.fan_out(
+            archive, ["broken", "ok"], {}, str(tmp_path), progress, fake.import_child
+        )
+    assert progress.summary["projects"]["broken"]["status"] == "failed"
+
+
+def test_missing_children(tmp_path, fake):
+    """Children the job list does not return fail the import"""
+    fake.listed = lambda upload_id: upload_id != "deleted"
+    archive = create_archive(
+        tmp_path / "multi.zip",
+        ["deleted/project.json", "ok/project.json"],
+    )
+    progress = Progress()
+    with pytest.raises(Exception, match="1 of 2 projects failed"):
+        multi.fan_out(
+            archive, ["deleted", "ok"], {}, str(tmp_path), progress, fake.import_child
+        )
+    assert progress.summary["projects"]["deleted"]["status"] == multi.MISSING_STATUS
+    assert progress.summary["projects"]["ok"]["status"] == "finished"
+
+
+def test_abort_waiting_children(tmp_path, fake):
+    archive = create_archive(
+        tmp_path / "multi.zip",
+        ["projA/project.json", "projB/project.json"],
+    )
+
+    def assist(upload_ids):
+        fake.jobs["projA"].update(processId="process-projA", status="in_progress")
+        return True
+
+    # Cancelled while projA is importing
+    progress = Progress(cancel_after=3)
+    with pytest.raises(ImportCancelled):
+        multi.fan_out(archive, ["projA", "projB"], {}, str(tmp_path), progress, assist)
+    # The running one stops by itself
+    assert [event_id for event_id, _ in fake.updates] == ["projB"]
+    assert fake.jobs["projB"]["status"] == "aborted"
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from processor import operations
+from processor.common import config
+from processor.progress import ImportCancelled, ProgressReporter
+
+
+class OperationsServer(ThreadingHTTPServer):
+    """Operations endpoint failing the operations named "fail" """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), OperationsHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.names: list[str] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class OperationsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.02)
+        results = []
+        for op in body["operations"]:
+            name = op["data"]["name"]
+            results.append(
+                {
+                    "success": name != "fail",
+                    "entityType": op["entityType"],
+                    "entityId": op["entityId"],
+                }
+            )
+        with server.lock:
+            server.active -= 1
+            server.names += [op["data"]["name"] for op in body["operations"]]
+        data = json.dumps(
+            {
+                "success": all(r["success"] for r in results),
+                "operations": results,
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = OperationsServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(config, "server_url", server.url)
+    monkeypatch.setattr(operations.ayon, "server_url", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def folder_ops(count: int, failing: int = -1):
+    for i in range(count):
+        yield {
+            "type": "create",
+            "entityType": "folder",
+            "entityId": f"{i:032x}",
+            "data": {"name": "fail" if i == failing else f"folder{i}"},
+        }
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_batch_process_ops(server, concurrency):
+    progress = ProgressReporter("import")
+    count = operations.batch_process_ops(
+        "demo", folder_ops(950, failing=420), progress, concurrency
+    )
+    assert count == 949
+    assert progress.done == 950
+    expected = [op["data"]["name"] for op in folder_ops(950, failing=420)]
+    assert sorted(server.names) == sorted(expected)
+    assert server.max_active <= concurrency
+    if concurrency > 1:
+        assert server.max_active > 1
+
+
+def test_cancelled_import_stops_sending(server, monkeypatch):
+    progress = ProgressReporter("import")
+
+    def check():
+        if progress.done >= 300:
+            raise ImportCancelled("aborted")
+
+    monkeypatch.setattr(progress, "check", check)
+    with pytest.raises(ImportCancelled):
+        operations.batch_process_ops("demo", folder_ops(2000), progress, 2)
+    assert len(server.names) < 2000
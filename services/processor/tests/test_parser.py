@@ -0,0 +1,91 @@
+import json
+import uuid
+
+from processor.common import mongoid2uuid
+from processor.parser import replace_mongo_types, source_iterator
+
+from bson_encoder import Date, ObjectId, encode_document
+
+OID = "5f3e0c6b2a1b4c0012345678"
+UUID = uuid.UUID("12345678-1234-4234-8234-123456789abc")
+
+# The same entity as extended JSON and as BSON
+EXTENDED_JSON = {
+    "_id": {"$oid": OID},
+    "type": "version",
+    "name": {"$numberInt": "3"},
+    "parent": {"$oid": OID},
+    "data": {
+        "frameStart": {"$numberInt": "1001"},
+        "size": {"$numberLong": "1099511627776"},
+        "fps": {"$numberDouble": "23.976"},
+        "time": {"$date": {"$numberLong": "1600000000000"}},
+        "source": {"$uuid": str(UUID)},
+        "inputLinks": [{"id": {"$oid": OID}, "type": "link"}],
+        "dependencies": [{"$oid": OID}, [{"$oid": OID}]],
+        "tags": ["review", {"$numberInt": "1"}],
+    },
+}
+BSON = {
+    "_id": ObjectId(bytes.fromhex(OID)),
+    "type": "version",
+    "name": 3,
+    "parent": ObjectId(bytes.fromhex(OID)),
+    "data": {
+        "frameStart": 1001,
+        "size": 1099511627776,
+        "fps": 23.976,
+        "time": Date(1600000000000),
+        "source": UUID,
+        "inputLinks": [{"id": ObjectId(bytes.fromhex(OID)), "type": "link"}],
+        "dependencies": [ObjectId(bytes.fromhex(OID)), [ObjectId(bytes.fromhex(OID))]],
+        "tags": ["review", 1],
+    },
+}
+
+
+def test_replace_mongo_types():
+    entity = replace_mongo_types(json.loads(json.dumps(EXTENDED_JSON)))
+    assert entity["_id"] == mongoid2uuid(OID)
+    assert entity["name"] == 3
+    assert entity["data"]["size"] == 1099511627776
+    assert entity["data"]["fps"] == 23.976
+    assert entity["data"]["time"] is None
+    assert entity["data"]["source"] == UUID.hex
+    assert entity["data"]["inputLinks"] == [{"id": mongoid2uuid(OID), "type": "link"}]
+    assert entity["data"]["dependencies"] == [mongoid2uuid(OID), [mongoid2uuid(OID)]]
+    assert entity["data"]["tags"] == ["review", 1]
+
+
+def test_replace_mongo_binary():
+    binary = {"$binary": {"base64": "EjRWeBI0QjSCNBI0VniavA==", "subType": "04"}}
+    assert replace_mongo_types({"a": binary}) == {"a": UUID.hex}
+    generic = {"$binary": {"base64": "AAE=", "subType": "00"}}
+    assert replace_mongo_types({"a": generic}) == {"a": generic}
+
+
+def test_unhandled_mongo_types():
+    """Other types and user data with $ keys are kept as they are"""
+    entity = {
+        "a": {"$numberDecimal": "1.5"},
+        "b": [{"$timestamp": {"t": 1, "i": 1}}],
+        "c": {"$regularExpression": {"pattern": "x", "options": ""}},
+        "d": {"$custom": [{"$oid": OID}]},
+        "e": {"$x": 1, "y": 2},
+    }
+    assert replace_mongo_types(json.loads(json.dumps(entity))) == entity
+
+
+def test_source_formats_match(tmp_path):
+    """JSON, JSON lines and mongodump exports give the same entities"""
+    json_path = tmp_path / "project.json"
+    json_path.write_text(json.dumps([EXTENDED_JSON, EXTENDED_JSON]))
+    lines_path = tmp_path / "lines.json"
+    lines_path.write_text(f"{json.dumps(EXTENDED_JSON)}\n\n{json.dumps(EXTENDED_JSON)}\n")
+    bson_path = tmp_path / "project.bson"
+    bson_path.write_bytes(encode_document(BSON) * 2)
+
+    expected = list(source_iterator(str(bson_path)))
+    assert len(expected) == 2
+    assert list(source_iterator(str(json_path))) == expected
+    assert list(source_iterator(str(lines_path))) == expected
@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import zlib
+
+import pytest
+
+from processor.payload import (
+    PAYLOAD_VERSION,
+    pack_payload,
+    register_functions,
+    unpack_json,
+    unpack_payload,
+)
+
+PAYLOADS = [
+    {},
+    {"families": ["render"], "frameStart": 1001, "fps": 25.0, "note": None},
+    {"name": "ü" * 1000, "nested": {"list": [1, [2, {"three": 3}]]}},
+    {
+        "files": [{"_id": "a", "path": "{root[work]}/demo/publish/render", "size": 1}],
+        "context": {"root": {"work": "/mnt"}, "project": {"name": "demo", "code": "dm"}},
+    },
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_round_trip(payload):
+    packed = pack_payload(payload)
+    assert packed[0] == PAYLOAD_VERSION
+    assert unpack_payload(packed) == payload
+    assert json.loads(unpack_json(packed)) == payload
+
+
+def test_compresses_representations():
+    packed = pack_payload(PAYLOADS[3])
+    assert len(packed) < len(json.dumps(PAYLOADS[3]))
+
+
+def test_plain_json():
+    # Databases created before payloads were compressed
+    assert unpack_json('{"a": 1}') == '{"a": 1}'
+    assert unpack_payload('{"a": 1}') == {"a": 1}
+    assert unpack_json(None) is None
+
+
+@pytest.mark.parametrize("cut", [1, 5])
+def test_truncated(cut):
+    packed = pack_payload(PAYLOADS[2])
+    with pytest.raises(ValueError, match="truncated"):
+        unpack_json(packed[:-cut])
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00abc", b"\xffabc"])
+def test_unknown_version(data):
+    with pytest.raises(ValueError, match="Unknown payload version"):
+        unpack_json(data)
+
+
+def test_corrupted():
+    packed = bytearray(pack_payload(PAYLOADS[2]))
+    packed[3] ^= 0xFF
+    with pytest.raises((ValueError, zlib.error)):
+        unpack_json(bytes(packed))
+
+
+def test_sql_function():
+    conn = sqlite3.connect(":memory:")
+    register_functions(conn)
+    packed = pack_payload(PAYLOADS[1])
+    row = conn.execute("SELECT payload(?), payload(NULL)", (packed,)).fetchone()
+    assert json.loads(row[0]) == PAYLOADS[1]
+    assert row[1] is None
@@ -0,0 +1,129 @@
+import json
+import math
+import zipfile
+
+import pytest
+
+from processor import planner
+from processor.common import config
+from processor.resources import MB
+
+from bson_encoder import ObjectId, encode_document
+
+COUNTS = {
+    "project": 1,
+    "asset": 50,
+    "subset": 150,
+    "version": 450,
+    "representation": 900,
+}
+
+
+def export_entities() -> list[dict]:
+    """Entities of an export, ordered by type like mongoexport writes them"""
+    entities = []
+    for _type, count in COUNTS.items():
+        for i in range(count):
+            entities.append(
+                {
+                    "_id": {"$oid": f"{len(entities):024x}"},
+                    "type": _type,
+                    "name": f"{_type}{i}",
+                    "data": {"comment": "x" * 40, "frameStart": 1001},
+                }
+            )
+    return entities
+
+
+def write_archive(path, lines: bool = True, thumbnails: int = 0) -> None:
+    entities = export_entities()
+    if lines:
+        text = "".join(json.dumps(e) + "\n" for e in entities)
+    else:
+        text = json.dumps(entities)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("project.json", text)
+        for i in range(thumbnails):
+            archive.writestr(f"thumbnails/{i:024x}.jpg", b"\xff\xd8")
+
+
+@pytest.fixture(autouse=True)
+def node(monkeypatch):
+    """A node with plenty of memory and disk space"""
+    monkeypatch.setattr(planner, "available_memory", lambda: 1024 * MB)
+    monkeypatch.setattr(planner, "free_disk_space", lambda path: 1024 * MB)
+    monkeypatch.setattr(config, "shard_dir", None)
+
+
+def assert_estimates(entities: dict[str, int], tolerance: float) -> None:
+    assert entities.keys() == COUNTS.keys()
+    for _type, count in COUNTS.items():
+        assert entities[_type] == pytest.approx(count, rel=tolerance, abs=1)
+
+
+@pytest.mark.parametrize("lines", [True, False])
+def test_plan_archive(tmp_path, lines):
+    path = tmp_path / "export.zip"
+    write_archive(path, lines=lines, thumbnails=5)
+    plan = planner.plan_import(str(path))
+
+    assert plan.source_format == ("jsonl" if lines else "json")
+    assert plan.thumbnails == 5
+    # The whole file fits one window, only the separators are not sampled
+    assert_estimates(plan.entities, 0.05)
+    assert plan.intermediate_db == "memory"
+    assert plan.refused is None
+    folders = plan.entities["asset"]
+    batches = math.ceil((sum(plan.entities.values()) - folders) / planner.BATCH_SIZE)
+    assert plan.requests == batches + folders + 5 + 2
+
+
+def test_plan_samples_windows(tmp_path, monkeypatch):
+    """Types exports are ordered by are found in windows spread over the file"""
+    monkeypatch.setattr(planner, "WINDOW_SIZE", 8 * 1024)
+    path = tmp_path / "export.zip"
+    write_archive(path)
+    plan = planner.plan_import(str(path))
+    assert {"asset", "version", "representation"} <= plan.entities.keys()
+    total = sum(COUNTS.values())
+    assert sum(plan.entities.values()) == pytest.approx(total, rel=0.1)
+
+
+def test_plan_bare_bson(tmp_path):
+    path = tmp_path / "project.bson"
+    path.write_bytes(
+        b"".join(
+            encode_document({**e, "_id": ObjectId(bytes.fromhex(e["_id"]["$oid"]))})
+            for e in export_entities()
+        )
+    )
+    plan = planner.plan_import(str(path))
+    assert plan.source_format == "bson"
+    assert plan.extracted_size == 0
+    assert_estimates(plan.entities, 0.05)
+
+
+def test_plan_concurrency(tmp_path, monkeypatch):
+    path = tmp_path / "export.zip"
+    write_archive(path)
+    monkeypatch.setattr(config, "deploy_concurrency", 6)
+    assert planner.plan_import(str(path)).concurrency == 1
+
+    monkeypatch.setattr(planner, "PARALLEL_MIN_REQUESTS", 10)
+    plan = planner.plan_import(str(path))
+    assert plan.concurrency == 6
+
+
+def test_plan_disk_database(tmp_path, monkeypatch):
+    path = tmp_path / "export.zip"
+    write_archive(path)
+    monkeypatch.setattr(config, "memory_db_limit", 0)
+    assert planner.plan_import(str(path)).intermediate_db == "disk"
+
+
+def test_plan_refuses_without_disk_space(tmp_path, monkeypatch):
+    path = tmp_path / "export.zip"
+    write_archive(path)
+    monkeypatch.setattr(planner, "free_disk_space", lambda path: 100 * 1024)
+    plan = planner.plan_import(str(path))
+    assert plan.refused.startswith("Not enough disk space")
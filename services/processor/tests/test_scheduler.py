@@ -0,0 +1,153 @@
+import pytest
+
+from processor import scheduler
+from processor.common import config
+from processor.resources import MB
+
+
+class FakeAyon:
+    """Server with a queue of uploads, optionally ignoring enroll filters"""
+
+    addon_endpoint = "addons/openpype_import/0.0.0"
+
+    def __init__(self, queue: list[dict], taken=(), ignore_filter: bool = False):
+        self.queue = queue
+        self.taken = set(taken)
+        self.ignore_filter = ignore_filter
+        self.enrolled: list[str] = []
+        self.updates: list[tuple[str, dict]] = []
+
+    def get(self, endpoint):
+        assert endpoint == f"{self.addon_endpoint}/queue"
+        return self.queue
+
+    def post(self, endpoint, json):
+        assert endpoint == "enroll"
+        waiting = [job["id"] for job in self.queue if job["id"] not in self.taken]
+        if "filter" in json and not self.ignore_filter:
+            wanted = json["filter"]["conditions"][0]["value"]
+            waiting = [job_id for job_id in waiting if job_id == wanted]
+        if not waiting:
+            return None
+        self.taken.add(waiting[0])
+        self.enrolled.append(waiting[0])
+        return {"id": f"process-{waiting[0]}", "dependsOn": waiting[0]}
+
+    def update_event(self, event_id, **kwargs):
+        self.updates.append((event_id, kwargs))
+
+
+def job(job_id: str, size_mb: float, waiting: float = 0, extracted_mb=None) -> dict:
+    return {
+        "id": job_id,
+        "size": int(size_mb * MB),
+        "extractedSize": int(extracted_mb * MB) if extracted_mb else None,
+        "waiting": waiting,
+    }
+
+
+@pytest.fixture(autouse=True)
+def scheduling(monkeypatch):
+    monkeypatch.setattr(config, "scheduling", "sjf")
+    monkeypatch.setattr(config, "queue_aging", 600)
+    monkeypatch.setattr(config, "size_class", "any")
+    monkeypatch.setattr(config, "large_job_size", 5120)
+    monkeypatch.setattr(scheduler, "refused_jobs", {})
+
+
+def ids(jobs: list[dict]) -> list[str]:
+    return [job["id"] for job in jobs]
+
+
+def test_shortest_job_first():
+    queue = [job("large", 3000, waiting=60), job("small", 10), job("medium", 500)]
+    assert ids(scheduler.candidates(queue)) == ["small", "medium", "large"]
+
+
+def test_aging():
+    # 600 MB smaller for every minute of waiting
+    queue = [job("large", 3000, waiting=5 * 60), job("small", 10)]
+    assert ids(scheduler.candidates(queue)) == ["large", "small"]
+    queue = [job("large", 3000, waiting=4 * 60), job("small", 10)]
+    assert ids(scheduler.candidates(queue)) == ["small", "large"]
+
+
+def test_fifo(monkeypatch):
+    monkeypatch.setattr(config, "scheduling", "fifo")
+    queue = [job("large", 3000), job("small", 10)]
+    assert ids(scheduler.candidates(queue)) == ["large", "small"]
+
+
+@pytest.mark.parametrize(
+    "size_class, expected",
+    [
+        ("any", ["large", "small", "packed"]),
+        ("small", ["small"]),
+        ("large", ["large", "packed"]),
+    ],
+)
+def test_size_classes(monkeypatch, size_class, expected):
+    monkeypatch.setattr(config, "size_class", size_class)
+    monkeypatch.setattr(config, "large_job_size", 1000)
+    # The size of the archive contents counts, when known.
+    # Aging changes the order, not the size class.
+    # Priorities: large -4000, packed 900, small 500
+    queue = [
+        job("large", 2000, waiting=600),
+        job("packed", 100, extracted_mb=1500, waiting=60),
+        job("small", 500),
+    ]
+    assert ids(scheduler.candidates(queue)) == expected
+
+
+def test_refused_jobs_are_skipped():
+    scheduler.refuse_job("small")
+    queue = [job("small", 10), job("large", 3000)]
+    assert ids(scheduler.candidates(queue)) == ["large"]
+
+
+def test_enroll_next_candidate(monkeypatch):
+    fake = FakeAyon([job("large", 3000), job("small", 10)], taken=["small"])
+    monkeypatch.setattr(scheduler, "ayon", fake)
+    res = scheduler.enroll_upload("worker")
+    assert res["dependsOn"] == "large"
+    assert fake.updates == []
+
+
+def test_release_jobs_enrolled_despite_the_filter(monkeypatch):
+    monkeypatch.setattr(config, "size_class", "small")
+    fake = FakeAyon([job("large", 6000), job("small", 10)], ignore_filter=True)
+    monkeypatch.setattr(scheduler, "ayon", fake)
+
+    assert scheduler.enroll_upload("worker") is None
+    assert fake.enrolled == ["large"]
+    assert fake.updates[0][0] == "process-large"
+    assert fake.updates[0][1]["status"] == "restarted"
+    assert scheduler.is_refused("large")
+
+
+def test_keep_jobs_enrolled_despite_the_filter(monkeypatch):
+    fake = FakeAyon([job("large", 3000), job("small", 10)], ignore_filter=True)
+    monkeypatch.setattr(scheduler, "ayon", fake)
+    res = scheduler.enroll_upload("worker")
+    # Not the shortest job, but one this processor takes
+    assert res["dependsOn"] == "large"
+    assert fake.updates == []
+
+
+def test_enroll_requested_uploads(monkeypatch):
+    fake = FakeAyon([job("other", 10), job("child", 3000)])
+    monkeypatch.setattr(scheduler, "ayon", fake)
+    res = scheduler.enroll_upload("worker", {"child"})
+    assert res["dependsOn"] == "child"
+
+
+def test_release_uploads_not_requested(monkeypatch):
+    monkeypatch.setattr(config, "scheduling", "fifo")
+    fake = FakeAyon([job("other", 10), job("child", 10)], ignore_filter=True)
+    monkeypatch.setattr(scheduler, "ayon", fake)
+
+    assert scheduler.enroll_upload("worker", {"child"}) is None
+    assert fake.enrolled == ["other"]
+    assert fake.updates[0][0] == "process-other"
+    assert fake.updates[0][1]["status"] == "restarted"
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from processor import shards
+from processor.common import config
+from processor.progress import ProgressReporter
+from processor.schema import create_schema, insert_query, register_functions
+
+
+class FakeAyon:
+    """Server replying to shard listing with scripted jobs"""
+
+    addon_endpoint = "addons/openpype_import/0.0.0"
+
+    def __init__(self, polls: list[list[dict]]):
+        self.polls = polls
+        self.shard_ids: list[str] = []
+        self.updates: list[tuple[str, dict]] = []
+
+    def post(self, endpoint, json):
+        self.shard_ids.append(f"shard{len(self.shard_ids)}")
+        return {"id": self.shard_ids[-1]}
+
+    def get(self, endpoint):
+        assert endpoint == f"{self.addon_endpoint}/shards/import"
+        jobs = self.polls.pop(0)
+        return [{**job, "shardId": self.shard_ids[job["shardId"]]} for job in jobs]
+
+    def update_event(self, event_id, **kwargs):
+        self.updates.append((event_id, kwargs))
+
+
+def job(shard: int, status: str, idle: float = 1, process_id: str | None = "p") -> dict:
+    return {"shardId": shard, "processId": process_id, "status": status, "idle": idle}
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    register_functions(conn)
+    create_schema(conn)
+    for i in range(10):
+        conn.execute(
+            insert_query("subset"),
+            {"id": bytes([i]) * 16, "parent": bytes(16), "name": f"p{i}", "data": None},
+        )
+    return conn
+
+
+def coordinate(monkeypatch, conn, fake):
+    monkeypatch.setattr(shards, "ayon", fake)
+    monkeypatch.setattr(shards.time, "sleep", lambda _: None)
+    monkeypatch.setattr(config, "shards", 2)
+    monkeypatch.setattr(config, "shard_dir", None)
+    monkeypatch.setattr(config, "shard_timeout", 600)
+    progress = ProgressReporter("import")
+    shards.coordinate_shards(conn, "/shared/import.db", "demo", {}, progress)
+
+
+def test_waits_for_shards(monkeypatch, conn):
+    fake = FakeAyon(
+        [
+            [job(0, "pending", process_id=None), job(1, "in_progress")],
+            [job(0, "in_progress"), job(1, "finished")],
+            [job(0, "finished"), job(1, "finished")],
+        ]
+    )
+    coordinate(monkeypatch, conn, fake)
+    assert fake.updates == []
+    assert fake.polls == []
+
+
+def test_restarts_stalled_shards(monkeypatch, conn):
+    fake = FakeAyon(
+        [
+            [job(0, "in_progress", idle=700), job(1, "finished")],
+            # Not picked up again yet, it is not stalled
+            [job(0, "restarted", idle=700), job(1, "finished")],
+            [job(0, "in_progress", idle=30), job(1, "finished")],
+            [job(0, "in_progress", idle=601), job(1, "finished")],
+            [job(0, "pending", idle=900), job(1, "finished")],
+            [job(0, "failed"), job(1, "finished")],
+        ]
+    )
+    with pytest.raises(Exception, match="1 of 2 shards failed"):
+        coordinate(monkeypatch, conn, fake)
+    statuses = [update["status"] for _, update in fake.updates]
+    assert statuses == ["restarted", "restarted", "failed"]
+
+
+def test_stalled_shard_statuses(monkeypatch, conn):
+    fake = FakeAyon([])
+    monkeypatch.setattr(shards, "ayon", fake)
+    for retries in range(shards.SHARD_RETRIES + 1):
+        shards.restart_shard(job(0, "in_progress", idle=700), retries)
+    statuses = [update["status"] for _, update in fake.updates]
+    assert statuses == ["restarted"] * shards.SHARD_RETRIES + ["failed"]
+
+
+def test_missing_shard_fails(monkeypatch, conn):
+    with pytest.raises(Exception, match="1 of 2 shards failed"):
+        coordinate(monkeypatch, conn, FakeAyon([[job(1, "finished")]]))
@@ -0,0 +1,236 @@
+import json
+import os
+
+from contextlib import closing
+
+import pytest
+
+from processor import tiers
+from processor.common import config, mongoid2uuid
+from processor.database import open_database
+from processor.parser import create_sqlite_db
+from processor.progress import ImportCancelled
+
+
+def oid(n: int) -> dict:
+    return {"$oid": f"5f3e0c6b2a1b4c{n:010d}"}
+
+
+def uuid(n: int) -> str:
+    return mongoid2uuid(oid(n)["$oid"])
+
+
+def entity(n: int, entity_type: str, parent: int | None = None, **fields) -> dict:
+    return {"_id": oid(n), "type": entity_type, "parent": oid(parent), **fields}
+
+
+# Three versions of two products, the oldest one is the hero
+ENTITIES = [
+    {"_id": oid(1), "type": "project", "name": "demo", "data": {}},
+    entity(10, "asset", 1, name="sh010", data={"visualParent": None}),
+    entity(20, "subset", 10, name="renderMain", data={"family": "render"}),
+    entity(21, "subset", 10, name="camera", data={"family": "camera"}),
+    entity(30, "version", 20, name=1, data={"time": "20230101T100000Z"}),
+    entity(31, "version", 20, name=2, data={"time": "20240101T100000Z"}),
+    entity(32, "version", 21, name=1, data={"time": "20230601T100000Z"}),
+    entity(40, "hero_version", 20, version_id=oid(30), data={}),
+    entity(50, "representation", 30, name="exr", data={}),
+    entity(51, "representation", 31, name="exr", data={}),
+    entity(52, "representation", 32, name="abc", data={}),
+    entity(53, "representation", 40, name="exr", data={}),
+]
+
+
+class Progress:
+    event_id = "process"
+
+    def __init__(self):
+        self.summary = {}
+        self.label = None
+
+    def start(self, stage, total=None, unit="rows"):
+        self.total = total
+
+    def update_summary(self, **kwargs):
+        self.summary.update(kwargs)
+
+
+class FakeAyon:
+    def __init__(self):
+        self.events: dict[str, dict] = {}
+        self.posted: list[dict] = []
+        self.updates: list[tuple[str, dict]] = []
+
+    def get(self, endpoint):
+        return self.events[endpoint.removeprefix("events/")]
+
+    def post(self, endpoint, json):
+        self.posted.append({"endpoint": endpoint, **json})
+        if endpoint == "enroll":
+            return {"id": "tier-process", "dependsOn": "tier"}
+
+    def update_event(self, event_id, **kwargs):
+        self.updates.append((event_id, kwargs))
+        if "summary" in kwargs:
+            self.events[event_id]["summary"] = kwargs["summary"]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    source = tmp_path / "project.json"
+    source.write_text("".join(json.dumps(e) + "\n" for e in ENTITIES))
+    conn = open_database(str(tmp_path / "project.db"))
+    create_sqlite_db(str(source), conn)
+    with closing(conn):
+        yield conn
+
+
+@pytest.fixture
+def deployed(monkeypatch):
+    """Operations sent to the server, in order"""
+    deployed: list[tuple[str, str]] = []
+
+    def batch_process_ops(project_name, ops, progress=None, concurrency=1):
+        ops = list(ops)
+        deployed.extend((op["entityType"], op["entityId"]) for op in ops)
+        return len(ops)
+
+    monkeypatch.setattr(tiers, "batch_process_ops", batch_process_ops)
+    monkeypatch.setattr(tiers, "save_baseline", lambda conn, name: None)
+    return deployed
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeAyon()
+    monkeypatch.setattr(tiers, "ayon", fake)
+    return fake
+
+
+def test_deploy_newest_versions_first(conn, deployed, monkeypatch):
+    monkeypatch.setattr(tiers, "CONTENT_WINDOW", 2)
+    tiers.deploy_content(conn, "demo", {})
+    # Each window is followed by its hero versions and representations
+    assert deployed == [
+        ("version", uuid(31)),
+        ("version", uuid(32)),
+        ("representation", uuid(51)),
+        ("representation", uuid(52)),
+        ("version", uuid(30)),
+        ("version", uuid(40)),
+        ("representation", uuid(50)),
+        ("representation", uuid(53)),
+    ]
+
+
+def test_deploy_tiers_inline(conn, deployed, monkeypatch):
+    monkeypatch.setattr(config, "shard_dir", None)
+    progress = Progress()
+    tiers.deploy_tiers(conn, "demo", {}, progress)
+
+    assert [entity_type for entity_type, _ in deployed[:2]] == ["product", "product"]
+    assert len(deployed) == 2 + 4 + 4
+    assert progress.total == 8
+    assert progress.summary["tiers"] == {"skeleton": "finished", "content": "finished"}
+
+
+def test_deploy_tiers_deferred(conn, deployed, fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "shard_dir", str(tmp_path))
+    progress = Progress()
+    tiers.deploy_tiers(conn, "demo", {}, progress, keep_baseline=True)
+
+    # Only products are deployed, the rest goes to a background job
+    assert {entity_type for entity_type, _ in deployed} == {"product"}
+    assert progress.summary["tiers"] == {"skeleton": "finished", "content": "pending"}
+    [event] = fake.posted
+    assert event["topic"] == tiers.TIER_TOPIC
+    assert event["dependsOn"] == "process"
+    assert event["payload"]["baseline"]
+    with closing(open_database(str(tmp_path / event["payload"]["database"]))) as copy:
+        assert tiers.count_content(copy) == 8
+
+
+class Reporter:
+    """Progress of the content tier job, optionally cancelled"""
+
+    def __init__(self, event_id, watch=None, cancel=False):
+        self.event_id = event_id
+        self.cancelled_by = watch[0] if cancel else None
+        self.cancel = cancel
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def start(self, stage, total=None, unit="rows"):
+        if self.cancel:
+            raise ImportCancelled("aborted", self.cancelled_by)
+
+
+@pytest.fixture
+def content_job(conn, fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "shard_dir", str(tmp_path))
+    tiers.backup_database(conn, tiers.content_database_path("process"))
+    fake.events["tier"] = {
+        "dependsOn": "process",
+        "project": "demo",
+        "payload": {"database": "process.content.db", "project": "demo"},
+    }
+    fake.events["process"] = {"summary": {"tiers": {"skeleton": "finished"}}}
+    return tmp_path / "process.content.db"
+
+
+def statuses(fake, event_id):
+    return [u.get("status") for e, u in fake.updates if e == event_id and "status" in u]
+
+
+def test_enroll_content(content_job, fake, deployed, monkeypatch):
+    monkeypatch.setattr(tiers, "ProgressReporter", Reporter)
+    assert tiers.enroll_content("worker")
+
+    assert len(deployed) == 8
+    assert statuses(fake, "tier-process") == ["in_progress", "finished"]
+    assert fake.events["process"]["summary"]["tiers"] == {
+        "skeleton": "finished",
+        "content": "finished",
+    }
+    assert not os.path.exists(content_job)
+
+
+def test_enroll_failed_content(content_job, fake, monkeypatch):
+    def batch_process_ops(*args):
+        raise Exception("Server error")
+
+    monkeypatch.setattr(tiers, "ProgressReporter", Reporter)
+    monkeypatch.setattr(tiers, "batch_process_ops", batch_process_ops)
+    assert tiers.enroll_content("worker")
+
+    event_id, update = fake.updates[-2]
+    assert event_id == "tier-process"
+    assert update["status"] == "failed"
+    assert "Server error" in update["payload"]["traceback"]
+    assert fake.events["process"]["summary"]["tiers"]["content"] == "failed"
+    # Kept to be processed again when restarted
+    assert os.path.exists(content_job)
+
+
+def test_enroll_cancelled_content(content_job, fake, monkeypatch):
+    """The project is imported again, the content is obsolete"""
+    monkeypatch.setattr(
+        tiers,
+        "ProgressReporter",
+        lambda event_id, watch: Reporter(event_id, watch, cancel=True),
+    )
+    assert tiers.enroll_content("worker")
+
+    assert statuses(fake, "tier-process") == ["in_progress", "aborted"]
+    assert fake.events["process"]["summary"]["tiers"]["content"] == "aborted"
+    assert not os.path.exists(content_job)
+
+
+def test_no_content_jobs_without_shard_dir(fake, monkeypatch):
+    monkeypatch.setattr(config, "shard_dir", None)
+    assert not tiers.enroll_content("worker")
+    assert fake.posted == []
@@ -0,0 +1,155 @@
+import json
+import logging
+
+from contextlib import closing
+
+import pytest
+
+from processor import tree
+from processor.checks import run_checks
+from processor.common import mongoid2uuid
+from processor.database import open_database
+from processor.folders import folders_at_depth
+from processor.parser import create_sqlite_db
+
+
+def oid(n: int) -> dict:
+    return {"$oid": f"5f3e0c6b2a1b4c{n:010d}"}
+
+
+def folder(n: int, name: str, parent: int | None, tasks=None) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "asset",
+        "name": name,
+        "parent": oid(1),
+        "data": {
+            "visualParent": oid(parent) if parent else None,
+            "tasks": tasks or {},
+        },
+    }
+
+
+def product(n: int, folder: int) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "subset",
+        "name": f"product{n}",
+        "parent": oid(folder),
+        "data": {"family": "render"},
+    }
+
+
+def version(n: int, product: int) -> dict:
+    return {"_id": oid(n), "type": "version", "name": 1, "parent": oid(product)}
+
+
+def representation(n: int, version: int) -> dict:
+    return {
+        "_id": oid(n),
+        "type": "representation",
+        "name": "exr",
+        "parent": oid(version),
+    }
+
+
+# sq01 and sq010 share a path prefix, but not a subtree
+ENTITIES = [
+    {"_id": oid(1), "type": "project", "name": "demo", "data": {}},
+    folder(10, "shots", None),
+    folder(11, "sq01", 10),
+    folder(12, "sh010", 11, tasks={"comp": {"type": "Compositing"}}),
+    folder(13, "sq010", 10),
+    folder(14, "sh010", 13, tasks={"anim": {"type": "Animation"}}),
+    folder(15, "assets", None),
+    # Its parent is not in the export
+    folder(16, "lost", 99),
+    product(20, 10),
+    product(21, 12),
+    product(22, 12),
+    product(23, 14),
+    *(version(30 + i, 20 + i) for i in range(4)),
+    *(representation(40 + i, 30 + i) for i in range(4)),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    source = tmp_path / "project.json"
+    source.write_text("".join(json.dumps(e) + "\n" for e in ENTITIES))
+    conn = open_database(str(tmp_path / "project.db"))
+    create_sqlite_db(str(source), conn)
+    with closing(conn):
+        yield conn
+
+
+def folder_tree(conn) -> dict[str, tuple]:
+    rows = conn.execute(
+        """
+        SELECT t.path, t.depth, r.name, t.folder_count, t.product_count
+        FROM folder_tree AS t
+        INNER JOIN assets AS r ON r.id = t.root
+        """
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+def test_folder_tree(conn):
+    # Path: depth, root, descendant folders, products in the subtree
+    assert folder_tree(conn) == {
+        "assets": (0, "assets", 0, 0),
+        "shots": (0, "shots", 4, 4),
+        "shots/sq01": (1, "shots", 1, 2),
+        "shots/sq01/sh010": (2, "shots", 0, 2),
+        "shots/sq010": (1, "shots", 1, 1),
+        "shots/sq010/sh010": (2, "shots", 0, 1),
+    }
+
+
+def test_subtree_condition(conn):
+    rows = conn.execute(
+        f"""
+        SELECT path FROM folder_tree
+        WHERE {tree.subtree_condition("path", ":path")}
+        ORDER BY path
+        """,
+        {"path": "shots/sq01"},
+    )
+    assert [row[0] for row in rows] == ["shots/sq01/sh010"]
+
+
+def test_unreachable_folders(conn, caplog):
+    with caplog.at_level(logging.WARNING):
+        run_checks(conn)
+    assert "1 folders have no parent folder" in caplog.text
+
+
+def test_folders_at_depth(conn):
+    task_type_map = {
+        "compositing": {"name": "Compositing"},
+        "animation": {"name": "Animation"},
+    }
+    levels = [
+        folders_at_depth(depth, conn, None, task_type_map, ["Folder"])
+        for depth in range(3)
+    ]
+    names = [[op["data"]["name"] for op in folder_ops] for folder_ops, _ in levels]
+    assert names == [["assets", "shots"], ["sq01", "sq010"], ["sh010", "sh010"]]
+
+    # Parents are deployed by the previous level
+    shots = levels[0][0][1]
+    assert all(op["data"]["parentId"] == shots["entityId"] for op in levels[1][0])
+    assert levels[0][1] == levels[1][1] == []
+    tasks = [(op["data"]["folderId"], op["data"]["name"]) for op in levels[2][1]]
+    assert tasks == [
+        (mongoid2uuid(oid(12)["$oid"]), "comp"),
+        (mongoid2uuid(oid(14)["$oid"]), "anim"),
+    ]
+
+
+def test_ensure_folder_tree(conn):
+    conn.execute("DROP TABLE folder_tree")
+    assert not tree.has_folder_tree(conn)
+    tree.ensure_folder_tree(conn)
+    assert tree.has_folder_tree(conn)
+    assert len(folder_tree(conn)) == 6
@@ -0,0 +1,39 @@
+import os
+import importlib.util
+
+import pytest
+
+SERVER_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "server")
+
+
+def load_server_module(name: str):
+    """Load a helper module of the server addon
+
+    The addon package itself needs a running Ayon server,
+    its helper modules do not, so they are loaded by path.
+    """
+    path = os.path.join(SERVER_DIR, f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"openpype_import_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def validation():
+    return load_server_module("validation")
+
+
+@pytest.fixture(scope="session")
+def files():
+    return load_server_module("files")
+
+
+@pytest.fixture(scope="session")
+def uploads():
+    return load_server_module("uploads")
+
+
+@pytest.fixture(scope="session")
+def projects():
+    return load_server_module("projects")
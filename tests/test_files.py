@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=500-5000", (500, 999)),
+        ("bytes=999-999", (999, 999)),
+        (" bytes = 10-20", (10, 20)),
+    ],
+)
+def test_parse_range_header(files, header, expected):
+    assert files.parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "items=0-10",
+        "bytes=0-10,20-30",
+        "bytes=1000-",
+        "bytes=20-10",
+        "bytes=-0",
+        "bytes=a-b",
+        "bytes=-",
+        "bytes",
+    ],
+)
+def test_parse_invalid_range_header(files, header):
+    with pytest.raises(ValueError):
+        files.parse_range_header(header, 1000)
+
+
+def test_parse_range_header_empty_file(files):
+    assert files.parse_range_header(None, 0) is None
+    with pytest.raises(ValueError):
+        files.parse_range_header("bytes=0-", 0)
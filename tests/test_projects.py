@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+asyncpg = pytest.importorskip("asyncpg")
+
+# Switching needs Postgres: set OPENPYPE_IMPORT_TEST_DSN to a database
+# the tests may create scratch databases with
+DSN = os.environ.get("OPENPYPE_IMPORT_TEST_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="OPENPYPE_IMPORT_TEST_DSN is not set")
+
+# The parts of the Ayon schema the switch touches
+SCHEMA = """
+CREATE TABLE public.projects (
+    name VARCHAR PRIMARY KEY,
+    code VARCHAR UNIQUE NOT NULL
+);
+CREATE TABLE public.events (
+    id SERIAL PRIMARY KEY,
+    topic VARCHAR NOT NULL,
+    project_name VARCHAR
+);
+"""
+
+PROJECT_SCHEMA = """
+CREATE SCHEMA {schema};
+CREATE TABLE {schema}.folders (name VARCHAR PRIMARY KEY);
+CREATE TABLE {schema}.settings (
+    addon_name VARCHAR NOT NULL,
+    addon_version VARCHAR NOT NULL,
+    variant VARCHAR NOT NULL,
+    data JSONB NOT NULL
+);
+CREATE TABLE {schema}.project_site_settings (
+    addon_name VARCHAR NOT NULL,
+    addon_version VARCHAR NOT NULL,
+    site_id VARCHAR NOT NULL,
+    user_name VARCHAR NOT NULL,
+    data JSONB NOT NULL
+);
+"""
+
+
+async def create_project(conn, projects, name: str, code: str, folder: str) -> None:
+    await conn.execute("INSERT INTO public.projects VALUES ($1, $2)", name, code)
+    await conn.execute(PROJECT_SCHEMA.format(schema=projects.schema_name(name)))
+    await conn.execute(
+        f"INSERT INTO {projects.schema_name(name)}.folders VALUES ($1)", folder
+    )
+    await conn.execute(
+        "INSERT INTO public.events (topic, project_name) VALUES ($1, $2)",
+        "entity.folder.created",
+        name,
+    )
+
+
+async def add_settings(conn, projects, name: str) -> None:
+    schema = projects.schema_name(name)
+    await conn.execute(
+        f"INSERT INTO {schema}.settings VALUES ('core', '1.0.0', 'production', $1)",
+        json.dumps({"studio_name": name}),
+    )
+    await conn.execute(
+        f"""INSERT INTO {schema}.project_site_settings
+        VALUES ('core', '1.0.0', 'studio', 'admin', '{{}}')"""
+    )
+
+
+async def state(conn, projects) -> dict:
+    result = {"projects": {}, "events": {}}
+    for row in await conn.fetch("SELECT name, code FROM public.projects ORDER BY name"):
+        schema = projects.schema_name(row["name"])
+        folders = await conn.fetch(f"SELECT name FROM {schema}.folders")
+        settings = await conn.fetch(f"SELECT data FROM {schema}.settings")
+        site = await conn.fetchval(
+            f"SELECT count(*) FROM {schema}.project_site_settings"
+        )
+        result["projects"][row["name"]] = {
+            "code": row["code"],
+            "folders": [r["name"] for r in folders],
+            "settings": [json.loads(r["data"]) for r in settings],
+            "site_settings": site,
+        }
+    for row in await conn.fetch(
+        "SELECT project_name, count(*) FROM public.events GROUP BY project_name"
+    ):
+        result["events"][row["project_name"]] = row["count"]
+    return result
+
+
+@pytest.fixture
+def database():
+    """A scratch database, dropped after the test"""
+    name = f"openpype_import_test_{uuid.uuid4().hex[:8]}"
+
+    async def admin(statement: str) -> None:
+        conn = await asyncpg.connect(DSN)
+        try:
+            await conn.execute(statement)
+        finally:
+            await conn.close()
+
+    asyncio.run(admin(f"CREATE DATABASE {name}"))
+    yield name
+    asyncio.run(admin(f"DROP DATABASE {name}"))
+
+
+def run(database, coro_fn):
+    async def main():
+        conn = await asyncpg.connect(DSN, database=database)
+        try:
+            await conn.execute(SCHEMA)
+            return await coro_fn(conn)
+        finally:
+            await conn.close()
+
+    return asyncio.run(main())
+
+
+def test_switch_project(database, projects):
+    async def scenario(conn):
+        await create_project(conn, projects, "demo", "dm", "old")
+        await add_settings(conn, projects, "demo")
+        await create_project(conn, projects, "demo_import_staging", "dmis", "new")
+        async with conn.transaction():
+            assert await projects.swap_projects(conn, "demo", "dm")
+        return await state(conn, projects)
+
+    result = run(database, scenario)
+    assert result["projects"] == {
+        "demo": {
+            "code": "dm",
+            "folders": ["new"],
+            "settings": [{"studio_name": "demo"}],
+            "site_settings": 1,
+        },
+        "demo_import_backup": {
+            "code": "dm_import_backup",
+            "folders": ["old"],
+            "settings": [{"studio_name": "demo"}],
+            "site_settings": 1,
+        },
+    }
+    assert result["events"] == {"demo": 2}
+
+
+def test_switch_new_project(database, projects):
+    async def scenario(conn):
+        await create_project(conn, projects, "demo_import_staging", "dmis", "new")
+        async with conn.transaction():
+            assert not await projects.swap_projects(conn, "demo", "dm")
+        return await state(conn, projects)
+
+    result = run(database, scenario)
+    assert list(result["projects"]) == ["demo"]
+    assert result["projects"]["demo"]["folders"] == ["new"]
+    assert result["events"] == {"demo": 1}
+
+
+def test_switch_with_existing_backup(database, projects):
+    async def scenario(conn):
+        await create_project(conn, projects, "demo", "dm", "old")
+        await create_project(conn, projects, "demo_import_staging", "dmis", "new")
+        await create_project(conn, projects, "demo_import_backup", "dmib", "older")
+        before = await state(conn, projects)
+        with pytest.raises(projects.InvalidSwitch):
+            async with conn.transaction():
+                await projects.swap_projects(conn, "demo", "dm")
+        assert await state(conn, projects) == before
+
+        # Removed by the caller, as a leftover of a failed switch
+        await conn.execute("DROP SCHEMA project_demo_import_backup CASCADE")
+        await conn.execute(
+            "DELETE FROM public.projects WHERE name = 'demo_import_backup'"
+        )
+        async with conn.transaction():
+            await projects.swap_projects(conn, "demo", "dm")
+        return await state(conn, projects)
+
+    result = run(database, scenario)
+    assert result["projects"]["demo"]["folders"] == ["new"]
+    assert result["projects"]["demo_import_backup"]["folders"] == ["old"]
+
+
+def test_switch_code_too_long(database, projects):
+    async def scenario(conn):
+        await create_project(conn, projects, "demo", "d" * 60, "old")
+        await create_project(conn, projects, "demo_import_staging", "dmis", "new")
+        with pytest.raises(projects.InvalidSwitch):
+            async with conn.transaction():
+                await projects.swap_projects(conn, "demo", "dm")
+        return await state(conn, projects)
+
+    result = run(database, scenario)
+    assert sorted(result["projects"]) == ["demo", "demo_import_staging"]
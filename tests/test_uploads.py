@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import pytest
+
+SIZE = 1000
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def upload(uploads, tmp_path):
+    uploads.create_upload(str(tmp_path), "a" * 32, {"size": SIZE})
+    return str(tmp_path), "a" * 32
+
+
+async def stream(data: bytes, piece: int = 64):
+    for i in range(0, len(data), piece):
+        await asyncio.sleep(0)
+        yield data[i : i + piece]
+
+
+def send(uploads, upload, start, end, data=None, checksum=None):
+    data = DATA[start:end] if data is None else data
+    return uploads.receive_chunk(*upload, SIZE, start, stream(data), checksum)
+
+
+def file_data(upload) -> bytes:
+    with open(os.path.join(*upload), "rb") as f:
+        return f.read()
+
+
+def parts(uploads, upload) -> list[str]:
+    return sorted(os.listdir(uploads.parts_dir(*upload)))
+
+
+def test_chunks_in_any_order(uploads, upload):
+    async def run():
+        await send(uploads, upload, 600, 1000)
+        await asyncio.gather(
+            send(uploads, upload, 300, 600),
+            send(uploads, upload, 0, 300),
+        )
+
+    asyncio.run(run())
+    ranges = uploads.received_ranges(*upload)
+    assert uploads.is_complete(ranges, SIZE)
+    assert file_data(upload) == DATA[:SIZE]
+    assert parts(uploads, upload) == ["0-300", "300-600", "600-1000", "meta.json"]
+
+
+def test_resume_missing_chunks(uploads, upload):
+    asyncio.run(send(uploads, upload, 0, 400))
+    asyncio.run(send(uploads, upload, 800, 1000))
+    ranges = uploads.received_ranges(*upload)
+    assert ranges == [[0, 400], [800, 1000]]
+    assert not uploads.is_complete(ranges, SIZE)
+
+    asyncio.run(send(uploads, upload, 400, 800))
+    assert uploads.is_complete(uploads.received_ranges(*upload), SIZE)
+    assert file_data(upload) == DATA[:SIZE]
+
+
+def test_bad_chunk_is_not_written(uploads, upload):
+    checksum = hashlib.sha256(DATA[:100]).hexdigest()
+    with pytest.raises(uploads.InvalidChunk, match="checksum"):
+        asyncio.run(send(uploads, upload, 0, 100, b"x" * 100, checksum))
+    asyncio.run(send(uploads, upload, 0, 100, checksum=checksum.upper()))
+
+    with pytest.raises(uploads.InvalidChunk, match="overlaps"):
+        asyncio.run(send(uploads, upload, 50, 150))
+    # The same chunk sent again is accepted and not written twice
+    asyncio.run(send(uploads, upload, 0, 100, b"y" * 100))
+
+    assert file_data(upload)[:100] == DATA[:100]
+    assert parts(uploads, upload) == ["0-100", "meta.json"]
+
+
+def test_invalid_chunks(uploads, upload, monkeypatch):
+    with pytest.raises(uploads.InvalidChunk, match="offset"):
+        asyncio.run(send(uploads, upload, SIZE + 1, SIZE + 1, b""))
+    with pytest.raises(uploads.InvalidChunk, match="file size"):
+        asyncio.run(send(uploads, upload, 900, 1000, b"x" * 200))
+    monkeypatch.setattr(uploads, "MAX_CHUNK_SIZE", 100)
+    with pytest.raises(uploads.InvalidChunk, match="too large"):
+        asyncio.run(send(uploads, upload, 0, 200))
+    assert parts(uploads, upload) == ["meta.json"]
+
+
+def test_parallel_overlapping_chunks(uploads, upload):
+    async def run():
+        return await asyncio.gather(
+            send(uploads, upload, 0, 500),
+            send(uploads, upload, 250, 750),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, uploads.InvalidChunk) for r in results) == 1
+    ranges = uploads.received_ranges(*upload)
+    assert ranges in ([[0, 500]], [[250, 750]])
+    start, end = ranges[0]
+    assert file_data(upload)[start:end] == DATA[start:end]
+
+
+def test_parallel_retried_chunks(uploads, upload):
+    async def run():
+        await asyncio.gather(*(send(uploads, upload, 0, 500) for _ in range(3)))
+
+    asyncio.run(run())
+    assert parts(uploads, upload) == ["0-500", "meta.json"]
+
+
+def test_chunks_wait_for_the_lock(uploads, upload, monkeypatch):
+    monkeypatch.setattr(uploads, "LOCK_POLL_INTERVAL", 0.01)
+
+    async def run():
+        async with uploads.upload_lock(*upload):
+            task = asyncio.create_task(send(uploads, upload, 0, 100))
+            await asyncio.sleep(0.05)
+            assert not task.done()
+            assert uploads.received_ranges(*upload) == []
+        await task
+
+    asyncio.run(run())
+    assert uploads.received_ranges(*upload) == [[0, 100]]
+
+
+def test_stale_lock_is_removed(uploads, upload):
+    lock_path = os.path.join(uploads.parts_dir(*upload), "lock")
+    open(lock_path, "w").close()
+    stale = time.time() - uploads.LOCK_TIMEOUT - 1
+    os.utime(lock_path, (stale, stale))
+
+    asyncio.run(send(uploads, upload, 0, 100))
+    assert uploads.received_ranges(*upload) == [[0, 100]]
+    assert not os.path.exists(lock_path)
+
+
+def test_finalize_once(uploads, upload):
+    assert uploads.start_finalizing(*upload)
+    assert not uploads.start_finalizing(*upload)
+    assert uploads.received_ranges(*upload) == []
@@ -0,0 +1,176 @@
+import json
+import struct
+import zipfile
+
+import pytest
+
+PROJECT = {"_id": {"$oid": "5f3e0c6b2a1b4c0012345678"}, "type": "project", "name": "demo"}
+ASSET = {"_id": {"$oid": "5f3e0c6b2a1b4c0012345679"}, "type": "asset", "name": "sh010"}
+OID = bytes.fromhex("5f3e0c6b2a1b4c0012345678")
+
+
+def write_archive(path, files: dict[str, bytes]) -> str:
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def test_validate_archive(validation, tmp_path):
+    path = write_archive(
+        tmp_path / "upload",
+        {
+            "project.json": json.dumps([PROJECT, ASSET]).encode(),
+            "thumbnails/a.jpg": b"jpg",
+        },
+    )
+    stats = validation.validate_upload(path)
+    assert stats["format"] == "zip"
+    assert stats["project_file"] == "project.json"
+    assert stats["files"] == 2
+    assert stats["first_entity"] == "project"
+
+
+def test_archive_without_project(validation, tmp_path):
+    path = write_archive(tmp_path / "upload", {"readme.txt": b"hello"})
+    with pytest.raises(validation.InvalidUpload, match="does not contain a project file"):
+        validation.validate_upload(path)
+
+
+@pytest.mark.parametrize("cut", [10, 200])
+def test_truncated_archive(validation, tmp_path, cut):
+    path = write_archive(tmp_path / "upload", {"project.json": json.dumps([PROJECT]).encode()})
+    data = (tmp_path / "upload").read_bytes()
+    (tmp_path / "upload").write_bytes(data[:-cut])
+    with pytest.raises(validation.InvalidUpload):
+        validation.validate_upload(path)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        json.dumps([PROJECT, ASSET]),
+        "  [\n" + json.dumps(PROJECT) + ",\n" + json.dumps(ASSET) + "]",
+        json.dumps(PROJECT) + "\n" + json.dumps(ASSET) + "\n",
+    ],
+)
+def test_validate_json(validation, tmp_path, data):
+    path = tmp_path / "upload"
+    path.write_text(data)
+    assert validation.validate_upload(str(path)) == {"format": "json", "first_entity": "project"}
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        ("hello", "not a zip archive or a JSON export"),
+        ('[{"_id": "x", "type": "project"', "not valid JSON"),
+        ('[{"name": "demo"}]', "does not contain OpenPype entities"),
+        ('[{"_id": "x", "type": "shot"}]', "Unexpected entity type"),
+        ("[1, 2]", "not a zip archive or a JSON export"),
+    ],
+)
+def test_invalid_json(validation, tmp_path, data, message):
+    path = tmp_path / "upload"
+    path.write_text(data)
+    with pytest.raises(validation.InvalidUpload, match=message):
+        validation.validate_upload(str(path))
+
+
+def test_large_first_entity(validation, monkeypatch):
+    # The first entity does not fit in a full head, it is not checked
+    monkeypatch.setattr(validation, "SNIFF_SIZE", 64)
+    head = json.dumps([{**PROJECT, "data": "x" * 100}]).encode()[:64]
+    assert validation.sniff_entity_type(head) is None
+
+
+def string(name: bytes, value: bytes) -> bytes:
+    data = value + b"\x00"
+    return b"\x02" + name + b"\x00" + struct.pack("<i", len(data)) + data
+
+
+def document(body: bytes) -> bytes:
+    return struct.pack("<i", len(body) + 5) + body + b"\x00"
+
+
+def entity(entity_type: bytes = b"project") -> bytes:
+    """BSON entity with an ID, a type and elements of other kinds"""
+    return document(
+        b"\x07_id\x00"
+        + OID
+        + string(b"name", b"demo")
+        + string(b"type", entity_type)
+        + b"\x03data\x00"
+        + document(b"\x10fps\x00" + struct.pack("<i", 25) + b"\x0anote\x00")
+        + b"\x04tags\x00"
+        + document(string(b"0", b"a"))
+        + b"\x05blob\x00"
+        + struct.pack("<i", 2)
+        + b"\x00ab"
+        + b"\x08active\x00\x01"
+    )
+
+
+@pytest.mark.parametrize("entity_type", [b"project", b"asset", b"representation"])
+def test_sniff_bson_type(validation, entity_type):
+    head = entity(entity_type) + entity(b"asset")
+    assert validation.is_bson(head)
+    assert validation.sniff_bson_type(head) == entity_type.decode()
+
+
+def test_is_bson(validation):
+    assert not validation.is_bson(b'[{"_id": {"$oid": "5f3e"}, "type": "project"}]')
+    assert not validation.is_bson(b'{"_id": "5f3e", "type": "project"}\n')
+    assert not validation.is_bson(b"PK\x03\x04\x14\x00\x00\x00")
+    assert not validation.is_bson(b"\x05\x00")
+    assert not validation.is_bson(b"")
+
+
+def test_sniff_truncated(validation):
+    head = entity()
+    with pytest.raises(validation.InvalidUpload, match="truncated"):
+        validation.sniff_bson_type(head[:-1])
+
+
+def test_sniff_incomplete_head(validation, monkeypatch):
+    # The first document does not fit in a full head, it is not checked
+    monkeypatch.setattr(validation, "SNIFF_SIZE", 32)
+    head = entity()
+    assert validation.sniff_bson_type(head[:32]) is None
+
+
+@pytest.mark.parametrize(
+    "head",
+    [
+        # Not an entity
+        document(string(b"name", b"demo")),
+        # Unknown entity type
+        document(b"\x07_id\x00" + OID + string(b"type", b"workfile_x")),
+        # Missing terminator
+        entity()[:-1] + b"\x01",
+        # Unsupported element type
+        document(b"\x0bre\x00x\x00\x00" + b"\x07_id\x00" + OID),
+        # Unknown element type
+        document(b"\x20x\x00" + b"\x07_id\x00" + OID),
+        # String reaching past the end of the document
+        document(string(b"type", b"project")[:-9] + struct.pack("<i", 50) + b"project\x00"),
+        # Negative sizes would move the reader backwards
+        document(b"\x03a\x00" + struct.pack("<i", -3) + b"\x00" * 8),
+        document(b"\x02a\x00" + struct.pack("<i", -7) + b"\x00" * 8),
+        document(b"\x05a\x00" + struct.pack("<i", -8) + b"\x00" * 8),
+    ],
+)
+def test_sniff_malformed(validation, head):
+    with pytest.raises(validation.InvalidUpload):
+        validation.sniff_bson_type(head)
+
+
+def test_validate_bson(validation, tmp_path):
+    path = write_archive(tmp_path / "upload", {"project.bson": entity() + entity(b"asset")})
+    stats = validation.validate_upload(path)
+    assert stats["project_file"] == "project.bson"
+    assert stats["first_entity"] == "project"
+
+    path = tmp_path / "project.bson"
+    path.write_bytes(entity() + entity(b"asset"))
+    assert validation.validate_upload(str(path)) == {"format": "bson", "first_entity": "project"}